@@ -3,6 +3,12 @@ from flask_cors import CORS
 from dotenv import load_dotenv
 from .config import Config
 from .database.sql_db import init_sql_db
+from .utils.cpu_budget import init_cpu_budget
+from .utils.dataset_store import init_dataset_store
+from .utils.job_queue import init_job_queue
+from .utils.micro_batcher import init_micro_batcher
+from .utils.model_cache import init_model_cache
+from .utils.r2_storage import init_r2_storage
 
 def create_app():
     load_dotenv()
@@ -16,6 +22,24 @@ def create_app():
     # Initialize SQLAlchemy (Neon)
     init_sql_db(app)
 
+    # Parsed-upload cache shared by the dataset endpoints
+    init_dataset_store(app)
+
+    # Cores shared by concurrent training and scoring jobs
+    init_cpu_budget(app)
+
+    # Background training jobs for /api/perform and /api/race
+    init_job_queue(app)
+
+    # One R2 client and upload executor for the whole process
+    init_r2_storage(app)
+
+    # Loaded models served by /api/model/predict
+    init_model_cache(app)
+
+    # Optional coalescing of concurrent /api/model/predict/json requests
+    init_micro_batcher(app)
+
     # import blueprints
     from app.routes.main_routes import main
     from app.routes.ml_routes import ml
@@ -25,6 +49,7 @@ def create_app():
     from app.routes.auth_routes import auth_bp
     from app.routes.analyze_routes import analyze_bp
     from app.routes.model_routes import model_bp
+    from app.routes.job_routes import job_bp
 
     # register blueprints
     app.register_blueprint(main)
@@ -35,5 +60,6 @@ def create_app():
     app.register_blueprint(clean_bp)
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(analyze_bp)
+    app.register_blueprint(job_bp)
 
     return app
\ No newline at end of file
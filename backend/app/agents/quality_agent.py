@@ -1,27 +1,41 @@
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Iterable, Optional, Tuple, Union
+import numpy as np
 import pandas as pd
-from app.utils.statistics import calculate_stats, infer_column_type, calculate_correlation
+from app.utils.statistics import (
+    calculate_stats, summarize_numeric_sketch, infer_column_type, coerce_numeric,
+    find_high_correlations, threshold_correlations, CorrelationAccumulator,
+    DEFAULT_SAMPLE_SIZE
+)
+from app.utils.sketches import ColumnSketch, RowReservoir
 
 class QualityAgent:
     """Agent for analyzing data quality issues"""
     
-    def __init__(self):
+    def __init__(self, correlation_method: str = 'pearson', approximate: bool = False,
+                 sample_size: int = DEFAULT_SAMPLE_SIZE):
         self.issues = []
         self.column_stats = {}
         self.correlations = []
+        self.correlation_method = correlation_method
+        # Approximate mode: sampled type inference/normality, sketched quantiles and distinct counts
+        self.approximate = approximate
+        self.sample_size = sample_size
+        # Set by analyze_stream: uniform row sample and total rows seen
+        self.row_sample = None
+        self.total_rows = 0
     
-    def analyze(self, data: List[Dict], columns: List[str]) -> Dict[str, Any]:
+    def analyze(self, data: Union[pd.DataFrame, List[Dict]], columns: List[str]) -> Dict[str, Any]:
         """
         Analyze data quality
         
         Args:
-            data: List of dictionaries representing rows
+            data: DataFrame (or list of row dictionaries) to analyze
             columns: List of column names
             
         Returns:
             Dictionary with analysis results
         """
-        df = pd.DataFrame(data)
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
         
         for col in columns:
             self._analyze_column(df, col)
@@ -32,20 +46,100 @@ class QualityAgent:
         # Calculate overall quality score
         quality_score = self._calculate_quality_score()
         
-        return {
+        result = {
             'issues': self.issues,
             'stats': self.column_stats,
             'correlations': self.correlations,
             'quality_score': quality_score,
             'summary': self._generate_summary()
         }
+        if self.approximate:
+            result['approximation'] = self._approximation_summary()
+        
+        return result
+    
+    def analyze_stream(self, chunks: Iterable[pd.DataFrame], columns: List[str]) -> Dict[str, Any]:
+        """
+        Analyze data quality over a stream of DataFrame chunks
+
+        Each column is summarized with streaming sketches (always approximate),
+        Pearson correlations are accumulated chunk by chunk, and a uniform
+        row sample is kept in self.row_sample for downstream agents.
+
+        Args:
+            chunks: Iterable of DataFrames with the same columns
+            columns: List of column names
+
+        Returns:
+            Dictionary with analysis results
+        """
+        self.approximate = True
+        sketches = {col: ColumnSketch(self.sample_size, seed=idx) for idx, col in enumerate(columns)}
+        rows = RowReservoir(self.sample_size)
+        numeric_candidates = None
+        accumulator = None
+
+        for chunk in chunks:
+            if numeric_candidates is None:
+                numeric_candidates = [
+                    col for col in columns if pd.api.types.is_numeric_dtype(chunk[col].dtype)
+                ]
+                accumulator = CorrelationAccumulator(len(numeric_candidates))
+
+            for col in columns:
+                non_null = chunk[col].dropna()
+                sketches[col].update(non_null, coerce_numeric(non_null), len(chunk))
+
+            if numeric_candidates:
+                block = np.empty((len(chunk), len(numeric_candidates)))
+                for idx, col in enumerate(numeric_candidates):
+                    block[:, idx] = coerce_numeric(chunk[col])
+                accumulator.update(block)
+
+            rows.update(chunk[columns])
+
+        self.row_sample = rows.frame
+        self.total_rows = rows.seen
+
+        for col in columns:
+            self._analyze_sketch(col, sketches[col])
+
+        # Pearson comes from the streamed sums; Spearman needs ranks, so it uses the row sample
+        numeric_cols = self._numeric_columns()
+        if self.correlation_method == 'pearson' and accumulator is not None:
+            positions = [numeric_candidates.index(col) for col in numeric_cols if col in numeric_candidates]
+            names = [numeric_candidates[i] for i in positions]
+            pairs = threshold_correlations(accumulator.correlation(positions), names, 0.8) if len(names) > 1 else []
+        else:
+            pairs = find_high_correlations(self.row_sample, numeric_cols, threshold=0.8,
+                                           method=self.correlation_method)
+        self._record_correlations(pairs)
+
+        result = {
+            'issues': self.issues,
+            'stats': self.column_stats,
+            'correlations': self.correlations,
+            'quality_score': self._calculate_quality_score(),
+            'summary': self._generate_summary(),
+            'approximation': self._approximation_summary()
+        }
+        result['approximation']['rows_profiled'] = int(self.total_rows)
+        return result
     
     def _analyze_column(self, df: pd.DataFrame, column: str):
         """Analyze a single column"""
-        values = df[column].tolist()
-        non_null = [v for v in values if v is not None and not pd.isna(v)]
+        values = df[column]
+        non_null = values.dropna()
+        
+        if self.approximate:
+            sketch = ColumnSketch(self.sample_size)
+            sketch.update(non_null, coerce_numeric(non_null), len(values))
+            self._analyze_sketch(column, sketch)
+            return
+        
         null_count = len(values) - len(non_null)
-        null_percentage = (null_count / len(values)) * 100 if values else 0
+        null_percentage = (null_count / len(values)) * 100 if len(values) else 0
+        unique_values = non_null.drop_duplicates()
         
         # Infer type
         type_info = infer_column_type(values)
@@ -57,59 +151,103 @@ class QualityAgent:
             'non_null_count': len(non_null),
             'type': type_info['type'],
             'type_confidence': round(type_info['confidence'], 2),
-            'unique': len(set(non_null)),
-            'unique_ratio': round(len(set(non_null)) / len(non_null), 3) if non_null else 0,
-            'sample_values': list(set(non_null))[:5]
+            'unique': len(unique_values),
+            'unique_ratio': round(len(unique_values) / len(non_null), 3) if len(non_null) else 0,
+            'sample_values': unique_values.head(5).tolist()
         }
         
         # Add numeric statistics if applicable
+        numeric_stats = None
         if type_info['type'] in ['numeric', 'continuous', 'ordinal']:
             numeric_stats = calculate_stats(values)
+        
+        self._record_column(column, stats, null_percentage, numeric_stats)
+    
+    def _analyze_sketch(self, column: str, sketch: ColumnSketch):
+        """Analyze a single column from its streaming sketch (approximate mode)"""
+        non_null_count = sketch.non_null_count
+        null_percentage = (sketch.nulls / sketch.rows) * 100 if sketch.rows else 0
+        
+        # Infer type from the uniform sample; estimate distinct values with HyperLogLog
+        sample = pd.Series(sketch.sample.values)
+        unique_values = sample.drop_duplicates()
+        unique_count = len(unique_values)
+        distinct_error = 0.0
+        if not sketch.sample.is_exact:
+            unique_count = min(sketch.distinct.estimate(), non_null_count)
+            distinct_error = sketch.distinct.relative_error
+        type_info = infer_column_type(sample)
+        
+        stats = {
+            'null_count': sketch.nulls,
+            'null_percentage': round(null_percentage, 2),
+            'non_null_count': non_null_count,
+            'type': type_info['type'],
+            'type_confidence': round(type_info['confidence'], 2),
+            'unique': unique_count,
+            'unique_ratio': round(unique_count / non_null_count, 3) if non_null_count else 0,
+            'sample_values': unique_values.head(5).tolist(),
+            'approximation': {
+                'sample_size': len(sample),
+                'distinct_count_relative_error': distinct_error
+            }
+        }
+        
+        numeric_stats = None
+        if type_info['type'] in ['numeric', 'continuous', 'ordinal']:
+            numeric_stats = summarize_numeric_sketch(sketch.numeric)
             if numeric_stats:
-                stats.update(numeric_stats)
-                
-                # Check for outliers
-                if numeric_stats.get('outlier_count', 0) > 0:
-                    outlier_pct = numeric_stats['outlier_percentage']
-                    if outlier_pct > 20:
-                        self._add_issue(
-                            severity='high',
-                            column=column,
-                            issue_type='outliers',
-                            message=f'{numeric_stats["outlier_count"]} outliers ({outlier_pct:.1f}%) detected',
-                            recommendation='Investigate extreme values; consider robust scaling or winsorization'
-                        )
-                    elif outlier_pct > 5:
-                        self._add_issue(
-                            severity='medium',
-                            column=column,
-                            issue_type='outliers',
-                            message=f'{numeric_stats["outlier_count"]} outliers ({outlier_pct:.1f}%) detected',
-                            recommendation='Consider robust scaling methods'
-                        )
-                
-                # Check skewness
-                skewness = numeric_stats.get('skewness')
-                if skewness and abs(skewness) > 1:
+                stats['approximation'].update(numeric_stats.pop('approximation'))
+        
+        self._record_column(column, stats, null_percentage, numeric_stats)
+    
+    def _record_column(self, column: str, stats: Dict[str, Any], null_percentage: float,
+                       numeric_stats: Optional[Dict[str, Any]]):
+        """Merge numeric statistics, flag quality issues and store the column's stats"""
+        if numeric_stats:
+            stats.update(numeric_stats)
+            # Check for outliers
+            if numeric_stats.get('outlier_count', 0) > 0:
+                outlier_pct = numeric_stats['outlier_percentage']
+                if outlier_pct > 20:
                     self._add_issue(
-                        severity='low',
+                        severity='high',
                         column=column,
-                        issue_type='distribution',
-                        message=f'High skewness ({skewness:.2f})',
-                        recommendation='Consider log or Box-Cox transformation'
+                        issue_type='outliers',
+                        message=f'{numeric_stats["outlier_count"]} outliers ({outlier_pct:.1f}%) detected',
+                        recommendation='Investigate extreme values; consider robust scaling or winsorization'
                     )
-                
-                # Check variance
-                std = numeric_stats.get('std')
-                if std and std < 0.001:
+                elif outlier_pct > 5:
                     self._add_issue(
                         severity='medium',
                         column=column,
-                        issue_type='variance',
-                        message='Very low variance',
-                        recommendation='Column may not be useful for modeling'
+                        issue_type='outliers',
+                        message=f'{numeric_stats["outlier_count"]} outliers ({outlier_pct:.1f}%) detected',
+                        recommendation='Consider robust scaling methods'
                     )
-        
+            
+            # Check skewness
+            skewness = numeric_stats.get('skewness')
+            if skewness and abs(skewness) > 1:
+                self._add_issue(
+                    severity='low',
+                    column=column,
+                    issue_type='distribution',
+                    message=f'High skewness ({skewness:.2f})',
+                    recommendation='Consider log or Box-Cox transformation'
+                )
+            
+            # Check variance
+            std = numeric_stats.get('std')
+            if std and std < 0.001:
+                self._add_issue(
+                    severity='medium',
+                    column=column,
+                    issue_type='variance',
+                    message='Very low variance',
+                    recommendation='Column may not be useful for modeling'
+                )
+    
         # Check for missing values
         if null_percentage > 50:
             self._add_issue(
@@ -129,7 +267,7 @@ class QualityAgent:
             )
         
         # High cardinality for categorical
-        if type_info['type'] == 'categorical' and stats['unique'] > 50:
+        if stats['type'] == 'categorical' and stats['unique'] > 50:
             self._add_issue(
                 severity='medium',
                 column=column,
@@ -139,7 +277,7 @@ class QualityAgent:
             )
         
         # ID column detection
-        if type_info['type'] == 'identifier':
+        if stats['type'] == 'identifier':
             self._add_issue(
                 severity='low',
                 column=column,
@@ -149,7 +287,7 @@ class QualityAgent:
             )
         
         # Constant value
-        if stats['unique'] == 1 and len(non_null) > 0:
+        if stats['unique'] == 1 and stats['non_null_count'] > 0:
             self._add_issue(
                 severity='high',
                 column=column,
@@ -171,29 +309,49 @@ class QualityAgent:
             'recommendation': recommendation
         })
     
-    def _find_correlations(self, df: pd.DataFrame):
-        """Find highly correlated columns"""
-        numeric_cols = [
+    def _numeric_columns(self) -> List[str]:
+        """Columns profiled as numeric, in analysis order"""
+        return [
             col for col, stats in self.column_stats.items()
             if stats['type'] in ['numeric', 'continuous', 'ordinal']
         ]
-        
-        for i, col1 in enumerate(numeric_cols):
-            for col2 in numeric_cols[i+1:]:
-                corr = calculate_correlation(df, col1, col2)
-                if abs(corr) > 0.8:
-                    self.correlations.append({
-                        'col1': col1,
-                        'col2': col2,
-                        'correlation': round(corr, 3)
-                    })
-                    self._add_issue(
-                        severity='medium' if abs(corr) > 0.9 else 'low',
-                        column=f'{col1} & {col2}',
-                        issue_type='correlation',
-                        message=f'High correlation: {corr:.3f}',
-                        recommendation='Consider removing one to reduce multicollinearity'
-                    )
+    
+    def _find_correlations(self, df: pd.DataFrame):
+        """Find highly correlated columns"""
+        # One correlation matrix over all numeric columns instead of pair-by-pair scans
+        self._record_correlations(find_high_correlations(
+            df, self._numeric_columns(), threshold=0.8, method=self.correlation_method
+        ))
+    
+    def _record_correlations(self, pairs: List[Tuple[str, str, float]]):
+        """Store correlated pairs and flag them as issues"""
+        for col1, col2, corr in pairs:
+            self.correlations.append({
+                'col1': col1,
+                'col2': col2,
+                'correlation': round(corr, 3)
+            })
+            self._add_issue(
+                severity='medium' if abs(corr) > 0.9 else 'low',
+                column=f'{col1} & {col2}',
+                issue_type='correlation',
+                message=f'High correlation: {corr:.3f}',
+                recommendation='Consider removing one to reduce multicollinearity'
+            )
+    
+    def _approximation_summary(self) -> Dict[str, Any]:
+        """Report sample size and worst-case error bounds used in approximate mode"""
+        column_info = [s['approximation'] for s in self.column_stats.values() if 'approximation' in s]
+        return {
+            'enabled': True,
+            'sample_size': self.sample_size,
+            'max_distinct_count_relative_error': max(
+                (info['distinct_count_relative_error'] for info in column_info), default=0.0
+            ),
+            'max_quantile_rank_error': max(
+                (info.get('quantile_rank_error', 0.0) for info in column_info), default=0.0
+            )
+        }
     
     def _calculate_quality_score(self) -> float:
         """Calculate overall quality score (0-100)"""
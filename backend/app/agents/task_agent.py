@@ -1,4 +1,4 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union
 import pandas as pd
 from app.utils.statistics import infer_column_type
 
@@ -8,20 +8,20 @@ class TaskAgent:
     def __init__(self):
         pass
     
-    def detect(self, data: List[Dict], columns: List[str], 
+    def detect(self, data: Union[pd.DataFrame, List[Dict]], columns: List[str], 
                column_stats: Dict[str, Any]) -> Dict[str, Any]:
         """
         Detect ML task type and target column
         
         Args:
-            data: List of dictionaries representing rows
+            data: DataFrame (or list of row dictionaries) to analyze
             columns: List of column names
             column_stats: Statistics from quality agent
             
         Returns:
             Dictionary with task detection results
         """
-        df = pd.DataFrame(data)
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
         
         # Try to detect target column
         target_info = self._detect_target_column(df, columns, column_stats)
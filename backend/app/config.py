@@ -17,4 +17,67 @@ class Config:
 
     # existing configs
     UPLOAD_FOLDER = tempfile.gettempdir()
-    MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB
\ No newline at end of file
+    MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB
+
+    # Content-addressed cache of parsed uploads (see app/utils/dataset_store.py)
+    DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", os.path.join(UPLOAD_FOLDER, "lotus_datasets"))
+    DATASET_CACHE_MAX_BYTES = int(os.getenv("DATASET_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+    DATASET_CACHE_MAX_ENTRIES = int(os.getenv("DATASET_CACHE_MAX_ENTRIES", 100))
+
+    # Cores shared by the training and batch scoring jobs of one server process
+    # (app/utils/cpu_budget.py); with several processes, give each its share
+    CPU_BUDGET = int(os.getenv("CPU_BUDGET", os.cpu_count() or 1))
+    # How worker processes of /api/race and /api/tune start: forkserver or
+    # spawn (fork is unsafe in the multithreaded, OpenMP-using server process)
+    WORKER_START_METHOD = os.getenv("WORKER_START_METHOD", "forkserver")
+
+    # Worker processes for /api/race (defaults to one per CPU, capped by CPU_BUDGET)
+    RACE_MAX_WORKERS = int(os.getenv("RACE_MAX_WORKERS", os.cpu_count() or 1))
+    # Worker processes and candidate cap of /api/tune (hyperparameter search)
+    TUNE_MAX_WORKERS = int(os.getenv("TUNE_MAX_WORKERS", os.cpu_count() or 1))
+    TUNE_MAX_CANDIDATES = int(os.getenv("TUNE_MAX_CANDIDATES", 256))
+
+    # Shared R2 client and upload executor (app/utils/r2_storage.py)
+    R2_MAX_POOL_CONNECTIONS = int(os.getenv("R2_MAX_POOL_CONNECTIONS", 20))
+    R2_UPLOAD_WORKERS = int(os.getenv("R2_UPLOAD_WORKERS", 4))
+    R2_MAX_PENDING_UPLOADS = int(os.getenv("R2_MAX_PENDING_UPLOADS", 32))
+    R2_CONNECT_TIMEOUT = int(os.getenv("R2_CONNECT_TIMEOUT", 5))
+    R2_READ_TIMEOUT = int(os.getenv("R2_READ_TIMEOUT", 60))
+    R2_MAX_ATTEMPTS = int(os.getenv("R2_MAX_ATTEMPTS", 3))
+    # Multipart / ranged transfers; keep R2_MAX_POOL_CONNECTIONS at least
+    # R2_UPLOAD_WORKERS * R2_TRANSFER_CONCURRENCY
+    R2_MULTIPART_THRESHOLD = int(os.getenv("R2_MULTIPART_THRESHOLD", 16 * 1024 ** 2))
+    R2_MULTIPART_CHUNKSIZE = int(os.getenv("R2_MULTIPART_CHUNKSIZE", 8 * 1024 ** 2))
+    R2_TRANSFER_CONCURRENCY = int(os.getenv("R2_TRANSFER_CONCURRENCY", 4))
+    R2_SPOOL_MAX_BYTES = int(os.getenv("R2_SPOOL_MAX_BYTES", 16 * 1024 ** 2))
+
+    # Model artifact compression: auto (zstd > lz4 > gzip), zstd, lz4, gzip or none
+    # (none lets local copies be memory-mapped); level None = codec default
+    MODEL_ARTIFACT_CODEC = os.getenv("MODEL_ARTIFACT_CODEC", "auto")
+    MODEL_ARTIFACT_LEVEL = int(os.getenv("MODEL_ARTIFACT_LEVEL")) if os.getenv("MODEL_ARTIFACT_LEVEL") else None
+
+    # Loaded models kept in memory by /api/model/predict (app/utils/model_cache.py)
+    MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", 512 * 1024 ** 2))
+    MODEL_CACHE_TTL = int(os.getenv("MODEL_CACHE_TTL", 3600))
+    # Local disk tier in front of R2; the N most used models are fetched at startup
+    MODEL_DISK_CACHE_DIR = os.getenv("MODEL_DISK_CACHE_DIR", os.path.join(UPLOAD_FOLDER, "lotus_models"))
+    MODEL_DISK_CACHE_MAX_BYTES = int(os.getenv("MODEL_DISK_CACHE_MAX_BYTES", 5 * 1024 ** 3))
+    MODEL_DISK_CACHE_WARM = int(os.getenv("MODEL_DISK_CACHE_WARM", 20))
+    # Seconds between writes of the prediction counts that rank the warm-up
+    MODEL_USAGE_FLUSH_SECONDS = float(os.getenv("MODEL_USAGE_FLUSH_SECONDS", 10))
+    # Rows scored per chunk by /api/model/predict/batch
+    PREDICT_BATCH_CHUNK_ROWS = int(os.getenv("PREDICT_BATCH_CHUNK_ROWS", 50_000))
+    # Records accepted per /api/model/predict/json request
+    PREDICT_JSON_MAX_RECORDS = int(os.getenv("PREDICT_JSON_MAX_RECORDS", 1000))
+    # Opt-in micro-batching of concurrent JSON predictions for the same model:
+    # a longer window gives larger batches (throughput) at the cost of latency
+    PREDICT_MICROBATCH = os.getenv("PREDICT_MICROBATCH", "false").lower() == "true"
+    PREDICT_MICROBATCH_WINDOW_MS = float(os.getenv("PREDICT_MICROBATCH_WINDOW_MS", 3))
+    PREDICT_MICROBATCH_MAX_SIZE = int(os.getenv("PREDICT_MICROBATCH_MAX_SIZE", 64))
+
+    # Background training jobs (app/utils/job_queue.py)
+    JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", 2))
+    JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", 20))
+    JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", 3600))
+    # Seconds between keep-alive comments on /api/jobs/<id>/events
+    JOB_EVENTS_HEARTBEAT = int(os.getenv("JOB_EVENTS_HEARTBEAT", 15))
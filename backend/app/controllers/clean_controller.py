@@ -1,27 +1,31 @@
 # app/controllers/clean_controller.py
 from flask import Blueprint, request, jsonify
 import pandas as pd
-import io
 import json
 from app.services.clean_service import clean_data
+from app.utils.dataset_store import get_dataset_store, dataset_id_from_request, DatasetNotFound
 
 clean_bp = Blueprint('clean', __name__)
 
+def _resolve_dataset():
+    """Store the uploaded file (or look up form dataset_id); returns (dataset_id, error_response)"""
+    file = request.files.get('file')
+    if file is None and not request.form.get('dataset_id'):
+        return None, (jsonify({'error': 'No file uploaded'}), 400)
+    if file is not None and not file.filename.endswith(('.csv', '.xls', '.xlsx')):
+        return None, (jsonify({'error': 'Unsupported file format. Use CSV or Excel.'}), 400)
+    try:
+        return dataset_id_from_request(request), None
+    except DatasetNotFound:
+        return None, (jsonify({'error': 'Unknown or expired dataset_id'}), 404)
+
 @clean_bp.route('/api/clean-data', methods=['POST'])
 def clean_data_endpoint():
     try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file uploaded'}), 400
-        
-        file = request.files['file']
-        
-        # Read file based on extension
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(file.read()))
-        elif file.filename.endswith(('.xls', '.xlsx')):
-            df = pd.read_excel(io.BytesIO(file.read()))
-        else:
-            return jsonify({'error': 'Unsupported file format. Use CSV or Excel.'}), 400
+        dataset_id, error = _resolve_dataset()
+        if error:
+            return error
+        df = get_dataset_store().load(dataset_id)
         
         # Get cleaning parameters from request
         scaling_method = request.form.get('scaling_method', 'Standard')
@@ -43,7 +47,8 @@ def clean_data_endpoint():
             'cleaned_data': cleaned_csv,
             'rows': len(cleaned_df),
             'columns': len(cleaned_df.columns),
-            'columns_list': list(cleaned_df.columns)
+            'columns_list': list(cleaned_df.columns),
+            'dataset_id': dataset_id
         })
         
     except Exception as e:
@@ -52,18 +57,16 @@ def clean_data_endpoint():
 @clean_bp.route('/api/analyze-data', methods=['POST'])
 def analyze_data():
     try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file uploaded'}), 400
-        
-        file = request.files['file']
+        dataset_id, error = _resolve_dataset()
+        if error:
+            return error
         
-        # Read file based on extension
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(file.read()))
-        elif file.filename.endswith(('.xls', '.xlsx')):
-            df = pd.read_excel(io.BytesIO(file.read()))
-        else:
-            return jsonify({'error': 'Unsupported file format. Use CSV or Excel.'}), 400
+        # The profile only depends on the content, so it is computed once per dataset
+        store = get_dataset_store()
+        cached = store.get_profile(dataset_id, 'analyze-data')
+        if cached is not None:
+            return jsonify(cached)
+        df = store.load(dataset_id)
         
         # Analyze the data
         analysis = {
@@ -75,9 +78,13 @@ def analyze_data():
             'missing_percentage': (df.isnull().sum() / len(df) * 100).round(2).to_dict(),
             'numerical_columns': df.select_dtypes(include=['int64', 'float64']).columns.tolist(),
             'categorical_columns': df.select_dtypes(include=['object', 'category']).columns.tolist(),
-            'sample_data': df.head(5).to_dict(orient='records')
+            'sample_data': df.head(5).to_dict(orient='records'),
+            'dataset_id': dataset_id
         }
         
+        # Round-trip through the JSON encoder so the cached copy matches the response
+        analysis = json.loads(jsonify(analysis).get_data(as_text=True))
+        store.put_profile(dataset_id, 'analyze-data', analysis)
         return jsonify(analysis)
         
     except Exception as e:
@@ -1,15 +1,67 @@
-from flask import request, jsonify
-from app.services.ml_service import linear_regression_algo, logistic_regression_algo,  decision_tree_classifier_algo, knn_classifier_algo, random_forest_classifier_algo, ridge_regression_algo, svm_classifier_algo, lasso_regression_algo, elastic_net_regression_algo, adaboost_classifier_algo, gradient_boosting_classifier_algo, principal_component_analysis_algo
+import json
+import os
+import tempfile
+from flask import request, jsonify, current_app
+from app.services.ml_service import linear_regression_algo, logistic_regression_algo,  decision_tree_classifier_algo, knn_classifier_algo, random_forest_classifier_algo, ridge_regression_algo, svm_classifier_algo, lasso_regression_algo, elastic_net_regression_algo, adaboost_classifier_algo, gradient_boosting_classifier_algo, principal_component_analysis_algo, incremental_sgd_algo
 from app.services.neural_services import neural_network_regression_algo    
 from app.services.image_classifier import train_image_classifier
+from app.services.model_race import race_models
+from app.services.model_tuning import SEARCH_METHODS, tune_model
+from app.utils.dataset_store import get_dataset_store, dataset_id_from_request, DatasetNotFound
+from app.utils.job_queue import get_job_queue, QueueFull
+
+def _spool_upload(file):
+    """Copy an upload to a temp file that outlives the request"""
+    suffix = os.path.splitext(file.filename or '')[1] or '.csv'
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(fd, 'wb') as out:
+        file.save(out)
+    return path
+
+
+def _submit_training_job(train, name, meta, temp_path=None):
+    """Queue train() as a background job and answer 202 with the job id"""
+    def run():
+        try:
+            return train()
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    try:
+        job = get_job_queue().submit(run, name, meta)
+    except QueueFull as e:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        return jsonify({'error': f'Training queue is full: {e}'}), 503
+
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/jobs/{job.id}',
+        'result_url': f'/api/jobs/{job.id}/result',
+        'cancel_url': f'/api/jobs/{job.id}/cancel',
+    }), 202
+
 
 def model_training():
     try:
-        if ('file' not in request.files) and ('dataset' not in request.files):
+        dataset_id = request.form.get('dataset_id')
+        if ('file' not in request.files) and ('dataset' not in request.files) and not dataset_id:
             return jsonify({'error': 'No file uploaded'}), 400
         
-        if 'file' in request.files:
-            f = request.files['file']
+        if 'file' in request.files or dataset_id:
+            if request.form.get('model') == "incremental-sgd" and 'file' in request.files:
+                # Trained out of core straight from the upload stream
+                f = request.files['file']
+                dataset_id = None
+            else:
+                # Parsed once per content hash and shared with the other dataset endpoints
+                try:
+                    dataset_id = dataset_id_from_request(request)
+                except DatasetNotFound:
+                    return jsonify({'error': 'Unknown or expired dataset_id'}), 404
+                f = get_dataset_store().load(dataset_id)
             target_column = request.form.get('target_column')  # get frontend selected column
             random_state = int(request.form.get('random_state'))
             test_size = float(request.form.get('test_size'))
@@ -103,6 +155,12 @@ def model_training():
         elif model=="ridge-regression":
             alpha = float(request.form.get('alpha'))
 
+        elif model == "incremental-sgd":
+            # Streams the upload in chunks; task_type picks SGDRegressor or SGDClassifier
+            task_type = request.form.get("task_type")
+            if task_type in [None, "", "null"]:
+                task_type = "regression"
+
         elif model=="image-classifier":
             import tempfile, zipfile, os
             zip_file = request.files["dataset"]
@@ -237,6 +295,11 @@ def model_training():
             if algorithm in [None, "", "null"]:
                 algorithm = "SAMME"      # default
                     # allowed: "SAMME"
+
+            # engine (string): auto, exact or hist
+            engine = request.form.get("engine")
+            if engine in [None, "", "null"]:
+                engine = "auto"          # histogram boosting on large datasets
                     
                     
         elif model == "gradient-boosting":
@@ -294,7 +357,12 @@ def model_training():
                     max_features = float(max_features)
                 else:
                     max_features = int(max_features)
-                    
+
+            # engine (string): auto, exact or hist
+            engine = request.form.get("engine")
+            if engine in [None, "", "null"]:
+                engine = "auto"          # histogram boosting on large datasets
+
         elif model == "principal-component-analysis":
             # n_components (int or float)
             n_components = request.form.get("n_components")
@@ -327,46 +395,63 @@ def model_training():
                 target_column = None
 
 
-        # Pass target_column to process_csv
         model = request.form.get('model')
-        match (model):
-            case "linear-regression":
-                result = linear_regression_algo(f, target_column, test_size, random_state, cleaned_data=not enable_data_cleaning)
-            case "logistic-regression":
-                result = logistic_regression_algo(f, target_column, test_size, random_state, cleaned_data=not enable_data_cleaning)
-            case "KNN":
-                result = knn_classifier_algo(f, target_column, test_size, random_state, cleaned_data=not enable_data_cleaning, n_neighbors=n_neighbors, weights=weights, algorithm=algorithm, metric=metric)
-            case "decision-tree":
-                result = decision_tree_classifier_algo(f, target_column, test_size, random_state, cleaned_data=not enable_data_cleaning, criterion=criterion, max_depth=max_depth, min_samples_split=min_samples_split, min_samples_leaf=min_samples_leaf)
-            case "random-forest":
-                result = random_forest_classifier_algo(f, target_column, test_size, random_state, cleaned_data =not enable_data_cleaning, n_estimators=n_estimators, criterion=criterion, max_depth=max_depth, min_samples_split=min_samples_split, min_samples_leaf=min_samples_leaf, class_weight=class_weight)
-            case "neural-network":
-                result = neural_network_regression_algo(f, target_column, test_size, random_state, cleaned_data=not enable_data_cleaning,hidden_layer_sizes=hidden_layer_sizes, activation=activation, solver=solver, max_iter=max_iter)
-            case "ridge-regression":
-                result = ridge_regression_algo(f, target_column, test_size, random_state, cleaned_data=not enable_data_cleaning, alpha=alpha)
-            case "image-classifier":
-                result = train_image_classifier(
-                    dataset_path,
-                    # img_size=(24, 24),
-                    batch_size=batch_size,
-                    epochs=epochs,
-                    learning_rate=learning_rate,
-                )
-            case "support-vector-machine":
-                result = svm_classifier_algo(f,target_column,test_size,random_state,cleaned_data=not enable_data_cleaning,kernel=kernel,C=C,gamma=gamma,degree=degree,shrinking=shrinking,probability=probability,class_weight=class_weight)
-            case "lasso-regression":
-                result = lasso_regression_algo(f,target_column,test_size,random_state,cleaned_data = not enable_data_cleaning,alpha = alpha,max_iter = max_iter)
-            case "elastic-net":
-                result = elastic_net_regression_algo(f,target_column,test_size,random_state,cleaned_data=not enable_data_cleaning,alpha=alpha,l1_ratio=l1_ratio,max_iter=max_iter)
-            case "adaboost":
-                result = adaboost_classifier_algo(f,target_column,test_size,random_state,cleaned_data=not enable_data_cleaning,n_estimators=n_estimators,learning_rate=learning_rate,algorithm=algorithm)
-            case "gradient-boosting":
-                result = gradient_boosting_classifier_algo(f,target_column,test_size,random_state,cleaned_data=not enable_data_cleaning,n_estimators=n_estimators,learning_rate=learning_rate,max_depth=max_depth,subsample=subsample,min_samples_split=min_samples_split,min_samples_leaf=min_samples_leaf,max_features=max_features)
-            case "principal-component-analysis":
-                result = principal_component_analysis_algo(f,target_column,n_components=n_components,cleaned_data=not enable_data_cleaning,scale_data=scale_data,random_state=random_state)
-            case _:  # default case
-                raise ValueError(f"Unknown model: {model}")
-    
+
+        # The fit itself; runs inline or on the background job queue
+        def train():
+            match (model):
+                case "linear-regression":
+                    result = linear_regression_algo(f, target_column, test_size, random_state, cleaned_data=not enable_data_cleaning)
+                case "logistic-regression":
+                    result = logistic_regression_algo(f, target_column, test_size, random_state, cleaned_data=not enable_data_cleaning)
+                case "KNN":
+                    result = knn_classifier_algo(f, target_column, test_size, random_state, cleaned_data=not enable_data_cleaning, n_neighbors=n_neighbors, weights=weights, algorithm=algorithm, metric=metric)
+                case "decision-tree":
+                    result = decision_tree_classifier_algo(f, target_column, test_size, random_state, cleaned_data=not enable_data_cleaning, criterion=criterion, max_depth=max_depth, min_samples_split=min_samples_split, min_samples_leaf=min_samples_leaf)
+                case "random-forest":
+                    result = random_forest_classifier_algo(f, target_column, test_size, random_state, cleaned_data =not enable_data_cleaning, n_estimators=n_estimators, criterion=criterion, max_depth=max_depth, min_samples_split=min_samples_split, min_samples_leaf=min_samples_leaf, class_weight=class_weight)
+                case "neural-network":
+                    result = neural_network_regression_algo(f, target_column, test_size, random_state, cleaned_data=not enable_data_cleaning,hidden_layer_sizes=hidden_layer_sizes, activation=activation, solver=solver, max_iter=max_iter)
+                case "ridge-regression":
+                    result = ridge_regression_algo(f, target_column, test_size, random_state, cleaned_data=not enable_data_cleaning, alpha=alpha)
+                case "image-classifier":
+                    result = train_image_classifier(
+                        dataset_path,
+                        # img_size=(24, 24),
+                        batch_size=batch_size,
+                        epochs=epochs,
+                        learning_rate=learning_rate,
+                    )
+                case "support-vector-machine":
+                    result = svm_classifier_algo(f,target_column,test_size,random_state,cleaned_data=not enable_data_cleaning,kernel=kernel,C=C,gamma=gamma,degree=degree,shrinking=shrinking,probability=probability,class_weight=class_weight)
+                case "lasso-regression":
+                    result = lasso_regression_algo(f,target_column,test_size,random_state,cleaned_data = not enable_data_cleaning,alpha = alpha,max_iter = max_iter)
+                case "elastic-net":
+                    result = elastic_net_regression_algo(f,target_column,test_size,random_state,cleaned_data=not enable_data_cleaning,alpha=alpha,l1_ratio=l1_ratio,max_iter=max_iter)
+                case "adaboost":
+                    result = adaboost_classifier_algo(f,target_column,test_size,random_state,cleaned_data=not enable_data_cleaning,n_estimators=n_estimators,learning_rate=learning_rate,algorithm=algorithm,engine=engine)
+                case "gradient-boosting":
+                    result = gradient_boosting_classifier_algo(f,target_column,test_size,random_state,cleaned_data=not enable_data_cleaning,n_estimators=n_estimators,learning_rate=learning_rate,max_depth=max_depth,subsample=subsample,min_samples_split=min_samples_split,min_samples_leaf=min_samples_leaf,max_features=max_features,engine=engine)
+                case "principal-component-analysis":
+                    result = principal_component_analysis_algo(f,target_column,n_components=n_components,cleaned_data=not enable_data_cleaning,scale_data=scale_data,random_state=random_state)
+                case "incremental-sgd":
+                    result = incremental_sgd_algo(f,target_column,test_size,random_state,task_type=task_type)
+                case _:  # default case
+                    raise ValueError(f"Unknown model: {model}")
+            if dataset_id and 'error' not in result:
+                result['dataset_id'] = dataset_id
+            return result
+
+        if request.form.get('async', 'false').lower() == 'true':
+            temp_path = None
+            if model == "incremental-sgd" and not dataset_id:
+                # The upload stream closes with the request; the job reads a copy
+                temp_path = _spool_upload(f)
+                f = temp_path
+            return _submit_training_job(train, model, {'model': model, 'dataset_id': dataset_id}, temp_path)
+
+        result = train()
+
         # If process_csv returns an error
         if 'error' in result:
             return jsonify(result), 400
@@ -376,6 +461,155 @@ def model_training():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
+def model_race():
+    """
+    Train several candidate models on one upload in parallel and rank them
+
+    Form fields: file or dataset_id, models (JSON list of model names or
+    {"model": ..., "params": {...}} specs), target_column, test_size,
+    random_state, enable_data_cleaning, include_results, async (queue the
+    race as a background job and answer 202 with its job id)
+    """
+    try:
+        try:
+            dataset_id = dataset_id_from_request(request)
+        except DatasetNotFound:
+            return jsonify({'error': 'Unknown or expired dataset_id'}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            models = json.loads(request.form.get('models') or '[]')
+        except ValueError:
+            return jsonify({'error': 'models must be a JSON list'}), 400
+        if not isinstance(models, list) or not models:
+            return jsonify({'error': 'models must be a non-empty JSON list'}), 400
+
+        random_state = request.form.get('random_state')
+        random_state = None if random_state in [None, "", "null"] else int(random_state)
+        test_size = float(request.form.get('test_size') or 0.3)
+        enable_data_cleaning = request.form.get('enable_data_cleaning', 'true').lower() == 'true'
+        include_results = request.form.get('include_results', 'false').lower() == 'true'
+
+        target_column = request.form.get('target_column') or None
+        data = get_dataset_store().load(dataset_id)
+        max_workers = current_app.config.get('RACE_MAX_WORKERS')
+
+        def race():
+            result = race_models(
+                models,
+                data,
+                target_column=target_column,
+                test_size=test_size,
+                random_state=random_state,
+                cleaned_data=not enable_data_cleaning,
+                max_workers=max_workers,
+                include_results=include_results,
+            )
+            if 'error' not in result:
+                result['dataset_id'] = dataset_id
+            return result
+
+        if request.form.get('async', 'false').lower() == 'true':
+            return _submit_training_job(race, 'race', {'models': models, 'dataset_id': dataset_id})
+
+        result = race()
+        if 'error' in result:
+            return jsonify(result), 400
+
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def model_tuning():
+    """
+    Search the hyperparameters of one model with successive halving
+
+    Form fields: file or dataset_id, model, search_space (JSON object mapping
+    params to a list of choices, a {"min", "max", "log", "type"} range or a
+    fixed value), params (JSON object of fixed params), method (halving or
+    hyperband), n_candidates, factor, min_rows, target_column, test_size,
+    random_state, enable_data_cleaning, include_results, async (queue the
+    search as a background job and answer 202 with its job id)
+    """
+    try:
+        try:
+            dataset_id = dataset_id_from_request(request)
+        except DatasetNotFound:
+            return jsonify({'error': 'Unknown or expired dataset_id'}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        model = request.form.get('model')
+        if not model:
+            return jsonify({'error': 'model is required'}), 400
+        try:
+            search_space = json.loads(request.form.get('search_space') or '{}')
+            params = json.loads(request.form.get('params') or '{}')
+        except ValueError:
+            return jsonify({'error': 'search_space and params must be JSON objects'}), 400
+        if not isinstance(search_space, dict) or not search_space:
+            return jsonify({'error': 'search_space must be a non-empty JSON object'}), 400
+        if not isinstance(params, dict):
+            return jsonify({'error': 'params must be a JSON object'}), 400
+
+        method = request.form.get('method') or 'halving'
+        if method not in SEARCH_METHODS:
+            return jsonify({'error': f"method must be one of: {', '.join(SEARCH_METHODS)}"}), 400
+        try:
+            n_candidates = int(request.form.get('n_candidates') or 27)
+            factor = int(request.form.get('factor') or 3)
+            min_rows = int(request.form.get('min_rows') or 200)
+        except ValueError:
+            return jsonify({'error': 'n_candidates, factor and min_rows must be integers'}), 400
+
+        random_state = request.form.get('random_state')
+        random_state = None if random_state in [None, "", "null"] else int(random_state)
+        test_size = float(request.form.get('test_size') or 0.3)
+        enable_data_cleaning = request.form.get('enable_data_cleaning', 'true').lower() == 'true'
+        include_results = request.form.get('include_results', 'false').lower() == 'true'
+
+        target_column = request.form.get('target_column') or None
+        data = get_dataset_store().load(dataset_id)
+        max_workers = current_app.config.get('TUNE_MAX_WORKERS')
+        max_candidates = current_app.config.get('TUNE_MAX_CANDIDATES', 256)
+
+        def tune():
+            result = tune_model(
+                model,
+                search_space,
+                data,
+                target_column=target_column,
+                test_size=test_size,
+                random_state=random_state,
+                cleaned_data=not enable_data_cleaning,
+                params=params,
+                method=method,
+                n_candidates=n_candidates,
+                factor=factor,
+                min_rows=min_rows,
+                max_candidates=max_candidates,
+                max_workers=max_workers,
+                include_results=include_results,
+            )
+            if 'error' not in result:
+                result['dataset_id'] = dataset_id
+            return result
+
+        if request.form.get('async', 'false').lower() == 'true':
+            return _submit_training_job(tune, 'tune', {'model': model, 'method': method, 'dataset_id': dataset_id})
+
+        result = tune()
+        if 'error' in result:
+            return jsonify(result), 400
+
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # def linear_regression():
 #     try:
 #         if 'file' not in request.files:
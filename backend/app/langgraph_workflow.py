@@ -1,4 +1,4 @@
-from typing import Dict, List, Any, TypedDict
+from typing import Dict, List, Any, Iterable, Optional, TypedDict, Union
 from langgraph.graph import StateGraph, END
 import numpy as np
 import pandas as pd
@@ -6,12 +6,13 @@ from app.agents.quality_agent import QualityAgent
 from app.agents.task_agent import TaskAgent
 from app.agents.feature_agent import FeatureAgent
 from app.agents.model_agent import ModelAgent
+from app.utils.statistics import DEFAULT_SAMPLE_SIZE
 
 
 class AnalysisState(TypedDict):
     """State for the analysis workflow"""
 
-    data: List[Dict]
+    data: pd.DataFrame
     columns: List[str]
     filename: str
     task_type: str
@@ -24,23 +25,35 @@ class AnalysisState(TypedDict):
 
 
 def analyze_dataset_workflow(
-    data: List[Dict],
+    data: Union[pd.DataFrame, List[Dict]],
     columns: List[str],
     task_type: str = None,
     filename: str = "dataset.csv",
+    correlation_method: str = "pearson",
+    approximate: bool = False,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    chunks: Optional[Iterable[pd.DataFrame]] = None,
 ) -> Dict[str, Any]:
     """
     Main workflow for dataset analysis using LangGraph
 
     Args:
-        data: List of dictionaries representing rows
+        data: DataFrame (or list of row dictionaries) shared by every agent
         columns: List of column names
         task_type: Optional task type override
         filename: Original filename
+        correlation_method: 'pearson' or 'spearman' for the correlation scan
+        approximate: Use sampling and sketches instead of exact profiling
+        sample_size: Reservoir size for approximate profiling
+        chunks: Stream of DataFrame chunks to profile instead of data; the
+            quality agent sketches every chunk and later agents use its row sample
 
     Returns:
         Complete analysis results
     """
+    # Build the frame once; agents read from it without copying
+    if data is not None and not isinstance(data, pd.DataFrame):
+        data = pd.DataFrame(data)
 
     # Initialize state
     state: AnalysisState = {
@@ -58,25 +71,43 @@ def analyze_dataset_workflow(
 
     try:
         # Step 1: Initialize agents
-        quality_agent = QualityAgent()
+        quality_agent = QualityAgent(
+            correlation_method=correlation_method,
+            approximate=approximate,
+            sample_size=sample_size,
+        )
         task_agent = TaskAgent()
         feature_agent = FeatureAgent()
         model_agent = ModelAgent()
 
-        # Step 2: Basic dataset info
-        df = pd.DataFrame(data)
-        state["dataset_info"] = {
-            "rows": int(len(df)),  # Convert to int
-            "columns": int(len(columns)),  # Convert to int
-            "headers": columns,
-            "memory_usage_mb": float(
-                df.memory_usage(deep=True).sum() / 1024 / 1024
-            ),  # Convert to float
-        }
-
-        # Step 3: Quality analysis
-        print("Running quality analysis...")
-        state["quality_analysis"] = quality_agent.analyze(data, columns)
+        # Step 2-3: Basic dataset info and quality analysis
+        if chunks is not None:
+            # Streaming: one pass over the chunks, downstream agents see the row sample
+            print("Running streaming quality analysis...")
+            state["quality_analysis"] = quality_agent.analyze_stream(chunks, columns)
+            df = state["data"] = quality_agent.row_sample
+            total_rows = quality_agent.total_rows
+            sample_mb = df.memory_usage(deep=True).sum() / 1024 / 1024
+            state["dataset_info"] = {
+                "rows": int(total_rows),
+                "columns": int(len(columns)),
+                "headers": columns,
+                # Extrapolated from the row sample
+                "memory_usage_mb": float(sample_mb * total_rows / len(df)) if len(df) else 0.0,
+            }
+        else:
+            df = state["data"]
+            state["dataset_info"] = {
+                "rows": int(len(df)),  # Convert to int
+                "columns": int(len(columns)),  # Convert to int
+                "headers": columns,
+                "memory_usage_mb": float(
+                    df.memory_usage(deep=True).sum() / 1024 / 1024
+                ),  # Convert to float
+            }
+
+            print("Running quality analysis...")
+            state["quality_analysis"] = quality_agent.analyze(df, columns)
 
         # Convert numpy types in quality analysis
         if state["quality_analysis"]:
@@ -85,7 +116,7 @@ def analyze_dataset_workflow(
         # Step 4: Task detection
         print("Detecting task type...")
         state["task_analysis"] = task_agent.detect(
-            data, columns, state["quality_analysis"]["stats"]
+            df, columns, state["quality_analysis"]["stats"]
         )
 
         # Convert numpy types in task analysis
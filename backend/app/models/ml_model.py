@@ -36,6 +36,10 @@ class MLModel(db.Model):
     status = db.Column(db.String(20), default='uploading')  # uploading, ready, failed
     upload_completed_at = db.Column(db.DateTime)
     
+    # Prediction usage (most used models are pre-fetched to the local disk cache)
+    prediction_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    last_used_at = db.Column(db.DateTime)
+    
     # User relationship (if you want to track who created the model)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     user = db.relationship('User', backref='models')
@@ -65,6 +69,8 @@ class MLModel(db.Model):
             'test_size': self.test_size,
             'status': self.status,
             'upload_completed_at': self.upload_completed_at.isoformat() if self.upload_completed_at else None,
+            'prediction_count': self.prediction_count,
+            'last_used_at': self.last_used_at.isoformat() if self.last_used_at else None,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
         }
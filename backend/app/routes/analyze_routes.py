@@ -3,11 +3,17 @@ from werkzeug.utils import secure_filename
 import pandas as pd
 import numpy as np
 import os
+import itertools
+import json
 import uuid
 import tempfile
 import traceback
-from app.utils.file_processor import process_file
+from app.utils.file_processor import (
+    iter_file_chunks, typed_chunks, prepare_dataframe, DEFAULT_CHUNK_ROWS
+)
+from app.utils.dataset_store import get_dataset_store, dataset_id_from_request, DatasetNotFound
 from app.langgraph_workflow import analyze_dataset_workflow
+from app.utils.statistics import CORRELATION_METHODS, DEFAULT_SAMPLE_SIZE
 
 analyze_bp = Blueprint("analyze_bp", __name__, url_prefix="/api")
 
@@ -51,49 +57,126 @@ def health_check():
 
 @analyze_bp.route('/analyze', methods=['POST'])
 def analyze_dataset():
-    """Main endpoint for dataset analysis"""
+    """Main endpoint for dataset analysis (upload a file or pass a cached dataset_id)"""
     try:
-        if 'file' not in request.files:
+        file = request.files.get('file')
+        if file is None and not request.form.get('dataset_id'):
             return jsonify({'error': 'No file provided'}), 400
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'File type not allowed. Use CSV or Excel files.'}), 400
-
-        # Save file temporarily
-        filename = secure_filename(file.filename)
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', tempfile.gettempdir())
-        temp_path = os.path.join(upload_folder, f"{uuid.uuid4()}_{filename}")
-        file.save(temp_path)
-
-        # Process file
+        if file is not None:
+            if file.filename == '':
+                return jsonify({'error': 'No file selected'}), 400
+            if not allowed_file(file.filename):
+                return jsonify({'error': 'File type not allowed. Use CSV or Excel files.'}), 400
+
+        correlation_method = request.form.get('correlation_method', 'pearson').lower()
+        if correlation_method not in CORRELATION_METHODS:
+            return jsonify({'error': f"correlation_method must be one of: {', '.join(CORRELATION_METHODS)}"}), 400
+
+        # Opt-in approximate profiling for very large uploads
+        approximate = request.form.get('approximate', 'false').lower() == 'true'
         try:
-            df = process_file(temp_path)
-        except Exception as e:
-            return jsonify({'error': f'Error reading file: {str(e)}'}), 400
-        finally:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            sample_size = int(request.form.get('sample_size', DEFAULT_SAMPLE_SIZE))
+        except ValueError:
+            return jsonify({'error': 'sample_size must be an integer'}), 400
+        if sample_size < 20:
+            return jsonify({'error': 'sample_size must be at least 20'}), 400
 
-        data = df.to_dict('records')
-        columns = list(df.columns)
+        # Streaming profiles CSV chunks in one pass with sketches (implies approximate)
+        streaming = request.form.get('streaming', 'false').lower() == 'true'
         task_type = request.form.get('task_type')
 
-        # Run workflow
-        result = analyze_dataset_workflow(
-            data=data,
-            columns=columns,
-            task_type=task_type,
-            filename=filename
-        )
-        result = make_json_serializable(result)
+        if streaming and file is not None:
+            # New uploads are streamed from disk without being parsed into the cache
+            filename = secure_filename(file.filename)
+            upload_folder = current_app.config.get('UPLOAD_FOLDER', tempfile.gettempdir())
+            temp_path = os.path.join(upload_folder, f"{uuid.uuid4()}_{filename}")
+            file.save(temp_path)
+            try:
+                return _analyze_stream(iter_file_chunks(temp_path), filename, task_type,
+                                       correlation_method, sample_size)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+        store = get_dataset_store()
+        try:
+            dataset_id = dataset_id_from_request(request)
+        except DatasetNotFound:
+            return jsonify({'error': 'Unknown or expired dataset_id'}), 404
+        except ValueError as e:
+            return jsonify({'error': f'Error reading file: {str(e)}'}), 400
+        meta = store.meta(dataset_id)
+        filename = secure_filename(file.filename) if file is not None else meta['filename']
+
+        # Identical requests on the same content reuse the cached analysis
+        profile_key = json.dumps({
+            'endpoint': 'analyze', 'correlation_method': correlation_method,
+            'approximate': approximate or streaming, 'sample_size': sample_size,
+            'streaming': streaming, 'task_type': task_type
+        }, sort_keys=True)
+        cached = store.get_profile(dataset_id, profile_key)
+        if cached is not None:
+            return jsonify(cached)
+
+        if streaming:
+            chunks = typed_chunks(store.iter_chunks(dataset_id, DEFAULT_CHUNK_ROWS))
+            response = _analyze_stream(chunks, filename, task_type, correlation_method, sample_size)
+            if isinstance(response, tuple):
+                return response
+            result = response.get_json()
+        else:
+            # Apply process_file's type conversions, inferred once per dataset
+            try:
+                df, conversions = prepare_dataframe(store.view(dataset_id), meta['conversions'])
+            except DatasetNotFound:
+                return jsonify({'error': 'Unknown or expired dataset_id'}), 404
+            except Exception as e:
+                return jsonify({'error': f'Error reading file: {str(e)}'}), 400
+            if meta['conversions'] is None:
+                store.set_conversions(dataset_id, conversions)
+
+            # Run workflow on the parsed frame directly
+            result = analyze_dataset_workflow(
+                data=df,
+                columns=list(df.columns),
+                task_type=task_type,
+                filename=filename,
+                correlation_method=correlation_method,
+                approximate=approximate,
+                sample_size=sample_size
+            )
+            result = make_json_serializable(result)
+
+        result['dataset_id'] = dataset_id
+        if result.get('success'):
+            store.put_profile(dataset_id, profile_key, result)
         return jsonify(result)
 
     except Exception as e:
         current_app.logger.error(f"Analysis error: {str(e)}\n{traceback.format_exc()}")
         return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
 
+def _analyze_stream(chunks, filename, task_type, correlation_method, sample_size):
+    """Run the streaming workflow over DataFrame chunks and build the response"""
+    try:
+        first = next(chunks, None)
+    except Exception as e:
+        return jsonify({'error': f'Error reading file: {str(e)}'}), 400
+    if first is None:
+        return jsonify({'error': 'Error reading file: file is empty'}), 400
+
+    result = analyze_dataset_workflow(
+        data=None,
+        columns=list(first.columns),
+        task_type=task_type,
+        filename=filename,
+        correlation_method=correlation_method,
+        approximate=True,
+        sample_size=sample_size,
+        chunks=itertools.chain([first], chunks)
+    )
+    return jsonify(make_json_serializable(result))
+
 @analyze_bp.route('/generate_pipeline', methods=['POST'])
 def generate_pipeline():
     """Generate ML pipeline code"""
@@ -0,0 +1,92 @@
+import json
+
+from flask import Blueprint, Response, current_app, jsonify, request
+
+from app.utils.job_queue import get_job_queue
+
+job_bp = Blueprint("jobs", __name__)
+
+
+@job_bp.route("/api/jobs", methods=["GET"])
+def list_jobs():
+    """List the training jobs known to this process, newest first"""
+    jobs = sorted(get_job_queue().list(), key=lambda job: job.created_at, reverse=True)
+    return jsonify({"jobs": [job.to_dict() for job in jobs], "count": len(jobs)})
+
+
+@job_bp.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Status and progress of a training job"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@job_bp.route("/api/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """
+    Server-Sent Events stream of a training job
+
+    Events: 'status' (queued, running, succeeded, failed, cancelled), 'stage'
+    (stage transition with the seconds spent in the previous stage) and
+    'progress' (fraction, elapsed and ETA seconds, epoch / estimator details).
+    Reconnecting clients send Last-Event-ID (or ?last_event_id=) to resume.
+    The stream ends after the job's final status event.
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id") or 0
+    try:
+        last_id = int(last_id)
+    except ValueError:
+        return jsonify({"error": "Invalid Last-Event-ID"}), 400
+    heartbeat = current_app.config.get("JOB_EVENTS_HEARTBEAT", 15)
+
+    def stream():
+        nonlocal last_id
+        yield f"retry: {heartbeat * 1000}\n\n"
+        while True:
+            events = job.wait_events(last_id, timeout=heartbeat)
+            for event in events:
+                last_id = event["id"]
+                payload = json.dumps({"time": event["time"], **event["data"]}, default=str)
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {payload}\n\n"
+            if job.finished and last_id >= job.last_event_id:
+                return
+            if not events:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@job_bp.route("/api/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    """Training result of a finished job (same payload as the synchronous endpoint)"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    if not job.finished:
+        return jsonify({"error": f"Job is not finished. Status: {job.status}", "status": job.status}), 409
+    if job.status == "cancelled":
+        return jsonify({"error": "Job was cancelled", "status": job.status}), 410
+    if job.status == "failed":
+        return jsonify(job.result or {"error": job.error}), 400
+    return jsonify(job.result)
+
+
+@job_bp.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    """Cancel a queued job, or stop a running one at its next checkpoint"""
+    job = get_job_queue().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 202
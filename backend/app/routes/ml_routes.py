@@ -1,11 +1,13 @@
 from flask import Blueprint
-from app.controllers.ml_controller import model_training
+from app.controllers.ml_controller import model_training, model_race, model_tuning
 from flask import request, jsonify, send_file
 import os
 
 ml = Blueprint('ml', __name__)
 
 ml.route('/api/perform', methods=['POST'])(model_training)
+ml.route('/api/race', methods=['POST'])(model_race)
+ml.route('/api/tune', methods=['POST'])(model_tuning)
 
 
 @ml.route('/api/download-model', methods=['POST'])
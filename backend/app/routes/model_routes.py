@@ -1,13 +1,54 @@
-from flask import Blueprint, request, jsonify
-from app.utils.r2_storage import R2Storage
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from app.utils.r2_storage import get_r2_storage
+from app.utils.cpu_budget import get_cpu_budget
+from app.utils.model_cache import get_model_cache, get_model_disk_cache, get_usage_counter
+from app.utils.dataset_store import get_dataset_store, DatasetNotFound
+from app.utils.micro_batcher import get_micro_batcher
+from app.utils.file_processor import iter_file_chunks
+from app.services.prediction_service import (
+    BATCH_FORMATS,
+    format_chunks,
+    format_error,
+    predict_records,
+    score_chunks,
+    unpack_model,
+)
 from app.models.ml_model import MLModel
 from app.database.sql_db import db
+import numpy as np
 import pandas as pd
 import io
+import itertools
+import os
+import tempfile
+import uuid
+from werkzeug.utils import secure_filename
 
 model_bp = Blueprint("model", __name__)
 
 
+def _load_cached_model(ml_model):
+    """Model object of an MLModel row: memory cache, then local disk cache, then R2"""
+    disk_cache = get_model_disk_cache()
+    storage = get_r2_storage()
+    return get_model_cache().get(
+        ml_model.model_id,
+        ml_model.r2_path,
+        lambda: disk_cache.load(ml_model.model_id, ml_model.r2_path, storage),
+    )
+
+
+def _record_usage(ml_model):
+    """Count a prediction (in memory; the counts drive the disk cache warm-up)"""
+    get_usage_counter().record(ml_model.id)
+
+
+def _remove_file(path):
+    """Delete a temporary upload, if any"""
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
 @model_bp.route("/api/model/status/<model_id>", methods=["GET"])
 def check_model_status(model_id):
     """Check model status from DATABASE (fast query)"""
@@ -50,9 +91,8 @@ def predict_with_model():
         if ml_model.status != 'ready':
             return jsonify({"error": f"Model is not ready. Status: {ml_model.status}"}), 400
 
-        # Load ONLY the sklearn model from R2
-        r2_storage = R2Storage()
-        sklearn_model = r2_storage.load_model_only(ml_model.r2_path)
+        # Load the model and its preprocessing (cached in memory after the first request)
+        sklearn_model, pipeline = unpack_model(_load_cached_model(ml_model), ml_model.feature_names)
 
         # Read input data
         file = request.files["file"]
@@ -66,51 +106,213 @@ def predict_with_model():
             # Read as CSV
             df = pd.read_csv(file)
 
-        # Get feature names from database
-        import json
-        feature_names = json.loads(ml_model.feature_names)
-        
         # Check if all required features are present
-        missing_features = [f for f in feature_names if f not in df.columns]
+        missing_features = pipeline.missing_columns(df.columns)
         if missing_features:
             return jsonify({
                 "error": f"Missing required features: {', '.join(missing_features)}",
-                "required_features": feature_names,
+                "required_features": pipeline.input_columns,
                 "provided_features": df.columns.tolist()
             }), 400
         
         # Prepare features (same preprocessing as training)
-        # Apply one-hot encoding for categorical columns if needed
-        X = df.copy()
-        X = pd.get_dummies(X, drop_first=True)
-        
-        # Select only the features used during training
         try:
-            X = X[feature_names]
-        except KeyError as e:
-            # If after encoding we still don't have the right columns
+            X = pipeline.transform(df)
+        except ValueError as e:
             return jsonify({
                 "error": "Feature mismatch after encoding",
                 "details": str(e),
-                "required_features": feature_names,
-                "available_features": X.columns.tolist(),
+                "required_features": pipeline.input_columns,
                 "hint": "Make sure your data has the same structure as the training data"
             }), 400
 
         # Make predictions
-        predictions = sklearn_model.predict(X)
+        predictions = pipeline.decode(sklearn_model.predict(X))
+        model_info = ml_model.to_dict()
+        _record_usage(ml_model)
 
         return jsonify({
             "model_id": model_id,
-            "predictions": [float(pred) for pred in predictions],
+            "predictions": np.asarray(predictions).tolist(),
             "n_predictions": len(predictions),
-            "model_info": ml_model.to_dict()
+            "model_info": model_info
         })
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@model_bp.route("/api/model/predict/json", methods=["POST"])
+def predict_json():
+    """
+    Score one record or a small list of records sent as JSON
+
+    Body: {"model_id": ..., "record": {...}} or {"model_id": ..., "records": [{...}, ...]},
+    with an optional "proba": true for class probabilities. Records use the
+    training columns (categorical columns as raw values or one-hot columns).
+    """
+    try:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
+
+        model_id = payload.get("model_id")
+        if not model_id:
+            return jsonify({"error": "model_id is required"}), 400
+
+        single = "record" in payload
+        records = [payload["record"]] if single else payload.get("records")
+        if not isinstance(records, list) or not records:
+            return jsonify({"error": "Send a 'record' object or a non-empty 'records' list"}), 400
+        max_records = current_app.config.get("PREDICT_JSON_MAX_RECORDS", 1000)
+        if len(records) > max_records:
+            return jsonify({
+                "error": f"At most {max_records} records per request; use /api/model/predict/batch for more"
+            }), 413
+
+        ml_model = MLModel.query.filter_by(model_id=model_id).first()
+        if not ml_model:
+            return jsonify({"error": "Model not found"}), 404
+        if ml_model.status != 'ready':
+            return jsonify({"error": f"Model is not ready. Status: {ml_model.status}"}), 400
+
+        model, pipeline = unpack_model(_load_cached_model(ml_model), ml_model.feature_names)
+        try:
+            X = pipeline.transform_records(records)
+        except ValueError as e:
+            return jsonify({"error": str(e), "required_features": pipeline.input_columns}), 400
+
+        proba = bool(payload.get("proba"))
+        if proba and not hasattr(model, "predict_proba"):
+            return jsonify({"error": "This model does not support probability predictions"}), 400
+        batcher = get_micro_batcher()
+        try:
+            if batcher is not None:
+                # Coalesced with concurrent requests for the same loaded model
+                result = batcher.predict((model_id, id(model)), X, proba,
+                                         lambda rows, want: predict_records(model, pipeline, rows, want))
+            else:
+                result = predict_records(model, pipeline, X, proba)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        _record_usage(ml_model)
+
+        response = {"model_id": model_id, "n_predictions": len(records)}
+        if single:
+            response["prediction"] = result["predictions"][0]
+            if "probabilities" in result:
+                response["probabilities"] = result["probabilities"][0]
+        else:
+            response.update(result)
+        return jsonify(response)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@model_bp.route("/api/model/predict/batch", methods=["POST"])
+def predict_batch():
+    """
+    Score a large CSV/Parquet upload (or a stored dataset_id) in chunks and
+    stream the predictions back as CSV or NDJSON
+
+    Form fields: model_id, file or dataset_id, format ('csv' or 'ndjson'),
+    proba ('true' adds one probability column per class), id_column (input
+    column echoed next to each prediction instead of the row number) and
+    chunk_size (rows per chunk).
+    """
+    try:
+        model_id = request.form.get("model_id")
+        if not model_id:
+            return jsonify({"error": "model_id is required"}), 400
+
+        fmt = request.form.get("format", "csv").lower()
+        if fmt not in BATCH_FORMATS:
+            return jsonify({"error": f"format must be one of: {', '.join(BATCH_FORMATS)}"}), 400
+        proba = request.form.get("proba", "false").lower() == "true"
+        id_column = request.form.get("id_column") or None
+        try:
+            chunk_rows = int(request.form.get("chunk_size") or current_app.config.get("PREDICT_BATCH_CHUNK_ROWS", 50_000))
+        except ValueError:
+            return jsonify({"error": "chunk_size must be an integer"}), 400
+        if chunk_rows <= 0:
+            return jsonify({"error": "chunk_size must be positive"}), 400
+
+        ml_model = MLModel.query.filter_by(model_id=model_id).first()
+        if not ml_model:
+            return jsonify({"error": "Model not found"}), 404
+        if ml_model.status != 'ready':
+            return jsonify({"error": f"Model is not ready. Status: {ml_model.status}"}), 400
+
+        # Uploads are closed when the view returns, so the file is streamed
+        # from a temporary copy that is removed once the response is done
+        temp_path = None
+        file = request.files.get("file")
+        if file is not None and file.filename:
+            upload_folder = current_app.config.get("UPLOAD_FOLDER", tempfile.gettempdir())
+            temp_path = os.path.join(upload_folder, f"{uuid.uuid4()}_{secure_filename(file.filename)}")
+            file.save(temp_path)
+            chunks = iter_file_chunks(temp_path, chunk_rows=chunk_rows, convert_types=False)
+        elif request.form.get("dataset_id"):
+            chunks = get_dataset_store().iter_chunks(request.form["dataset_id"], chunk_rows)
+        else:
+            return jsonify({"error": "No file or dataset_id provided"}), 400
+
+        streaming = False
+        try:
+            # Read the first chunk up front so bad input still gets a 4xx response
+            try:
+                first = next(chunks, None)
+            except DatasetNotFound:
+                return jsonify({"error": "Unknown or expired dataset_id"}), 404
+            except ValueError as e:
+                return jsonify({"error": f"Error reading file: {str(e)}"}), 400
+            if first is None:
+                return jsonify({"error": "Input has no rows"}), 400
+
+            model, pipeline = unpack_model(_load_cached_model(ml_model), ml_model.feature_names)
+            missing = pipeline.missing_columns(first.columns)
+            if missing:
+                return jsonify({
+                    "error": f"Missing required features: {', '.join(missing)}",
+                    "required_features": pipeline.input_columns,
+                    "provided_features": first.columns.tolist()
+                }), 400
+            if id_column and id_column not in first.columns:
+                return jsonify({"error": f"id_column '{id_column}' not found in input"}), 400
+            if proba and not hasattr(model, "predict_proba"):
+                return jsonify({"error": "This model does not support probability predictions"}), 400
+            _record_usage(ml_model)
+
+            def stream():
+                scored = score_chunks(model, pipeline, itertools.chain([first], chunks), proba, id_column)
+                try:
+                    for piece in format_chunks(scored, fmt):
+                        yield piece
+                except Exception as e:
+                    # Status and headers are already sent; end the body with the error
+                    print(f"Batch prediction with {model_id} failed: {e}")
+                    yield format_error(str(e), fmt)
+
+            response = Response(
+                stream_with_context(stream()),
+                mimetype=BATCH_FORMATS[fmt],
+                headers={
+                    "Content-Disposition": f"attachment; filename={model_id}_predictions.{fmt}",
+                    "X-Accel-Buffering": "no",
+                },
+            )
+            response.call_on_close(lambda: _remove_file(temp_path))
+            streaming = True
+            return response
+        finally:
+            if not streaming:
+                _remove_file(temp_path)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @model_bp.route("/api/model/list", methods=["GET"])
 def list_models():
     """List all models from DATABASE (fast query with filters)"""
@@ -152,8 +354,12 @@ def delete_model(model_id):
         if not ml_model:
             return jsonify({"error": "Model not found"}), 404
         
+        # Stop serving the cached copies
+        get_model_cache().invalidate(model_id)
+        get_model_disk_cache().invalidate(model_id)
+
         # Delete from R2
-        r2_storage = R2Storage()
+        r2_storage = get_r2_storage()
         try:
             r2_storage.delete_model(ml_model.r2_path)
         except Exception as e:
@@ -231,7 +437,13 @@ def get_stats():
             "ready": ready_models,
             "uploading": uploading_models,
             "failed": failed_models,
-            "by_type": {model_type: count for model_type, count in models_by_type}
+            "by_type": {model_type: count for model_type, count in models_by_type},
+            "model_cache": get_model_cache().stats(),
+            "model_disk_cache": get_model_disk_cache().stats(),
+            "model_usage": get_usage_counter().stats(),
+            "storage": get_r2_storage().metrics(),
+            "micro_batcher": get_micro_batcher().stats() if get_micro_batcher() else None,
+            "cpu_budget": get_cpu_budget().stats()
         })
 
     except Exception as e:
@@ -19,9 +19,9 @@ def clean_data(
     run_handle_missing=True,
     run_clean_text=True
 ):
-    input_csv = request.files['file']
-    # Load data
+    # Load data (from the request upload unless a frame is passed in)
     if df is None:
+        input_csv = request.files['file']
         df = pd.read_csv(input_csv)
     if verbose:
         print("\n" + "="*60)
@@ -0,0 +1,812 @@
+"""
+Built-in models of the training engine
+
+Each model registers how to build its estimator and how to report its result;
+reading, cleaning, encoding, splitting and saving are handled by
+app/services/training_engine.py. Result payloads keep the keys the frontend
+result pages expect for each model.
+"""
+from math import sqrt
+
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import PCA
+from sklearn.inspection import permutation_importance
+from sklearn.ensemble import (
+    AdaBoostClassifier,
+    GradientBoostingClassifier,
+    GradientBoostingRegressor,
+    HistGradientBoostingClassifier,
+    HistGradientBoostingRegressor,
+    RandomForestClassifier,
+    RandomForestRegressor,
+)
+from sklearn.linear_model import ElasticNet, Lasso, LinearRegression, LogisticRegression, Ridge
+from sklearn.metrics import (
+    accuracy_score,
+    classification_report,
+    confusion_matrix,
+    f1_score,
+    mean_absolute_error,
+    mean_squared_error,
+    precision_score,
+    r2_score,
+    recall_score,
+)
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+from app.services.preprocessing import ENCODE_NUMERIC, ENCODE_ORDINAL
+from app.services.training_engine import register_alias, register_estimator
+from app.utils.job_queue import report_progress
+
+
+# ===============================
+# 🔹 Shared result helpers
+# ===============================
+
+def rank_features(names, values, limit=None, by_magnitude=False):
+    """Features sorted by value (or |value|), optionally truncated"""
+    key = (lambda x: abs(x[1])) if by_magnitude else (lambda x: x[1])
+    ranked = sorted(zip(names, values), key=key, reverse=True)
+    return dict(ranked[:limit] if limit else ranked)
+
+
+def regression_scores(y_test, preds):
+    """Rounded r2 / mae / rmse"""
+    return {
+        "r2": round(float(r2_score(y_test, preds)), 4),
+        "mae": round(float(mean_absolute_error(y_test, preds)), 4),
+        "rmse": round(float(sqrt(mean_squared_error(y_test, preds))), 4),
+    }
+
+
+def classification_scores(y_test, preds, **kwargs):
+    """Accuracy plus weighted precision / recall / f1"""
+    return {
+        "accuracy": float(accuracy_score(y_test, preds)),
+        "precision": float(precision_score(y_test, preds, average="weighted", **kwargs)),
+        "recall": float(recall_score(y_test, preds, average="weighted", **kwargs)),
+        "f1_score": float(f1_score(y_test, preds, average="weighted", **kwargs)),
+    }
+
+
+def _boosting_monitor(run):
+    """fit() params reporting per-estimator progress of a gradient boosting fit"""
+    total = run.model.n_estimators
+
+    def monitor(i, estimator, local_vars):
+        report_progress("fit", fraction=(i + 1) / total, message=f"{run.name}: {i + 1}/{total} estimators",
+                        estimators=i + 1)
+        return False
+
+    return {"monitor": monitor}
+
+
+# Boosting models switch to the histogram engine from this many rows (engine='auto')
+HIST_BOOSTING_MIN_ROWS = 100_000
+BOOSTING_ENGINES = ("auto", "exact", "hist")
+
+
+def _engine_switch(hist_name, translate):
+    """
+    dispatch hook of the exact boosting models: train the histogram model
+    `hist_name` when params['engine'] is 'hist', or 'auto' (the default) on
+    datasets of HIST_BOOSTING_MIN_ROWS rows or more
+
+    Args:
+        translate: translate(params) -> params of the histogram model
+    """
+    def dispatch(params, n_samples):
+        params = dict(params)
+        engine = params.pop("engine", None) or "auto"
+        if engine not in BOOSTING_ENGINES:
+            raise ValueError(f"engine must be one of: {', '.join(BOOSTING_ENGINES)}")
+        if engine == "hist" or (engine == "auto" and n_samples >= HIST_BOOSTING_MIN_ROWS):
+            return hist_name, translate(params)
+        return None, params
+
+    return dispatch
+
+
+def _hist_from_gradient_boosting(params):
+    """Gradient boosting params that have a histogram equivalent"""
+    translated = {}
+    if params.get("n_estimators") not in [None, "", "null"]:
+        translated["max_iter"] = params["n_estimators"]
+    if params.get("learning_rate") not in [None, "", "null"]:
+        translated["learning_rate"] = params["learning_rate"]
+    if params.get("max_depth") not in [None, "", "null"]:
+        translated["max_depth"] = params["max_depth"]
+    return translated
+
+
+def _rounded(scores):
+    return {k: round(v, 4) for k, v in scores.items()}
+
+
+def _regression_result(run, top_features):
+    """Payload of the plain regression result page"""
+    return {
+        **regression_scores(run.y_test, run.preds),
+        "n_samples": run.data.n_samples,
+        "n_features": run.n_features,
+        "top_features": top_features,
+        "predictions": [float(pred) for pred in run.preds],
+        "actual": [float(actual) for actual in run.y_test],
+        "model_id": run.model_id,
+        "testSize": float(run.test_size),
+    }
+
+
+def _penalized_regression_result(run):
+    """Payload of the Lasso / Elastic Net result pages"""
+    y_test, preds = run.y_test, run.preds
+    mse = mean_squared_error(y_test, preds)
+    coef_dict = dict(zip(run.feature_names, run.model.coef_))
+
+    return {
+        "mse": float(mse),
+        "rmse": float(np.sqrt(mse)),
+        "mae": float(mean_absolute_error(y_test, preds)),
+        "r2_score": float(r2_score(y_test, preds)),
+        "n_samples": int(run.data.n_samples),
+        "n_features": int(run.n_features),
+        "feature_coefficients": coef_dict,
+        "top_features": rank_features(coef_dict.keys(), coef_dict.values(), 5, by_magnitude=True),
+        "predictions": [float(p) for p in preds],
+        "actual": [float(a) for a in y_test],
+        "prediction_data": [
+            {
+                "index": i + 1,
+                "prediction": float(pred),
+                "actual": float(actual),
+                "error": float(actual - pred),
+            }
+            for i, (pred, actual) in enumerate(zip(preds, y_test))
+        ],
+        "model_id": run.model_id,
+        "testSize": float(run.test_size),
+        "train_samples": int(run.X_train.shape[0]),
+        "test_samples": int(run.X_test.shape[0]),
+        "feature_names": run.feature_names,
+        **run.params,
+    }
+
+
+def _classification_summary(run, top_features):
+    """Payload of the compact classification result pages"""
+    return {
+        **_rounded(classification_scores(run.y_test, run.preds)),
+        "n_samples": run.data.n_samples,
+        "n_features": run.n_features,
+        "top_features": top_features,
+        "predictions": [int(pred) for pred in run.preds],
+        "actual": [int(actual) for actual in run.y_test],
+        "model_id": run.model_id,
+        "testSize": float(run.test_size),
+    }
+
+
+def _class_labels(run):
+    if run.label_encoder:
+        return [str(c) for c in run.label_encoder.classes_]
+    return [str(c) for c in sorted(pd.Series(run.data.encoded_target()[0]).unique())]
+
+
+def _detailed_classification(run, pred_proba):
+    """Payload of the tree-based classification result pages"""
+    y_test, preds = run.y_test, run.preds
+    y = run.data.encoded_target()[0]
+    feature_importance = rank_features(
+        run.feature_names, [float(i) for i in run.model.feature_importances_]
+    )
+    top_features = dict(list(feature_importance.items())[:5])
+    class_report = classification_report(y_test, preds, output_dict=True)
+    class_dist = dict(pd.Series(y).value_counts())
+
+    prediction_data = []
+    for i, (pred, actual) in enumerate(zip(preds, y_test)):
+        proba = pred_proba[i] if pred_proba is not None else None
+        prediction_data.append(
+            {
+                "index": i + 1,
+                "prediction": int(pred),
+                "actual": int(actual),
+                "confidence": float(max(proba)) if proba is not None else None,
+                "is_correct": bool(pred == actual),
+                "probabilities": [float(p) for p in proba] if proba is not None else None,
+            }
+        )
+
+    return {
+        **classification_scores(y_test, preds, zero_division=0),
+        "confusion_matrix": [[int(x) for x in row] for row in confusion_matrix(y_test, preds)],
+        "class_distribution": {str(k): int(v) for k, v in class_dist.items()},
+        "class_report": {
+            str(label): {
+                "precision": float(metrics.get("precision", 0)),
+                "recall": float(metrics.get("recall", 0)),
+                "f1-score": float(metrics.get("f1-score", 0)),
+                "support": int(metrics.get("support", 0)),
+            }
+            for label, metrics in class_report.items()
+            if isinstance(metrics, dict)  # only class rows
+        },
+        "classes": _class_labels(run),
+        "prediction_data": prediction_data,
+        "prediction_proba": (
+            [[float(p) for p in row] for row in pred_proba] if pred_proba is not None else None
+        ),
+        "n_samples": int(run.data.n_samples),
+        "n_features": int(run.n_features),
+        "feature_importance": feature_importance,
+        "top_features": {str(k): float(v) for k, v in top_features.items()},
+        "predictions": [int(p) for p in preds],
+        "actual": [int(a) for a in y_test],
+        "model_id": str(run.model_id),
+        "testSize": float(run.test_size),
+        "train_samples": int(run.X_train.shape[0]),
+        "test_samples": int(run.X_test.shape[0]),
+        "feature_names": run.feature_names,
+        **run.params,
+    }
+
+
+def _none_if_zero_depth(params):
+    if params.get("max_depth") == 0:
+        params["max_depth"] = None
+    return params
+
+
+# ===============================
+# 🔹 Regression
+# ===============================
+
+def _persist_linear(run, result):
+    """Upload the bare estimator to R2 and record its metadata in the database"""
+    from app.database.sql_db import db
+    from app.models.ml_model import MLModel
+    from app.utils.r2_storage import get_r2_storage
+
+    model_metadata = {
+        "model_id": run.model_id,
+        "model_type": "linear_regression",
+        "target_column": run.data.target_column,
+        "feature_names": run.feature_names,
+        "n_samples": run.data.n_samples,
+        "test_size": run.test_size,
+        "hyperparameters": {"random_state": run.random_state},
+        "metrics": {"r2": result["r2"], "mae": result["mae"], "rmse": result["rmse"]},
+    }
+
+    # Upload ONLY the sklearn model to R2 (async, non-blocking)
+    pipeline = run.pipeline
+    r2_path = get_r2_storage().save_model_only(
+        run.model,
+        run.model_id,
+        "linear_regression",
+        schema={
+            "feature_names": run.feature_names,
+            "target_column": run.data.target_column,
+            "preprocessing": pipeline.describe(),
+        },
+        pipeline=pipeline,
+    )
+
+    ml_model = MLModel.create_from_training(model_metadata, r2_path, run.params.get("user_id"))
+    db.session.add(ml_model)
+    db.session.commit()
+
+    return {
+        "database_id": ml_model.id,
+        "r2_path": r2_path,
+        "storage_status": "uploading",  # Background upload in progress
+    }
+
+
+register_estimator(
+    "linear-regression",
+    model_type="linear_regression",
+    task="regression",
+    sparse=True,
+    build=lambda params, random_state: LinearRegression(),
+    result=lambda run: _regression_result(
+        run,
+        rank_features(run.feature_names, [float(c) for c in run.model.coef_], 5, by_magnitude=True),
+    ),
+    persist=_persist_linear,
+)
+
+register_estimator(
+    "ridge-regression",
+    model_type="ridge_regression",
+    task="regression",
+    sparse=True,
+    build=lambda params, random_state: Ridge(alpha=params.get("alpha", 1.0), random_state=random_state),
+    result=lambda run: {
+        **_regression_result(
+            run,
+            rank_features(run.feature_names, [float(c) for c in run.model.coef_], 5, by_magnitude=True),
+        ),
+        "alpha": float(run.params.get("alpha", 1.0)),
+    },
+)
+
+register_estimator(
+    "lasso-regression",
+    model_type="lasso_regression",
+    task="regression",
+    encoding=ENCODE_NUMERIC,
+    scale=True,
+    normalize=lambda params: {"alpha": 1.0, "max_iter": 1000, **params},
+    build=lambda params, random_state: Lasso(
+        alpha=params["alpha"], max_iter=params["max_iter"], random_state=random_state
+    ),
+    result=_penalized_regression_result,
+)
+
+register_estimator(
+    "elastic-net",
+    model_type="elastic_net_regression",
+    task="regression",
+    encoding=ENCODE_NUMERIC,
+    scale=True,
+    normalize=lambda params: {"alpha": 1.0, "l1_ratio": 0.5, "max_iter": 1000, **params},
+    build=lambda params, random_state: ElasticNet(
+        alpha=params["alpha"],
+        l1_ratio=params["l1_ratio"],
+        max_iter=params["max_iter"],
+        random_state=random_state,
+    ),
+    result=_penalized_regression_result,
+)
+
+
+def _ensemble_regression_result(run):
+    return {
+        **_regression_result(run, rank_features(run.feature_names, [float(i) for i in run.model.feature_importances_], 5)),
+        **run.params,
+    }
+
+
+register_estimator(
+    "random-forest-regressor",
+    model_type="random_forest_regressor",
+    task="regression",
+    sparse=True,
+    parallel=True,
+    normalize=lambda params: _none_if_zero_depth(
+        {"n_estimators": 200, "max_depth": None, "min_samples_split": 2, "min_samples_leaf": 1, **params}
+    ),
+    build=lambda params, random_state: RandomForestRegressor(random_state=random_state, **params),
+    result=_ensemble_regression_result,
+)
+
+register_estimator(
+    "gradient-boosting-regressor",
+    model_type="gradient_boosting_regressor",
+    task="regression",
+    sparse=True,
+    normalize=lambda params: {"n_estimators": 100, "learning_rate": 0.1, "max_depth": 3, "subsample": 1.0, **params},
+    dispatch=_engine_switch("hist-gradient-boosting-regressor", _hist_from_gradient_boosting),
+    build=lambda params, random_state: GradientBoostingRegressor(random_state=random_state, **params),
+    fit_params=_boosting_monitor,
+    result=_ensemble_regression_result,
+)
+
+# ===============================
+# 🔹 Classification
+# ===============================
+
+def _persist_logistic(run, result):
+    """Upload the model dictionary straight to R2 in the background"""
+    from app.utils.r2_storage import get_r2_storage
+
+    model_data = {
+        "model": run.model,
+        "feature_names": run.feature_names,
+        "target_column": run.data.target_column,
+        "model_id": run.model_id,
+        "metrics": {"accuracy": result["accuracy"]},
+        "pipeline": run.pipeline,
+    }
+    r2_path = get_r2_storage().save_model_direct_async(model_data, run.model_id, "logistic_regression")
+    return {"r2_path": r2_path, "storage_status": "uploading"}
+
+
+register_estimator(
+    "logistic-regression",
+    model_type="logistic_regression",
+    task="classification",
+    encoding=ENCODE_NUMERIC,
+    random_state=43,
+    build=lambda params, random_state: LogisticRegression(),
+    result=lambda run: _classification_summary(
+        run,
+        rank_features(run.feature_names, [float(c) for c in run.model.coef_[0]], 5, by_magnitude=True),
+    ),
+    persist=_persist_logistic,
+)
+
+
+def _svm_result(run):
+    if run.params["kernel"] == "linear":
+        top_features = rank_features(
+            run.feature_names, [float(c) for c in run.model.coef_[0]], 5, by_magnitude=True
+        )
+    else:
+        top_features = "Not available for non-linear kernels"
+
+    params = run.params
+    return {
+        **_classification_summary(run, top_features),
+        "kernel": params["kernel"],
+        "C": float(params["C"]),
+        "gamma": params["gamma"],
+        "degree": int(params["degree"]),
+        "shrinking": bool(params["shrinking"]),
+        "probability": bool(params["probability"]),
+        "class_weight": params["class_weight"],
+    }
+
+
+register_estimator(
+    "support-vector-machine",
+    model_type="svm_classifier",
+    task="classification",
+    encoding=ENCODE_NUMERIC,
+    random_state=43,
+    normalize=lambda params: {
+        "kernel": "rbf",
+        "C": 1.0,
+        "gamma": "scale",
+        "degree": 3,
+        "shrinking": True,
+        "probability": True,
+        "class_weight": None,
+        **params,
+    },
+    build=lambda params, random_state: SVC(random_state=random_state, **params),
+    result=_svm_result,
+)
+
+
+def _knn_result(run):
+    y_test, preds = run.y_test, run.preds
+    report = classification_report(y_test, preds, output_dict=True)
+    class_distribution = pd.Series(run.data.encoded_target()[0]).value_counts().to_dict()
+    params = run.params
+
+    return {
+        **_rounded(classification_scores(y_test, preds, zero_division=0)),
+        "n_samples": int(run.data.n_samples),
+        "n_features": int(run.n_features),
+        "confusion_matrix": [[int(x) for x in row] for row in confusion_matrix(y_test, preds)],
+        "classification_report": {
+            k: (
+                {m: float(v) for m, v in metrics.items()}
+                if isinstance(metrics, dict)
+                else float(metrics)
+            )
+            for k, metrics in report.items()
+        },
+        "class_distribution": {str(k): int(v) for k, v in class_distribution.items()},
+        "predictions": [int(p) for p in preds],
+        "prediction_proba": run.model.predict_proba(run.X_test).tolist(),
+        "actual": [int(a) for a in y_test],
+        "k_value": int(params["n_neighbors"]),
+        "classes": (
+            run.label_encoder.classes_.tolist()
+            if run.label_encoder is not None
+            else sorted(list(set(y_test.tolist())))
+        ),
+        "algorithm": str(params["algorithm"]),
+        "weights": str(params["weights"]),
+        "metric": str(params["metric"]),
+        "random_state": int(run.random_state),
+        "model_id": run.model_id,
+        "testSize": float(run.test_size),
+    }
+
+
+register_estimator(
+    "KNN",
+    model_type="knn_classifier",
+    task="classification",
+    parallel=True,
+    encode_target=True,
+    normalize=lambda params: {
+        "n_neighbors": 5,
+        "weights": "uniform",
+        "algorithm": "auto",
+        "metric": "minkowski",
+        **params,
+    },
+    build=lambda params, random_state: KNeighborsClassifier(**params),
+    result=_knn_result,
+)
+
+
+def _decision_tree_result(run):
+    model = run.model
+    pred_proba = model.predict_proba(run.X_test) if hasattr(model, "predict_proba") else None
+    return {
+        **_detailed_classification(run, pred_proba),
+        "tree_depth": int(model.get_depth()),
+        "n_leaves": int(model.get_n_leaves()),
+        "n_nodes": int(model.tree_.node_count),
+    }
+
+
+register_estimator(
+    "decision-tree",
+    model_type="decision_tree_classifier",
+    task="classification",
+    sparse=True,
+    encode_target=True,
+    normalize=lambda params: _none_if_zero_depth(
+        {"criterion": "gini", "max_depth": None, "min_samples_split": 2, "min_samples_leaf": 1, **params}
+    ),
+    build=lambda params, random_state: DecisionTreeClassifier(random_state=random_state, **params),
+    result=_decision_tree_result,
+)
+
+register_estimator(
+    "random-forest",
+    model_type="random_forest_classifier",
+    task="classification",
+    sparse=True,
+    parallel=True,
+    encode_target=True,
+    stratify=True,
+    normalize=lambda params: _none_if_zero_depth(
+        {
+            "n_estimators": 200,
+            "criterion": "gini",
+            "max_depth": None,
+            "min_samples_split": 2,
+            "min_samples_leaf": 1,
+            "class_weight": None,
+            **params,
+        }
+    ),
+    build=lambda params, random_state: RandomForestClassifier(random_state=random_state, **params),
+    result=lambda run: _detailed_classification(run, run.model.predict_proba(run.X_test)),
+)
+
+
+def _boosting_result(run):
+    return {
+        **_classification_summary(run, rank_features(run.feature_names, run.model.feature_importances_, 5)),
+        **run.params,
+    }
+
+
+register_estimator(
+    "adaboost",
+    model_type="adaboost_classifier",
+    task="classification",
+    encoding=ENCODE_NUMERIC,
+    random_state=42,
+    stratify=True,
+    normalize=lambda params: {
+        "n_estimators": int(params.get("n_estimators", 50)),
+        "learning_rate": float(params.get("learning_rate", 1.0)),
+        "algorithm": params.get("algorithm") or "SAMME",
+    },
+    # AdaBoost's learning rate and rounds do not carry over; the histogram
+    # model keeps its own defaults
+    dispatch=_engine_switch("hist-gradient-boosting", lambda params: {}),
+    build=lambda params, random_state: AdaBoostClassifier(random_state=random_state, **params),
+    result=_boosting_result,
+)
+
+
+def _gradient_boosting_params(params):
+    max_features = params.get("max_features")
+    return {
+        "n_estimators": int(params.get("n_estimators", 100)),
+        "learning_rate": float(params.get("learning_rate", 0.1)),
+        "max_depth": int(params.get("max_depth", 3)),
+        "subsample": float(params.get("subsample", 1.0)),
+        "min_samples_split": int(params.get("min_samples_split", 2)),
+        "min_samples_leaf": int(params.get("min_samples_leaf", 1)),
+        "max_features": None if max_features in [None, "", "null"] else max_features,
+    }
+
+
+register_estimator(
+    "gradient-boosting",
+    model_type="gradient_boosting_classifier",
+    task="classification",
+    encoding=ENCODE_NUMERIC,
+    random_state=42,
+    stratify=True,
+    normalize=_gradient_boosting_params,
+    dispatch=_engine_switch("hist-gradient-boosting", _hist_from_gradient_boosting),
+    build=lambda params, random_state: GradientBoostingClassifier(random_state=random_state, **params),
+    fit_params=_boosting_monitor,
+    result=_boosting_result,
+)
+
+
+# ===============================
+# 🔹 Histogram gradient boosting
+# ===============================
+# Features are binned into at most 255 histogram bins, so a fit scales to
+# millions of rows; categorical columns are split natively (ordinal encoding)
+# and missing values are routed at each split instead of being imputed.
+
+# Test rows used for the permutation importances of the result page
+HIST_IMPORTANCE_ROWS = 2000
+
+
+def _hist_boosting_params(params):
+    max_depth = params.get("max_depth")
+    early_stopping = params.get("early_stopping", True)
+    if isinstance(early_stopping, str):
+        early_stopping = early_stopping.lower() == "true"
+    return {
+        "max_iter": int(params.get("max_iter", 200)),
+        "learning_rate": float(params.get("learning_rate", 0.1)),
+        "max_leaf_nodes": int(params.get("max_leaf_nodes", 31)),
+        "max_depth": None if max_depth in [None, "", "null", 0] else int(max_depth),
+        "min_samples_leaf": int(params.get("min_samples_leaf", 20)),
+        "l2_regularization": float(params.get("l2_regularization", 0.0)),
+        # Stop once the score on a held-out validation_fraction of the
+        # training rows has not improved for n_iter_no_change iterations
+        "early_stopping": bool(early_stopping),
+        "validation_fraction": float(params.get("validation_fraction", 0.1)),
+        "n_iter_no_change": int(params.get("n_iter_no_change", 10)),
+    }
+
+
+def _hist_top_features(run, limit=5):
+    """Permutation importances on a sample of the test rows (no impurity importances)"""
+    n = min(run.X_test.shape[0], HIST_IMPORTANCE_ROWS)
+    importances = permutation_importance(
+        run.model, run.X_test[:n], run.y_test[:n], n_repeats=3, random_state=run.random_state
+    ).importances_mean
+    return rank_features(run.feature_names, [float(i) for i in importances], limit)
+
+
+def _hist_summary(run):
+    mask = run.data.pipeline.categorical_mask
+    return {
+        "engine": "hist",
+        "n_iter": int(run.model.n_iter_),
+        "categorical_features": [name for name, categorical in zip(run.feature_names, mask) if categorical],
+    }
+
+
+register_estimator(
+    "hist-gradient-boosting",
+    model_type="hist_gradient_boosting_classifier",
+    task="classification",
+    encoding=ENCODE_ORDINAL,
+    random_state=42,
+    stratify=True,
+    encode_target=True,
+    parallel=True,
+    normalize=_hist_boosting_params,
+    build=lambda params, random_state: HistGradientBoostingClassifier(random_state=random_state, **params),
+    result=lambda run: {
+        **_classification_summary(run, _hist_top_features(run)),
+        **_hist_summary(run),
+        **run.params,
+    },
+)
+
+register_estimator(
+    "hist-gradient-boosting-regressor",
+    model_type="hist_gradient_boosting_regressor",
+    task="regression",
+    encoding=ENCODE_ORDINAL,
+    parallel=True,
+    normalize=_hist_boosting_params,
+    build=lambda params, random_state: HistGradientBoostingRegressor(random_state=random_state, **params),
+    result=lambda run: {
+        **_regression_result(run, _hist_top_features(run)),
+        **_hist_summary(run),
+        **run.params,
+    },
+)
+
+
+# ===============================
+# 🔹 Decomposition
+# ===============================
+
+def _fit_pca(run):
+    """PCA is fit on every row; the target is only used to label the output"""
+    X = run.data.X
+    if run.params["scale_data"]:
+        run.scaler = StandardScaler()
+        X_scaled = run.scaler.fit_transform(X)
+    else:
+        X_scaled = X.values
+
+    run.model = PCA(n_components=run.params["n_components"], random_state=run.random_state)
+    run.transformed = run.model.fit_transform(X_scaled)
+
+
+def _pca_result(run):
+    pca = run.model
+    y = run.data.y
+    columns = run.data.X.columns
+    explained_variance = pca.explained_variance_ratio_
+    cumulative_variance = explained_variance.cumsum()
+
+    # Component loadings
+    loadings = pd.DataFrame(
+        pca.components_,
+        columns=columns,
+        index=[f"PC{i+1}" for i in range(pca.n_components_)],
+    )
+
+    # Top features per component
+    top_features = {
+        pc: dict(loadings.loc[pc].abs().sort_values(ascending=False).head(5))
+        for pc in loadings.index
+    }
+
+    return {
+        "model_id": run.model_id,
+        "n_samples": int(run.data.X.shape[0]),
+        "original_features": int(run.data.X.shape[1]),
+        "n_components": int(pca.n_components_),
+        "explained_variance_ratio": [float(v) for v in explained_variance],
+        "cumulative_variance": [float(v) for v in cumulative_variance],
+        "components": {
+            f"PC{i+1}": [float(val) for val in comp] for i, comp in enumerate(pca.components_)
+        },
+        "feature_loadings": {
+            pc: {str(k): float(v) for k, v in loadings.loc[pc].items()} for pc in loadings.index
+        },
+        "top_features_per_component": {
+            pc: {str(k): float(v) for k, v in feats.items()} for pc, feats in top_features.items()
+        },
+        "transformed_data": [
+            {
+                "index": int(i + 1),
+                "components": [float(val) for val in row],
+                "target": str(y.iloc[i]) if y is not None else None,
+            }
+            for i, row in enumerate(run.transformed)
+        ],
+        "scale_data": run.params["scale_data"],
+        "target_column": run.data.target_column,
+        "feature_names": run.feature_names,
+    }
+
+
+register_estimator(
+    "principal-component-analysis",
+    model_type="pca",
+    task="decomposition",
+    normalize=lambda params: {"n_components": None, "scale_data": True, **params},
+    build=lambda params, random_state: PCA(n_components=params["n_components"], random_state=random_state),
+    fit=_fit_pca,
+    result=_pca_result,
+)
+
+
+# ===============================
+# 🔹 ModelAgent recommendation names
+# ===============================
+# XGBoost / LightGBM are not installed everywhere; their recommendations are
+# trained with the closest sklearn boosting model.
+
+register_alias("Logistic Regression", "logistic-regression")
+register_alias("Random Forest Classifier", "random-forest")
+register_alias("Balanced Random Forest", "random-forest", class_weight="balanced_subsample")
+register_alias("XGBoost Classifier", "hist-gradient-boosting")
+register_alias("LightGBM Classifier", "hist-gradient-boosting")
+register_alias("Ridge Regression", "ridge-regression")
+register_alias("Lasso Regression", "lasso-regression")
+register_alias("Random Forest Regressor", "random-forest-regressor")
+register_alias("Gradient Boosting Regressor", "gradient-boosting-regressor")
+register_alias("XGBoost Regressor", "hist-gradient-boosting-regressor")
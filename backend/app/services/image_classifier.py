@@ -5,6 +5,46 @@ from tensorflow.keras.applications import EfficientNetB0
 from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
 from tensorflow.keras.models import Model
 from tensorflow.keras.optimizers import Adam
+from tensorflow.keras.callbacks import Callback
+from app.utils.job_queue import report_progress
+
+
+class TrainingProgress(Callback):
+    """
+    Reports per-epoch (and every `every` batches, per-batch) progress of a
+    Keras fit to the current training job; a no-op outside a job
+    """
+
+    def __init__(self, epochs, steps_per_epoch, every=10):
+        super().__init__()
+        self.epochs = epochs
+        self.steps = max(int(steps_per_epoch), 1)
+        self.every = every
+        self.epoch = 0
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch = epoch
+
+    def on_train_batch_end(self, batch, logs=None):
+        if (batch + 1) % self.every == 0:
+            done = self.epoch + (batch + 1) / self.steps
+            report_progress(
+                "fit",
+                fraction=min(done / self.epochs, 1.0),
+                message=f"epoch {self.epoch + 1}/{self.epochs}, batch {batch + 1}/{self.steps}",
+                epoch=self.epoch + 1,
+                batch=batch + 1,
+            )
+
+    def on_epoch_end(self, epoch, logs=None):
+        metrics = {k: round(float(v), 6) for k, v in (logs or {}).items()}
+        report_progress(
+            "fit",
+            fraction=(epoch + 1) / self.epochs,
+            message=f"epoch {epoch + 1}/{self.epochs}",
+            epoch=epoch + 1,
+            **metrics,
+        )
 
 
 def train_image_classifier(
@@ -21,6 +61,7 @@ def train_image_classifier(
     """
 
     # ---- Data Generators ----
+    report_progress("parse", message=dataset_path)
     train_datagen = ImageDataGenerator(
         rescale=1./255,
         rotation_range=20,
@@ -50,6 +91,7 @@ def train_image_classifier(
     num_classes = len(train_generator.class_indices)
 
     # ---- Base Model ----
+    report_progress("build", message="EfficientNetB0")
     base_model = EfficientNetB0(
         weights="imagenet",
         include_top=False,
@@ -72,13 +114,16 @@ def train_image_classifier(
     )
 
     # ---- Train ----
+    report_progress("fit", fraction=0.0, message=f"epoch 1/{epochs}")
     history = model.fit(
         train_generator,
         epochs=epochs,
-        validation_data=val_generator
+        validation_data=val_generator,
+        callbacks=[TrainingProgress(epochs, len(train_generator))]
     )
 
     # ---- Save Model ----
+    report_progress("persist", message=model_save_path)
     model.save(model_save_path)
 
     # ---- Return Output ----
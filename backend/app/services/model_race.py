@@ -0,0 +1,241 @@
+"""
+Model race: train several candidate models on one prepared dataset in parallel
+
+The dataset is read, cleaned and encoded once in the parent process, and the
+train/test splits every candidate needs are computed up front. Worker
+processes receive the prepared data once (through the pool initializer, not
+per task), fit their candidate and build its result payload. Fitted models are
+sent back and persisted in the parent, where the Flask app context (R2,
+database) is available.
+
+The race takes every idle core of the CPU budget and splits them among its
+workers; each worker process gets a budget of its share, so parallel
+candidates (forests, KNN) use several cores without oversubscribing.
+"""
+import time
+from concurrent.futures import as_completed
+from datetime import datetime
+
+from app.services.training_engine import (
+    dispatch_model,
+    estimator_layout,
+    evaluate_estimator,
+    fit_estimator,
+    get_estimator,
+    prepare_layouts,
+)
+from app.utils.cpu_budget import cpu_slot, process_pool, reset_cpu_budget
+from app.utils.file_processor import read_uploaded_file
+from app.utils.job_queue import clear_current_job, report_progress
+
+# Result keys copied into each leaderboard row
+LEADERBOARD_METRICS = {
+    "classification": ["accuracy", "precision", "recall", "f1_score"],
+    "regression": ["r2", "r2_score", "mae", "rmse"],
+}
+
+# Worker process state, set once by the pool initializer (pool workers only:
+# concurrent races fitting in their own threads pass their data explicitly)
+_worker_data = {}
+
+
+def _init_pool_worker(prepared, cores):
+    global _worker_data
+    # Clear any job and CPU slot inherited from the thread that started the pool
+    clear_current_job()
+    reset_cpu_budget(cores)
+    _worker_data = prepared
+
+
+def _fit_candidate(index, name, layout, test_size, random_state, params, model_id, prepared=None):
+    """Fit one candidate (in a worker unless `prepared` is given); returns (index, run, result, seconds)"""
+    start = time.perf_counter()
+    data = (_worker_data if prepared is None else prepared)[layout]
+    run = fit_estimator(name, data, test_size, random_state, params, model_id)
+    result = evaluate_estimator(run)
+    return index, run, result, time.perf_counter() - start
+
+
+def leaderboard_score(task, result):
+    """Ranking score of a result: accuracy for classifiers, R² for regressors"""
+    if task == "classification":
+        return result.get("accuracy")
+    return result.get("r2", result.get("r2_score"))
+
+
+def _normalize_candidates(models):
+    """Accept model names or {'model': name, 'params': {...}} dicts"""
+    candidates = []
+    for entry in models:
+        if isinstance(entry, str):
+            entry = {"model": entry}
+        candidates.append({"model": entry.get("model") or entry.get("name"), "params": entry.get("params") or {}})
+    return candidates
+
+
+def race_models(
+    models,
+    file,
+    target_column=None,
+    test_size=0.3,
+    random_state=None,
+    cleaned_data=True,
+    max_workers=None,
+    include_results=False,
+):
+    """
+    Train candidate models in parallel and rank them
+
+    Args:
+        models: List of model names (registry names or ModelAgent names) or
+            {'model': name, 'params': {...}} specs
+        file: Uploaded file or parsed DataFrame
+        target_column: Target column (defaults to the last column)
+        test_size: Fraction of rows held out for evaluation
+        random_state: Seed; None uses each model's default
+        cleaned_data: If True, skip clean_data
+        max_workers: Worker processes (defaults to one per idle core of the
+            CPU budget, and never more)
+        include_results: Include each model's full result payload
+
+    Returns:
+        dict: Leaderboard sorted by score, or {'error': ...}
+    """
+    try:
+        started = time.perf_counter()
+        candidates = _normalize_candidates(models)
+        if not candidates:
+            return {"error": "No candidate models given."}
+
+        report_progress("parse")
+        df = read_uploaded_file(file)
+
+        rows = []
+        runnable = []
+        tasks = set()
+        for index, candidate in enumerate(candidates):
+            row = {"model": candidate["model"]}
+            rows.append(row)
+            try:
+                # The dataset size may hand a candidate to another engine
+                name, params = dispatch_model(candidate["model"], candidate["params"], len(df))
+                candidate = {"model": name, "params": params}
+                spec = get_estimator(name)
+            except ValueError as e:
+                row["error"] = str(e)
+                continue
+            if spec["task"] == "decomposition":
+                row["error"] = "Unsupervised models cannot be ranked."
+                continue
+            row["estimator"] = spec["name"]
+            tasks.add(spec["task"])
+            runnable.append((index, candidate, spec))
+
+        if len(tasks) > 1:
+            return {"error": "Candidates mix classification and regression models."}
+        if not runnable:
+            return {"error": "None of the candidate models is available.", "leaderboard": rows}
+        task = tasks.pop()
+
+        # Encode once per layout and compute every split before starting the workers
+        prepare_start = time.perf_counter()
+        prepared = prepare_layouts(
+            df, {estimator_layout(spec) for _, _, spec in runnable},
+            target_column, cleaned_data,
+        )
+        for _, candidate, spec in runnable:
+            data = prepared[estimator_layout(spec)]
+            seed = random_state if random_state is not None else spec["random_state"]
+            split_args = (test_size, seed, spec["stratify"], spec["encode_target"])
+            data.split(*split_args)
+            if spec["scale"]:
+                data.scaled_split(*split_args)
+        prepare_seconds = time.perf_counter() - prepare_start
+
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        jobs = [
+            (
+                index,
+                candidate["model"],
+                estimator_layout(spec),
+                test_size,
+                random_state,
+                candidate["params"],
+                f"{spec['model_type']}_{stamp}_{index + 1}",
+            )
+            for index, candidate, spec in runnable
+        ]
+
+        finished = []
+        report_progress("fit", fraction=0.0, message=f"0/{len(jobs)} models")
+        with cpu_slot() as cores:
+            max_workers = min(max_workers or cores, cores, len(jobs))
+            worker_cores = max(1, cores // max_workers)
+            if max_workers <= 1:
+                # Candidates fit in this thread, within the race's slot
+                for done, job in enumerate(jobs, start=1):
+                    try:
+                        finished.append(_fit_candidate(*job, prepared))
+                    except Exception as e:
+                        rows[job[0]]["error"] = str(e)
+                    report_progress("fit", fraction=done / len(jobs), message=f"{done}/{len(jobs)} models")
+            else:
+                pool = process_pool(
+                    max_workers,
+                    initializer=_init_pool_worker,
+                    initargs=(prepared, worker_cores),
+                )
+                try:
+                    futures = {pool.submit(_fit_candidate, *job): job[0] for job in jobs}
+                    for done, future in enumerate(as_completed(futures), start=1):
+                        try:
+                            finished.append(future.result())
+                        except Exception as e:
+                            rows[futures[future]]["error"] = str(e)
+                        report_progress("fit", fraction=done / len(jobs), message=f"{done}/{len(jobs)} models")
+                finally:
+                    # On cancellation, candidates that have not started are dropped
+                    pool.shutdown(wait=True, cancel_futures=True)
+
+        report_progress("persist")
+        for index, run, result, seconds in finished:
+            row = rows[index]
+            row["fit_seconds"] = round(seconds, 4)
+            try:
+                run.restore(prepared[estimator_layout(get_estimator(run.name))])
+                result.update(run.spec["persist"](run, result))
+            except Exception as e:
+                row["error"] = f"Trained but not saved: {e}"
+            row["model_id"] = run.model_id
+            row["params"] = run.params
+            row["score"] = leaderboard_score(task, result)
+            row["metrics"] = {k: result[k] for k in LEADERBOARD_METRICS[task] if k in result}
+            if include_results:
+                row["result"] = result
+
+        ranked = sorted(
+            (row for row in rows if row.get("score") is not None),
+            key=lambda row: row["score"],
+            reverse=True,
+        )
+        for rank, row in enumerate(ranked, start=1):
+            row["rank"] = rank
+        unranked = [row for row in rows if row.get("score") is None]
+
+        any_data = next(iter(prepared.values()))
+        return {
+            "task_type": task,
+            "metric": "accuracy" if task == "classification" else "r2",
+            "leaderboard": ranked + unranked,
+            "best_model": ranked[0] if ranked else None,
+            "n_samples": any_data.n_samples,
+            "target_column": any_data.target_column,
+            "workers": max_workers,
+            "cores_per_worker": worker_cores,
+            "prepare_seconds": round(prepare_seconds, 4),
+            "elapsed_seconds": round(time.perf_counter() - started, 4),
+            "testSize": float(test_size),
+        }
+
+    except Exception as e:
+        return {"error": str(e)}
@@ -0,0 +1,432 @@
+"""
+Hyperparameter search with successive halving
+
+Candidate configurations are sampled from a search space and trained on a
+small share of the training rows first; only the best 1/factor of each round
+moves on to factor times more rows, until the survivors train on all of them
+(successive halving). Hyperband runs several such brackets, from many cheap
+candidates to a few trained on every row, which hedges against rankings on
+small samples being misleading.
+
+The dataset is read, cleaned and encoded once (through the prepared-data
+cache, so a dataset already used for training is not encoded again) and split
+into the usual train/test rows. The search only sees the training rows: it
+fits on a growing prefix of them and scores every candidate on one fixed
+validation slice. Worker processes receive the prepared data once through the
+pool initializer, as in the model race, and send back scores only. The best
+configuration is then trained on the full training rows in the parent,
+evaluated on the untouched test rows and persisted like any other model.
+
+Search spaces map parameter names to
+    [v1, v2, ...]                                   a choice
+    {"min": a, "max": b, "log": true, "type": "int"}  a range (log-uniform
+                                                    with log, int or float)
+    value                                           a fixed value
+"""
+import itertools
+import math
+import time
+from concurrent.futures import as_completed
+
+import numpy as np
+from sklearn.metrics import accuracy_score, r2_score
+from sklearn.model_selection import train_test_split
+
+from app.services.model_race import LEADERBOARD_METRICS, leaderboard_score
+from app.services.training_engine import (
+    PreparedData,
+    dispatch_model,
+    estimator_layout,
+    fit_estimator,
+    get_estimator,
+    prepare_layouts,
+    run_estimator,
+)
+from app.utils.cpu_budget import cpu_slot, process_pool, reset_cpu_budget
+from app.utils.file_processor import read_uploaded_file
+from app.utils.job_queue import clear_current_job, report_progress
+
+SEARCH_METHODS = ("halving", "hyperband")
+# Share of the training rows held out to score the candidates
+VALIDATION_FRACTION = 0.2
+# Fewest training rows a candidate is fit on
+MIN_ROWS = 200
+
+# Worker process state, set once by the pool initializer (pool workers only:
+# concurrent searches fitting in their own threads pass their state explicitly)
+_worker_state = {}
+
+
+def _init_pool_worker(state, cores):
+    global _worker_state
+    # Clear any job and CPU slot inherited from the thread that started the pool
+    clear_current_job()
+    reset_cpu_budget(cores)
+    _worker_state = dict(state, rungs={})
+
+
+def _head(values, rows):
+    return values.iloc[:rows] if hasattr(values, "iloc") else values[:rows]
+
+
+def _rung_data(state, rows):
+    """Prepared data whose split is the first `rows` fit rows and the validation rows"""
+    data = state["rungs"].get(rows)
+    if data is None:
+        source = state["data"]
+        data = PreparedData(source.df, source.target_column, source.X, source.y, source.encoding, source.pipeline)
+        data.preset_split(
+            (_head(state["X_fit"], rows), state["X_val"], _head(state["y_fit"], rows), state["y_val"]),
+            *state["split_args"],
+        )
+        state["rungs"][rows] = data
+    return data
+
+
+def _fit_trial(index, name, rows, params, state=None):
+    """Fit one candidate on `rows` rows (in a worker unless `state` is given); returns (index, rows, score, seconds)"""
+    start = time.perf_counter()
+    state = _worker_state if state is None else state
+    test_size, random_state = state["split_args"][:2]
+    run = fit_estimator(name, _rung_data(state, rows), test_size, random_state, params)
+    if run.spec["task"] == "classification":
+        score = accuracy_score(run.y_test, run.preds)
+    else:
+        score = r2_score(run.y_test, run.preds)
+    return index, rows, float(score), time.perf_counter() - start
+
+
+# ---------------------------------------------------------------------------
+# Search space
+# ---------------------------------------------------------------------------
+
+def _native(value):
+    """JSON-friendly Python scalar"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _sample_value(name, spec, rng):
+    if isinstance(spec, list):
+        if not spec:
+            raise ValueError(f"search_space['{name}'] is an empty list")
+        return _native(spec[rng.integers(len(spec))])
+    if isinstance(spec, dict):
+        try:
+            low, high = spec["min"], spec["max"]
+        except KeyError:
+            raise ValueError(f"search_space['{name}'] needs 'min' and 'max'")
+        if low > high:
+            raise ValueError(f"search_space['{name}']: min is greater than max")
+        log = bool(spec.get("log"))
+        if log and low <= 0:
+            raise ValueError(f"search_space['{name}']: log ranges must be positive")
+        as_int = spec.get("type", "int" if isinstance(low, int) and isinstance(high, int) else "float") == "int"
+        if log:
+            value = math.exp(rng.uniform(math.log(low), math.log(high + 1 if as_int else high)))
+        else:
+            value = rng.uniform(low, high + 1 if as_int else high)
+        return min(int(value), high) if as_int else float(value)
+    return spec
+
+
+def sample_candidates(space, n, random_state=None):
+    """
+    Candidate configurations of a search space
+
+    A space of choices only, with at most n combinations, is enumerated as a
+    grid; otherwise n distinct configurations are drawn at random.
+
+    Args:
+        space: {param: choice list, range dict or fixed value}
+        n: Number of configurations wanted
+        random_state: Seed of the draw
+
+    Returns:
+        list of params dicts
+
+    Raises:
+        ValueError: If the space is empty or malformed
+    """
+    if not isinstance(space, dict) or not space:
+        raise ValueError("search_space must be a non-empty JSON object")
+    if all(isinstance(spec, list) for spec in space.values()):
+        size = math.prod(len(spec) for spec in space.values())
+        if size <= n:
+            for name, spec in space.items():
+                if not spec:
+                    raise ValueError(f"search_space['{name}'] is an empty list")
+            return [dict(zip(space, combo)) for combo in itertools.product(*space.values())]
+
+    rng = np.random.default_rng(random_state)
+    candidates, seen = [], set()
+    for _ in range(n * 20):
+        params = {name: _sample_value(name, spec, rng) for name, spec in space.items()}
+        key = repr(sorted(params.items()))
+        if key not in seen:
+            seen.add(key)
+            candidates.append(params)
+            if len(candidates) == n:
+                break
+    return candidates
+
+
+def _halving_rows(n_candidates, pool_rows, factor, min_rows):
+    """Rows of the first round of a successive-halving bracket"""
+    rounds = max(1, math.ceil(math.log(max(n_candidates, 1), factor) - 1e-9) + 1)
+    rows = pool_rows // factor ** (rounds - 1)
+    return min(max(rows, min_rows), pool_rows)
+
+
+def _hyperband_brackets(pool_rows, factor, min_rows, max_candidates):
+    """(n_candidates, first_rows) of each Hyperband bracket, most exploratory first"""
+    s_max = max(0, int(math.log(max(pool_rows / min_rows, 1), factor) + 1e-9))
+    while True:
+        brackets = [
+            (math.ceil((s_max + 1) / (s + 1) * factor ** s), max(pool_rows // factor ** s, 1))
+            for s in range(s_max, -1, -1)
+        ]
+        if s_max == 0 or sum(n for n, _ in brackets) <= max_candidates:
+            return brackets
+        s_max -= 1
+
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+def tune_model(
+    model,
+    search_space,
+    file,
+    target_column=None,
+    test_size=0.3,
+    random_state=None,
+    cleaned_data=True,
+    params=None,
+    method="halving",
+    n_candidates=27,
+    factor=3,
+    min_rows=MIN_ROWS,
+    max_candidates=256,
+    max_workers=None,
+    include_results=False,
+):
+    """
+    Search a model's hyperparameters and persist the best configuration
+
+    Args:
+        model: Registered model name or alias
+        search_space: {param: choice list, range dict or fixed value}
+        file: Uploaded file or parsed DataFrame
+        target_column: Target column (defaults to the last column)
+        test_size: Fraction of rows held out for the final evaluation
+        random_state: Seed of the splits, the draw and the models; None uses
+            the model's default
+        cleaned_data: If True, skip clean_data
+        params: Fixed params applied to every candidate (e.g. engine)
+        method: 'halving' or 'hyperband'
+        n_candidates: Configurations of the halving search
+        factor: Candidates kept per round (1/factor) and row growth
+        min_rows: Fewest training rows a candidate is fit on
+        max_candidates: Upper bound on the configurations tried
+        max_workers: Worker processes (defaults to one per idle core of the
+            CPU budget, and never more)
+        include_results: Include the best model's full result payload
+
+    Returns:
+        dict: Leaderboard, best params and the persisted best model, or
+        {'error': ...}
+    """
+    try:
+        started = time.perf_counter()
+        if method not in SEARCH_METHODS:
+            return {"error": f"method must be one of: {', '.join(SEARCH_METHODS)}"}
+        factor = int(factor)
+        if factor < 2:
+            return {"error": "factor must be at least 2."}
+        n_candidates = min(int(n_candidates), max_candidates)
+        if n_candidates < 1:
+            return {"error": "n_candidates must be at least 1."}
+
+        report_progress("parse")
+        df = read_uploaded_file(file)
+        name = dispatch_model(model, params, len(df))[0]
+        spec = get_estimator(name)
+        if spec["task"] == "decomposition":
+            return {"error": "Unsupervised models cannot be tuned."}
+        task = spec["task"]
+
+        # Encode once (or reuse the cached encoding) and carve the search rows
+        prepare_start = time.perf_counter()
+        data = prepare_layouts(df, {estimator_layout(spec)}, target_column, cleaned_data)[estimator_layout(spec)]
+        seed = random_state if random_state is not None else spec["random_state"]
+        split_args = (test_size, seed, spec["stratify"], spec["encode_target"])
+        X_search, _, y_search, _ = data.split(*split_args)
+        X_fit, X_val, y_fit, y_val = train_test_split(
+            X_search,
+            y_search,
+            test_size=VALIDATION_FRACTION,
+            random_state=seed,
+            stratify=y_search if spec["stratify"] else None,
+        )
+        pool_rows = X_fit.shape[0]
+        state = {"data": data, "X_fit": X_fit, "X_val": X_val, "y_fit": y_fit, "y_val": y_val,
+                 "split_args": split_args}
+        prepare_seconds = time.perf_counter() - prepare_start
+
+        if method == "hyperband":
+            brackets = _hyperband_brackets(pool_rows, factor, min(min_rows, pool_rows), max_candidates)
+        else:
+            brackets = [(n_candidates, None)]
+        candidates, seen = [], set()
+        for config in sample_candidates(search_space, sum(n for n, _ in brackets), seed):
+            # Each configuration goes through the same engine switch as training
+            target, candidate_params = dispatch_model(model, {**(params or {}), **config}, len(df))
+            if target != name:
+                return {"error": "The engine cannot be part of the search space; pass it in params."}
+            key = repr(sorted(candidate_params.items()))
+            if key not in seen:
+                seen.add(key)
+                candidates.append({"params": candidate_params, "rounds": []})
+
+        # Candidates of each bracket, in draw order
+        bracket_members, offset = [], 0
+        for n, first_rows in brackets:
+            members = list(range(offset, min(offset + n, len(candidates))))
+            offset += n
+            if members:
+                rows = first_rows or _halving_rows(len(members), pool_rows, factor, min(min_rows, pool_rows))
+                bracket_members.append((members, rows))
+
+        with cpu_slot() as cores:
+            max_workers = max(1, min(max_workers or cores, cores, len(candidates)))
+            worker_cores = max(1, cores // max_workers)
+            pool = local_state = None
+            if max_workers > 1:
+                pool = process_pool(
+                    max_workers,
+                    initializer=_init_pool_worker,
+                    initargs=(state, worker_cores),
+                )
+            else:
+                # Candidates fit in this thread, within the search's slot
+                local_state = dict(state, rungs={})
+
+            def run_round(bracket, members, rows):
+                """Fit members on `rows` rows and record their validation scores"""
+                jobs = [(i, name, rows, candidates[i]["params"]) for i in members]
+                label = f"bracket {bracket + 1}/{len(bracket_members)}, {rows} rows"
+                report_progress("search", fraction=0.0, message=f"{label}: 0/{len(jobs)} candidates")
+                if pool is None:
+                    outcomes = []
+                    for job in jobs:
+                        try:
+                            outcomes.append((job[0], _fit_trial(*job, local_state)))
+                        except Exception as e:
+                            outcomes.append((job[0], e))
+                        report_progress("search", fraction=len(outcomes) / len(jobs),
+                                        message=f"{label}: {len(outcomes)}/{len(jobs)} candidates")
+                else:
+                    futures = {pool.submit(_fit_trial, *job): job[0] for job in jobs}
+                    outcomes = []
+                    for future in as_completed(futures):
+                        try:
+                            outcomes.append((futures[future], future.result()))
+                        except Exception as e:
+                            outcomes.append((futures[future], e))
+                        report_progress("search", fraction=len(outcomes) / len(jobs),
+                                        message=f"{label}: {len(outcomes)}/{len(jobs)} candidates")
+                for i, outcome in outcomes:
+                    if isinstance(outcome, Exception):
+                        candidates[i]["rounds"].append({"rows": rows, "score": None})
+                        candidates[i]["error"] = str(outcome)
+                    else:
+                        _, _, score, seconds = outcome
+                        candidates[i]["rounds"].append({"rows": rows, "score": round(score, 4),
+                                                        "fit_seconds": round(seconds, 4)})
+                        candidates[i]["score"] = score
+                        candidates[i]["rows"] = rows
+
+            try:
+                for bracket, (members, rows) in enumerate(bracket_members):
+                    alive = members
+                    while alive:
+                        run_round(bracket, alive, rows)
+                        scored = [i for i in alive if candidates[i]["rounds"][-1]["score"] is not None]
+                        if rows >= pool_rows:
+                            break
+                        scored.sort(key=lambda i: candidates[i]["score"], reverse=True)
+                        alive = scored[:math.ceil(len(alive) / factor)]
+                        # A lone survivor goes straight to every row
+                        rows = pool_rows if len(alive) <= 1 else min(rows * factor, pool_rows)
+            finally:
+                if pool is not None:
+                    # On cancellation, candidates that have not started are dropped
+                    pool.shutdown(wait=True, cancel_futures=True)
+
+        # Candidates that reached the most rows rank first, then by score
+        ranked = sorted(
+            (i for i, c in enumerate(candidates) if c.get("score") is not None),
+            key=lambda i: (candidates[i]["rows"], candidates[i]["score"]),
+            reverse=True,
+        )
+        if not ranked:
+            errors = sorted({c["error"] for c in candidates if "error" in c})
+            return {"error": f"No candidate could be trained: {'; '.join(errors)}"}
+        leaderboard = []
+        for rank, i in enumerate(ranked, start=1):
+            candidate = candidates[i]
+            leaderboard.append({
+                "rank": rank,
+                "params": candidate["params"],
+                "score": round(candidate["score"], 4),
+                "rows": candidate["rows"],
+                "rounds": candidate["rounds"],
+            })
+        for candidate in candidates:
+            if candidate.get("score") is None:
+                leaderboard.append({"params": candidate["params"], "score": None,
+                                    "rounds": candidate["rounds"], "error": candidate.get("error")})
+
+        # Train the winner on every training row, evaluate on the test rows, save it
+        best_params = candidates[ranked[0]]["params"]
+        report_progress("refit", message=name)
+        result = run_estimator(name, data, test_size, random_state, best_params)
+        best_model = {
+            "model_id": result.get("model_id"),
+            "params": best_params,
+            "validation_score": leaderboard[0]["score"],
+            "score": leaderboard_score(task, result),
+            "metrics": {k: result[k] for k in LEADERBOARD_METRICS[task] if k in result},
+        }
+        for key in ("database_id", "r2_path", "storage_status", "model_path"):
+            if key in result:
+                best_model[key] = result[key]
+        if include_results:
+            best_model["result"] = result
+
+        return {
+            "model": model,
+            "estimator": name,
+            "task_type": task,
+            "metric": "accuracy" if task == "classification" else "r2",
+            "method": method,
+            "factor": factor,
+            "n_candidates": len(candidates),
+            "n_fits": sum(len(c["rounds"]) for c in candidates),
+            "leaderboard": leaderboard,
+            "best_params": best_params,
+            "best_model": best_model,
+            "n_samples": data.n_samples,
+            "search_rows": pool_rows,
+            "validation_rows": X_val.shape[0],
+            "target_column": data.target_column,
+            "workers": max_workers,
+            "cores_per_worker": worker_cores,
+            "prepare_seconds": round(prepare_seconds, 4),
+            "elapsed_seconds": round(time.perf_counter() - started, 4),
+            "testSize": float(test_size),
+        }
+
+    except Exception as e:
+        return {"error": str(e)}
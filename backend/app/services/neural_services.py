@@ -1,5 +1,3 @@
-import pandas as pd
-import io
 import os
 from datetime import datetime
 from sklearn.model_selection import train_test_split
@@ -8,6 +6,9 @@ from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
 from sklearn.preprocessing import StandardScaler
 from sklearn.inspection import permutation_importance
 from app.services.clean_data import clean_data
+from app.services.preprocessing import FeaturePipeline
+from app.utils.file_processor import read_uploaded_file
+from app.utils.job_queue import report_progress
 import joblib
 from math import sqrt
 
@@ -15,17 +16,15 @@ def neural_network_regression_algo(file, target_column=None, test_size=0.3, rand
                                    hidden_layer_sizes=(100,), activation='relu', solver='adam', max_iter=500):
     try:
         # Read CSV or Excel
-        if file.name.endswith(('.xls', '.xlsx')):
-            df = pd.read_excel(file)
-        else:
-            file.seek(0)
-            df = pd.read_csv(io.BytesIO(file.read()))
+        report_progress('parse')
+        df = read_uploaded_file(file)
         
         if df.empty:
             return {"error": "Uploaded file is empty."}
         
         # Apply data cleaning if needed
         if not cleaned_data:
+            report_progress('clean')
             df, _ = clean_data(df=df)
         
         # Use provided target_column or fallback to last column
@@ -38,12 +37,10 @@ def neural_network_regression_algo(file, target_column=None, test_size=0.3, rand
         X = df.drop(columns=[target_column])
         y = df[target_column]
 
-        # Encoding categorical columns
-        X = pd.get_dummies(X, drop_first=True)
-        X = X.select_dtypes(include="number")
-
-        if X.empty:
-            return {"error": "No numeric features available after encoding."}
+        # Encoding categorical columns (the fitted pipeline is saved with the model)
+        report_progress('encode')
+        pipeline = FeaturePipeline().fit(X)
+        X = pipeline.transform_frame(X)
 
         # Train/test split
         X_train, X_test, y_train, y_test = train_test_split(
@@ -63,7 +60,9 @@ def neural_network_regression_algo(file, target_column=None, test_size=0.3, rand
             max_iter=max_iter,
             random_state=random_state
         )
+        report_progress('fit', message=f'max_iter={max_iter}')
         model.fit(X_train_scaled, y_train)
+        report_progress('evaluate')
         preds = model.predict(X_test_scaled)
 
         # Save the trained model
@@ -72,9 +71,11 @@ def neural_network_regression_algo(file, target_column=None, test_size=0.3, rand
         model_path = os.path.join('trained_models', model_filename)
         os.makedirs('trained_models', exist_ok=True)
 
+        report_progress('persist', message=model_id)
         model_data = {
             'model': model,
             'scaler': scaler,
+            'pipeline': pipeline.fitted(scaler=scaler),
             'feature_names': X.columns.tolist(),
             'target_column': target_column,
             'model_id': model_id
@@ -84,6 +85,7 @@ def neural_network_regression_algo(file, target_column=None, test_size=0.3, rand
         y_test = y_test.reset_index(drop=True)
 
         # Compute top features using permutation importance
+        report_progress('evaluate', message='permutation importance')
         perm_importance = permutation_importance(model, X_test_scaled, y_test, n_repeats=5, random_state=random_state)
         feature_importance = dict(zip(X.columns.tolist(), perm_importance.importances_mean))
         top_features = dict(sorted(feature_importance.items(), key=lambda x: abs(x[1]), reverse=True)[:5])
@@ -0,0 +1,296 @@
+"""
+Scoring saved models outside of training
+
+Models trained by the training engine carry their fitted FeaturePipeline
+(app/services/preprocessing.py) in the artifact, which encodes, scales and
+decodes exactly like training did. Older artifacts only know their
+feature_names; they are scored through a FeatureLayout rebuilt from those
+names. Both expose the same interface (missing_columns, transform,
+transform_records, decode), so the endpoints do not care which one they get.
+
+Batch scoring: input rows are read chunk by chunk (CSV, Parquet, Excel or a
+stored dataset), encoded, scored with predict (and optionally predict_proba)
+and written out as CSV or NDJSON text. Only one chunk is held in memory at a
+time, so the size of the input is not bounded by RAM and the first rows can be
+sent while the rest are still being read. Each chunk is scored on the idle
+cores of the CPU budget (app/utils/cpu_budget.py), which are released before
+the chunk is written out.
+
+Online scoring: JSON records are written straight into a preallocated NumPy
+matrix, without pandas.
+"""
+import json
+import threading
+import warnings
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from app.utils.cpu_budget import cpu_slot
+
+BATCH_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Feature layouts of legacy models kept per distinct feature list (LRU)
+LAYOUT_CACHE_SIZE = 256
+
+_layout_cache: "OrderedDict[str, FeatureLayout]" = OrderedDict()
+_layout_cache_lock = threading.Lock()
+
+
+class FeatureLayout:
+    """
+    Column positions of a legacy model's training features
+
+    A record provides a feature either under its own name (numeric columns,
+    or an already encoded one-hot column such as 'city_Paris': 1) or through
+    the categorical column it was encoded from ('city': 'Paris'). Category
+    values that have no column (the dropped reference category, or values
+    unseen in training) leave all of that column's one-hot features at 0.
+    """
+
+    def __init__(self, feature_names):
+        self.feature_names = list(feature_names)
+        self.index = {name: i for i, name in enumerate(self.feature_names)}
+        # Categorical column -> indices of its one-hot features, filled on first use
+        self._groups = {}
+
+    def _group(self, column):
+        group = self._groups.get(column)
+        if group is None:
+            prefix = f"{column}_"
+            group = [i for i, name in enumerate(self.feature_names) if name.startswith(prefix)]
+            if group:
+                self._groups[column] = group
+        return group
+
+    @property
+    def input_columns(self):
+        return list(self.feature_names)
+
+    @staticmethod
+    def _provides(column, feature):
+        """True if an input column is the feature itself or its one-hot source"""
+        return feature == column or feature.startswith(f"{column}_")
+
+    def missing_columns(self, columns):
+        """Training features that none of the input columns provides"""
+        columns = [str(col) for col in columns]
+        return [f for f in self.feature_names if not any(self._provides(col, f) for col in columns)]
+
+    def transform(self, chunk):
+        """
+        Feature matrix of a raw frame
+
+        The frame is encoded without drop_first and reindexed to the training
+        columns: dummies of the dropped (reference) category are discarded and
+        categories absent from the frame become zero columns, so every chunk
+        gets the same encoding. Columns the model does not use (e.g. ids) are
+        dropped before encoding.
+        """
+        used = [col for col in chunk.columns if any(self._provides(str(col), f) for f in self.feature_names)]
+        X = pd.get_dummies(chunk[used], drop_first=False)
+        return X.reindex(columns=self.feature_names, fill_value=0).to_numpy(dtype=np.float64)
+
+    def transform_records(self, records):
+        """
+        Feature matrix of JSON records
+
+        Args:
+            records: List of dicts mapping column names to values; keys that
+                match no feature (e.g. ids) are ignored
+
+        Returns:
+            float64 array of shape (len(records), n_features)
+
+        Raises:
+            ValueError: If a record is not an object, misses features or has a
+                non-numeric value for a numeric feature
+        """
+        n_features = len(self.feature_names)
+        X = np.zeros((len(records), n_features), dtype=np.float64)
+        provided = np.zeros(n_features, dtype=bool)
+        for r, record in enumerate(records):
+            if not isinstance(record, dict):
+                raise ValueError(f"Record {r} is not a JSON object")
+            row = X[r]
+            provided[:] = False
+            for key, value in record.items():
+                i = self.index.get(key)
+                if i is not None:
+                    if value is None or isinstance(value, str) and not value.strip():
+                        raise ValueError(f"Record {r}: '{key}' is empty")
+                    try:
+                        row[i] = float(value)
+                    except (TypeError, ValueError):
+                        raise ValueError(f"Record {r}: '{key}' must be a number, got {value!r}")
+                    provided[i] = True
+                    continue
+                group = self._group(key)
+                if group:
+                    i = self.index.get(f"{key}_{value}")
+                    if i is not None:
+                        row[i] = 1.0
+                    provided[group] = True
+            if not provided.all():
+                missing = [self.feature_names[i] for i in np.flatnonzero(~provided)]
+                raise ValueError(f"Record {r} is missing required features: {', '.join(missing)}")
+        return X
+
+    def decode(self, predictions):
+        return predictions
+
+
+def feature_layout(feature_names_json):
+    """
+    FeatureLayout of a legacy model, keyed by its stored feature_names JSON
+
+    Models trained on the same columns share one layout, and the JSON is
+    only parsed on the first request.
+    """
+    with _layout_cache_lock:
+        layout = _layout_cache.get(feature_names_json)
+        if layout is not None:
+            _layout_cache.move_to_end(feature_names_json)
+            return layout
+    layout = FeatureLayout(json.loads(feature_names_json))
+    with _layout_cache_lock:
+        _layout_cache[feature_names_json] = layout
+        while len(_layout_cache) > LAYOUT_CACHE_SIZE:
+            _layout_cache.popitem(last=False)
+    return layout
+
+
+def unpack_model(obj, feature_names_json):
+    """
+    Estimator and preprocessing of a loaded artifact
+
+    Most estimators are stored bare or as a dict holding the estimator under
+    'model'; artifacts of the training engine also hold a FeaturePipeline
+    under 'pipeline'.
+
+    Args:
+        obj: Loaded artifact
+        feature_names_json: MLModel.feature_names, used when the artifact has
+            no pipeline
+
+    Returns:
+        tuple: (estimator, FeaturePipeline or FeatureLayout)
+    """
+    pipeline = None
+    if isinstance(obj, dict) and "model" in obj:
+        pipeline = obj.get("pipeline")
+        obj = obj["model"]
+    if pipeline is None:
+        pipeline = feature_layout(feature_names_json)
+    return obj, pipeline
+
+
+def classes_of(model, pipeline):
+    """Class labels of a classifier in predict_proba column order"""
+    return pipeline.decode(model.classes_)
+
+
+@contextmanager
+def _unnamed_features():
+    """
+    Silence the feature-name check for the scoring calls in the block
+
+    Scoring passes arrays in the training column order to estimators fitted on
+    DataFrames, which would warn on every call; the filter is restored on exit.
+    """
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+        yield
+
+
+def score_chunks(model, pipeline, chunks, proba=False, id_column=None):
+    """
+    Score DataFrame chunks
+
+    Args:
+        model: Fitted estimator
+        pipeline: Its FeaturePipeline or FeatureLayout
+        chunks: Iterable of input DataFrames
+        proba: Add one probability column per class (classifiers only)
+        id_column: Input column copied to the output to identify rows;
+            by default the running row number is used
+
+    Yields:
+        DataFrame of results per chunk
+    """
+    if proba and not hasattr(model, "predict_proba"):
+        raise ValueError("This model does not support probability predictions")
+    classes = classes_of(model, pipeline) if proba else None
+
+    row = 0
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        X = pipeline.transform(chunk)
+        out = pd.DataFrame(index=range(len(chunk)))
+        if id_column:
+            out[id_column] = chunk[id_column].to_numpy()
+        else:
+            out["row"] = np.arange(row, row + len(chunk))
+        with cpu_slot(), _unnamed_features():
+            predictions = model.predict(X)
+            probabilities = model.predict_proba(X) if proba else None
+        out["prediction"] = pipeline.decode(predictions)
+        if proba:
+            for i, label in enumerate(classes):
+                out[f"proba_{label}"] = probabilities[:, i]
+        row += len(chunk)
+        yield out
+
+
+def format_chunks(results, fmt="csv"):
+    """
+    Serialize scored chunks as CSV (one header) or NDJSON text
+
+    Args:
+        results: Iterable of result DataFrames
+        fmt: 'csv' or 'ndjson'
+
+    Yields:
+        str pieces of the response body
+    """
+    header = True
+    for frame in results:
+        if fmt == "ndjson":
+            yield frame.to_json(orient="records", lines=True, double_precision=15)
+        else:
+            yield frame.to_csv(index=False, header=header)
+            header = False
+
+
+def format_error(message, fmt="csv"):
+    """Trailer written when scoring fails after the response has started"""
+    if fmt == "ndjson":
+        return json.dumps({"error": message}) + "\n"
+    return f"# error: {message}\n"
+
+
+def predict_records(model, pipeline, X, proba=False):
+    """
+    Predictions (and class probabilities) of an encoded feature matrix as
+    JSON-ready lists
+
+    Returns:
+        dict with 'predictions' and, when proba is set, 'probabilities'
+        (one {class: probability} dict per row)
+    """
+    if proba and not hasattr(model, "predict_proba"):
+        raise ValueError("This model does not support probability predictions")
+    with _unnamed_features():
+        predictions = model.predict(X)
+        probabilities = model.predict_proba(X) if proba else None
+    result = {"predictions": np.asarray(pipeline.decode(predictions)).tolist()}
+    if proba:
+        classes = np.asarray(classes_of(model, pipeline)).tolist()
+        result["probabilities"] = [dict(zip(classes, row)) for row in probabilities.tolist()]
+    return result
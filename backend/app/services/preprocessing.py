@@ -0,0 +1,428 @@
+"""
+Fitted feature preprocessing saved with every trained model
+
+FeaturePipeline records, at training time, everything needed to turn raw
+input columns into the model's feature matrix:
+
+    numeric_columns   numeric (and boolean) columns, copied as is
+    categories        vocabulary of each categorical column; the first level
+                      is the reference category and gets no column
+                      (pd.get_dummies(drop_first=True) layout)
+    hashed_columns    categorical columns with vocabularies too large to keep,
+                      hashed into hash_features shared columns (hashing trick)
+    feature_names     the fixed output column layout
+    scaler            StandardScaler of models trained on scaled features
+    label_encoder     LabelEncoder of models trained on an encoded target
+
+Training encodes its frame through the same pipeline, and the pipeline is
+pickled into the model artifact, so prediction reproduces the training
+encoding exactly whatever categories a scoring batch contains. Categorical
+values are mapped to their output columns with precomputed level indices
+instead of re-deriving dummies.
+
+Estimators that accept SciPy sparse input are encoded with sparse=True: wide
+layouts are then built as a CSR matrix straight from the level indices (no
+dense dummy frame), vocabularies up to MAX_SPARSE_LEVELS are one-hot encoded
+and larger ones are hashed instead of dropped.
+
+Estimators with native categorical and missing-value support (histogram
+gradient boosting) are encoded with ENCODE_ORDINAL: one column per categorical
+column holding its level code, NaN for missing or unseen values, and numeric
+NaNs kept as they are.
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.utils import murmurhash3_32
+
+# Feature encodings
+ENCODE_DUMMIES = "dummies"  # one-hot categoricals (drop_first), numeric columns kept
+ENCODE_NUMERIC = "numeric"  # numeric columns only, categoricals dropped
+ENCODE_ORDINAL = "ordinal"  # categoricals as level codes, missing values kept as NaN
+
+# Dense layouts: categorical columns with more levels are not one-hot encoded
+# (typically ids or free text, which would explode the dense layout)
+MAX_ONE_HOT_LEVELS = 100
+# Sparse layouts: larger vocabularies are hashed
+MAX_SPARSE_LEVELS = 10_000
+# Columns shared by all hashed categorical columns (0 drops them instead)
+HASH_FEATURES = 2 ** 12
+# Sparse-capable layouts with at least this many features are built as CSR
+SPARSE_MIN_FEATURES = 256
+# Ordinal layouts: native categorical support is limited to 255 levels
+# (HistGradientBoosting's max_bins)
+MAX_ORDINAL_LEVELS = 255
+
+
+def _levels(values):
+    """Vocabulary of a categorical column in pd.get_dummies order"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return [str(level) for level in values.cat.categories]
+    unique = values.dropna().unique()
+    try:
+        unique = sorted(unique)
+    except TypeError:  # Mixed types: order by text
+        unique = sorted(unique, key=str)
+    return [str(level) for level in unique]
+
+
+def _bucket(column, value, n_buckets):
+    """Hashing-trick column of one categorical value"""
+    return murmurhash3_32(f"{column}={value}", positive=True) % n_buckets
+
+
+class FeaturePipeline:
+    """
+    Training-time feature encoding, replayable on new data
+
+    Args:
+        encoding: ENCODE_DUMMIES, ENCODE_NUMERIC or ENCODE_ORDINAL
+        sparse: The estimator accepts SciPy sparse matrices
+        max_levels: Larger vocabularies are hashed (sparse) or dropped;
+            defaults to MAX_SPARSE_LEVELS / MAX_ONE_HOT_LEVELS
+        hash_features: Hashing-trick columns for oversized vocabularies
+            (sparse only; 0 drops those columns)
+    """
+
+    def __init__(self, encoding=ENCODE_DUMMIES, sparse=False, max_levels=None, hash_features=HASH_FEATURES):
+        self.encoding = encoding
+        self.allow_sparse = sparse
+        if encoding == ENCODE_ORDINAL:
+            sparse = False
+            max_levels = max_levels or MAX_ORDINAL_LEVELS
+        self.max_levels = max_levels or (MAX_SPARSE_LEVELS if sparse else MAX_ONE_HOT_LEVELS)
+        self.hash_features = hash_features if sparse else 0
+        self.sparse = False
+        self.numeric_columns = []
+        self.categories = {}
+        self.hashed_columns = []
+        self.dropped_columns = []
+        self.feature_names = []
+        self.scaler = None
+        self.label_encoder = None
+        self._offsets = {}
+        self._level_index = {}
+        self._hash_offset = 0
+
+    # -- fitting ---------------------------------------------------------
+
+    def fit(self, X):
+        """
+        Learn the column layout of a raw feature frame
+
+        Raises:
+            ValueError: If no numeric features remain after encoding
+        """
+        self.numeric_columns = X.select_dtypes(include=["number", "bool"]).columns.tolist()
+        self.categories = {}
+        self.hashed_columns = []
+        self.dropped_columns = []
+        if self.encoding in (ENCODE_DUMMIES, ENCODE_ORDINAL):
+            for col in X.select_dtypes(include=["object", "category", "string"]).columns:
+                levels = _levels(X[col])
+                if len(levels) <= self.max_levels:
+                    if len(levels) > 1:
+                        self.categories[col] = levels
+                elif len(levels) == X[col].count():
+                    # Every value distinct: an id, not a feature
+                    self.dropped_columns.append(col)
+                elif self.hash_features:
+                    self.hashed_columns.append(col)
+                else:
+                    self.dropped_columns.append(col)
+
+        self.feature_names = [str(col) for col in self.numeric_columns]
+        if self.ordinal:
+            self.feature_names.extend(str(col) for col in self.categories)
+        else:
+            for col, levels in self.categories.items():
+                self.feature_names.extend(f"{col}_{level}" for level in levels[1:])
+        if self.hashed_columns:
+            self.feature_names.extend(f"hashed_{i}" for i in range(self.hash_features))
+        if not self.feature_names:
+            stage = "preprocessing" if self.encoding == ENCODE_NUMERIC else "encoding"
+            raise ValueError(f"No numeric features available after {stage}.")
+        self.sparse = bool(self.allow_sparse and (self.hashed_columns or self.n_features >= SPARSE_MIN_FEATURES))
+        self._build_index()
+        return self
+
+    def _build_index(self):
+        """Output column offset of each categorical column and level -> column maps"""
+        self._offsets = {}
+        self._level_index = {}
+        position = len(self.numeric_columns)
+        if self.ordinal:
+            # One column per categorical column holding the level code
+            for col, levels in self.categories.items():
+                self._offsets[col] = position
+                self._level_index[col] = {level: i for i, level in enumerate(levels)}
+                position += 1
+            self._hash_offset = position
+            return
+        for col, levels in self.categories.items():
+            self._offsets[col] = position
+            # The reference level maps to no column (-1)
+            self._level_index[col] = {level: (position + i - 1 if i else -1) for i, level in enumerate(levels)}
+            position += len(levels) - 1
+        self._hash_offset = position
+
+    def fitted(self, scaler=None, label_encoder=None):
+        """Copy of the pipeline carrying the scaler / label encoder of one model"""
+        pipeline = copy.copy(self)
+        pipeline.scaler = scaler
+        pipeline.label_encoder = label_encoder
+        return pipeline
+
+    @property
+    def input_columns(self):
+        """Raw columns a scoring input must provide"""
+        return list(self.numeric_columns) + list(self.categories) + list(self.hashed_columns)
+
+    @property
+    def n_features(self):
+        return len(self.feature_names)
+
+    @property
+    def ordinal(self):
+        return self.encoding == ENCODE_ORDINAL
+
+    @property
+    def categorical_mask(self):
+        """Boolean mask of the level-code features (categorical_features of the estimator)"""
+        n_codes = len(self.categories) if self.ordinal else 0
+        return [False] * len(self.numeric_columns) + [True] * n_codes
+
+    def describe(self):
+        """JSON summary stored in the artifact manifest"""
+        return {
+            "encoding": self.encoding,
+            "sparse": self.sparse,
+            "numeric_columns": [str(col) for col in self.numeric_columns],
+            "categories": {str(col): levels for col, levels in self.categories.items()},
+            "hashed_columns": [str(col) for col in self.hashed_columns],
+            "hash_features": self.hash_features if self.hashed_columns else 0,
+            "dropped_columns": [str(col) for col in self.dropped_columns],
+            "scaled": self.scaler is not None,
+            "classes": self.label_encoder.classes_.tolist() if self.label_encoder is not None else None,
+        }
+
+    # -- encoding --------------------------------------------------------
+
+    def _codes(self, values, col):
+        """Output column of each value of a categorical column (-1: no column)"""
+        levels = self.categories[col]
+        codes = pd.Categorical(values.astype(str), categories=levels).codes.astype(np.int64)
+        codes[values.isna().to_numpy()] = -1
+        # Level i lives in column offset + i - 1; the reference level (0) has none
+        return np.where(codes > 0, codes - 1 + self._offsets[col], -1)
+
+    def _ordinal(self, values, col):
+        """Level code of each value of a categorical column (NaN: missing or unseen)"""
+        codes = pd.Categorical(values.astype(str), categories=self.categories[col]).codes.astype(np.float64)
+        codes[codes < 0] = np.nan
+        codes[values.isna().to_numpy()] = np.nan
+        return codes
+
+    def _hashed(self, values, col):
+        """Hashing-trick column of each value (-1 for missing values)"""
+        codes, uniques = pd.factorize(values)
+        buckets = np.array([_bucket(col, value, self.hash_features) for value in uniques.astype(str)],
+                           dtype=np.int64)
+        positions = np.full(len(codes), -1, dtype=np.int64)
+        hit = codes >= 0
+        positions[hit] = self._hash_offset + buckets[codes[hit]]
+        return positions
+
+    def _one_hot(self, X):
+        """(rows, columns) positions of the ones in the categorical block"""
+        rows, cols = [], []
+        for col in self.categories:
+            positions = self._codes(X[col], col)
+            hit = np.flatnonzero(positions >= 0)
+            rows.append(hit)
+            cols.append(positions[hit])
+        for col in self.hashed_columns:
+            positions = self._hashed(X[col], col)
+            hit = np.flatnonzero(positions >= 0)
+            rows.append(hit)
+            cols.append(positions[hit])
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(rows), np.concatenate(cols)
+
+    def _numeric_block(self, X):
+        """Numeric columns as a float64 array"""
+        out = np.empty((len(X), len(self.numeric_columns)), dtype=np.float64)
+        for i, col in enumerate(self.numeric_columns):
+            try:
+                out[:, i] = X[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            except (TypeError, ValueError):
+                raise ValueError(f"Column '{col}' must be numeric")
+        return out
+
+    def _csr(self, X):
+        """CSR feature matrix: numeric block plus the ones of the categorical block"""
+        n_rows = len(X)
+        numeric = sp.csr_matrix(self._numeric_block(X))
+        rows, cols = self._one_hot(X)
+        n_categorical = self.n_features - len(self.numeric_columns)
+        # Duplicate hashed positions in one row add up, as in FeatureHasher
+        categorical = sp.csr_matrix(
+            (np.ones(len(rows)), (rows, cols - len(self.numeric_columns))),
+            shape=(n_rows, n_categorical),
+        )
+        return sp.hstack([numeric, categorical], format="csr")
+
+    def transform_frame(self, X):
+        """
+        Training features: a CSR matrix for sparse layouts, otherwise a
+        DataFrame with the numeric columns unchanged and one-hot columns as
+        uint8 (no scaling; scaling is part of the model split)
+        """
+        if self.sparse:
+            return self._csr(X)
+        numeric = X[self.numeric_columns]
+        bools = numeric.select_dtypes(include="bool").columns
+        if len(bools):
+            numeric = numeric.astype({col: np.uint8 for col in bools})
+        numeric.columns = [str(col) for col in numeric.columns]
+        if not self.categories:
+            return numeric
+        if self.ordinal:
+            codes = pd.DataFrame({str(col): self._ordinal(X[col], col) for col in self.categories}, index=X.index)
+            return pd.concat([numeric, codes], axis=1)
+        n_onehot = self.n_features - len(self.numeric_columns)
+        onehot = np.zeros((len(X), n_onehot), dtype=np.uint8)
+        rows, cols = self._one_hot(X)
+        onehot[rows, cols - len(self.numeric_columns)] = 1
+        onehot = pd.DataFrame(onehot, columns=self.feature_names[len(self.numeric_columns):], index=X.index)
+        return pd.concat([numeric, onehot], axis=1)
+
+    def missing_columns(self, columns):
+        """Input columns the pipeline needs but a frame does not have"""
+        present = set(str(col) for col in columns)
+        return [str(col) for col in self.input_columns if str(col) not in present]
+
+    def transform(self, X):
+        """
+        Feature matrix of a raw scoring frame, scaled like the training data
+
+        Returns:
+            float64 array of shape (len(X), n_features), or a CSR matrix for
+            sparse layouts
+
+        Raises:
+            ValueError: If required columns are missing or not numeric
+        """
+        missing = self.missing_columns(X.columns)
+        if missing:
+            raise ValueError(f"Missing required features: {', '.join(missing)}")
+        if self.sparse:
+            return self._scale(self._csr(X))
+        out = np.zeros((len(X), self.n_features), dtype=np.float64)
+        out[:, :len(self.numeric_columns)] = self._numeric_block(X)
+        if self.ordinal:
+            for col, offset in self._offsets.items():
+                out[:, offset] = self._ordinal(X[col], col)
+        else:
+            rows, cols = self._one_hot(X)
+            out[rows, cols] = 1.0
+        return self._scale(out)
+
+    def transform_records(self, records):
+        """
+        Feature matrix of JSON records (dicts of raw column values), built
+        straight into a preallocated array (or CSR matrix) without pandas
+
+        Ordinal layouts accept null for any column (a missing value).
+
+        Raises:
+            ValueError: If a record is not an object, misses columns or has a
+                non-numeric value for a numeric column
+        """
+        rows, cols, values = [], [], []
+        required = self.input_columns
+        ordinal = self.ordinal
+        for r, record in enumerate(records):
+            if not isinstance(record, dict):
+                raise ValueError(f"Record {r} is not a JSON object")
+            try:
+                for i, col in enumerate(self.numeric_columns):
+                    value = record[col]
+                    if value is None or isinstance(value, str) and not value.strip():
+                        if not ordinal:
+                            raise ValueError(f"Record {r}: '{col}' is empty")
+                        value = np.nan
+                    try:
+                        values.append(float(value))
+                    except (TypeError, ValueError):
+                        raise ValueError(f"Record {r}: '{col}' must be a number, got {value!r}")
+                    rows.append(r)
+                    cols.append(i)
+                for col, index in self._level_index.items():
+                    value = record[col]
+                    if ordinal:
+                        code = index.get(str(value)) if value is not None else None
+                        rows.append(r)
+                        cols.append(self._offsets[col])
+                        values.append(np.nan if code is None else float(code))
+                        continue
+                    position = index.get(str(value), -1) if value is not None else -1
+                    if position >= 0:
+                        rows.append(r)
+                        cols.append(position)
+                        values.append(1.0)
+                for col in self.hashed_columns:
+                    value = record[col]
+                    if value is not None:
+                        rows.append(r)
+                        cols.append(self._hash_offset + _bucket(col, str(value), self.hash_features))
+                        values.append(1.0)
+            except KeyError:
+                missing = [str(col) for col in required if col not in record]
+                raise ValueError(f"Record {r} is missing required features: {', '.join(missing)}")
+
+        shape = (len(records), self.n_features)
+        if self.sparse:
+            return self._scale(sp.csr_matrix((values, (rows, cols)), shape=shape))
+        out = np.zeros(shape, dtype=np.float64)
+        out[rows, cols] = values
+        return self._scale(out)
+
+    def _scale(self, X):
+        """Apply the model's StandardScaler (in place for dense arrays)"""
+        if self.scaler is None:
+            return X
+        mean = getattr(self.scaler, "mean_", None)
+        scale = getattr(self.scaler, "scale_", None)
+        if sp.issparse(X):
+            # Sparse models are scaled without centering (with_mean=False)
+            return X @ sp.diags(1.0 / scale) if scale is not None else X
+        if mean is not None and self.scaler.with_mean:
+            X -= mean
+        if scale is not None:
+            X /= scale
+        return X
+
+    # -- outputs ---------------------------------------------------------
+
+    def decode(self, predictions):
+        """Original target labels of label-encoded predictions"""
+        if self.label_encoder is None:
+            return predictions
+        return self.label_encoder.inverse_transform(np.asarray(predictions).astype(np.int64))
+
+    def __setstate__(self, state):
+        # Pipelines saved before hashing / sparse layouts existed
+        self.__dict__.update({"allow_sparse": False, "sparse": False, "hashed_columns": [], "hash_features": 0})
+        self.__dict__.update(state)
+        self._build_index()
+
+    def __getstate__(self):
+        # Lookup tables are rebuilt on load
+        state = self.__dict__.copy()
+        state["_offsets"] = {}
+        state["_level_index"] = {}
+        return state
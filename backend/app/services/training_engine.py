@@ -0,0 +1,614 @@
+"""
+Training engine shared by the tabular models
+
+Every model goes through the same stages:
+
+    prepare   read the upload (parse), optionally clean it, split off the
+              target and encode the features (prepare_training_data)
+    split     train/test split, memoized on the PreparedData
+    fit       build the estimator from the registry and fit it
+    report    model specific result payload, then persist the artifact
+
+Prepared data is cached per (dataset, cleaning, target, encoding), so training
+several models on one dataset reads, cleans and encodes it only once. Frames
+loaded from the dataset store carry their dataset_id in df.attrs, which is used
+as the cache key; other inputs are only shared within one train_models call.
+
+Fitting and evaluation run inside a slot of the process CPU budget
+(app/utils/cpu_budget.py): models registered as parallel get every idle core
+through joblib's n_jobs and the BLAS/OpenMP thread limits, the others one core.
+
+Models are added with register_estimator; the built-in ones live in
+app/services/estimators.py.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import joblib
+import scipy.sparse as sp
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from app.services.clean_data import clean_data
+from app.services.preprocessing import ENCODE_DUMMIES, FeaturePipeline
+from app.utils.cpu_budget import cpu_slot
+from app.utils.file_processor import read_uploaded_file
+from app.utils.job_queue import report_progress
+
+MODEL_DIR = "trained_models"
+PREPARED_CACHE_SIZE = 8
+
+ESTIMATORS = {}
+MODEL_ALIASES = {}
+
+_prepared_cache = OrderedDict()
+_prepared_lock = threading.Lock()
+
+
+class PreparedData:
+    """Cleaned frame with its encoded features, target and fitted FeaturePipeline"""
+
+    def __init__(self, df, target_column, X, y, encoding, pipeline=None):
+        self.df = df
+        self.target_column = target_column
+        self.X = X
+        self.y = y
+        self.encoding = encoding
+        self.pipeline = pipeline
+        self.feature_names = pipeline.feature_names if pipeline is not None else X.columns.tolist()
+        self._memo = {}
+
+    @property
+    def n_samples(self):
+        return len(self.df)
+
+    def _memoize(self, key, compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def encoded_target(self):
+        """
+        Label-encode an object or category target
+
+        Returns:
+            tuple: (y, label_encoder); label_encoder is None for other dtypes
+        """
+        def encode():
+            if self.y.dtype == "object" or self.y.dtype.name == "category":
+                label_encoder = LabelEncoder()
+                return label_encoder.fit_transform(self.y), label_encoder
+            return self.y, None
+
+        return self._memoize(("target",), encode)
+
+    def split(self, test_size, random_state, stratify=False, encode_target=False):
+        """
+        Train/test split, shared by every model asking for the same split
+
+        Returns:
+            tuple: (X_train, X_test, y_train, y_test)
+        """
+        def compute():
+            y = self.encoded_target()[0] if encode_target else self.y
+            return train_test_split(
+                self.X,
+                y,
+                test_size=test_size,
+                random_state=random_state,
+                stratify=y if stratify else None,
+            )
+
+        key = ("split", float(test_size), random_state, bool(stratify), bool(encode_target))
+        return self._memoize(key, compute)
+
+    def preset_split(self, split, test_size, random_state, stratify=False, encode_target=False):
+        """
+        Use the given (X_train, X_test, y_train, y_test) as split() for these
+        arguments, e.g. a subsample of the training rows scored on a fixed
+        validation set (hyperparameter search)
+        """
+        key = ("split", float(test_size), random_state, bool(stratify), bool(encode_target))
+        self._memo[key] = split
+
+    def scaled_split(self, test_size, random_state, stratify=False, encode_target=False):
+        """
+        Standardized version of split(); the scaler is fit on the train rows
+        (sparse matrices are scaled without centering, which would densify them)
+
+        Returns:
+            tuple: (X_train_scaled, X_test_scaled, scaler)
+        """
+        def compute():
+            X_train, X_test, _, _ = self.split(test_size, random_state, stratify, encode_target)
+            scaler = StandardScaler(with_mean=not sp.issparse(X_train))
+            return scaler.fit_transform(X_train), scaler.transform(X_test), scaler
+
+        key = ("scaled", float(test_size), random_state, bool(stratify), bool(encode_target))
+        return self._memoize(key, compute)
+
+
+class TrainingRun:
+    """State of one model fit, handed to the estimator hooks"""
+
+    def __init__(self, name, spec, data, params, test_size, random_state):
+        self.name = name
+        self.spec = spec
+        self.data = data
+        self.params = params
+        self.test_size = test_size
+        self.random_state = random_state
+        self.model_id = f"{spec['model_type']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.model = None
+        self.scaler = None
+        self.label_encoder = None
+        self.X_train = self.X_test = self.y_train = self.y_test = None
+        self.preds = None
+
+    def __getstate__(self):
+        # Fitted runs travel back from worker processes without the registry
+        # entry (hooks are not picklable) or the training matrices
+        state = self.__dict__.copy()
+        for key in ("spec", "data", "X_train", "X_test", "y_train", "y_test", "preds"):
+            state[key] = None
+        return state
+
+    def restore(self, data):
+        """Reattach the registry entry and data after unpickling"""
+        self.spec = get_estimator(self.name)
+        self.data = data
+        return self
+
+    @property
+    def feature_names(self):
+        return self.data.feature_names
+
+    @property
+    def n_features(self):
+        return len(self.data.feature_names)
+
+    @property
+    def pipeline(self):
+        """Preprocessing of this model: the dataset's encoding plus its scaler and label encoder"""
+        return self.data.pipeline.fitted(scaler=self.scaler, label_encoder=self.label_encoder)
+
+
+def register_estimator(
+    name,
+    model_type,
+    task,
+    build,
+    result,
+    encoding=ENCODE_DUMMIES,
+    random_state=101,
+    stratify=False,
+    encode_target=False,
+    scale=False,
+    sparse=False,
+    parallel=False,
+    normalize=None,
+    dispatch=None,
+    fit=None,
+    fit_params=None,
+    persist=None,
+):
+    """
+    Add a model to the training engine
+
+    Args:
+        name: Model name used by the API (e.g. 'random-forest')
+        model_type: Prefix of the model_id and storage folder
+        task: 'regression', 'classification' or 'decomposition'
+        build: build(params, random_state) -> unfitted estimator
+        result: result(run) -> response payload
+        encoding: ENCODE_DUMMIES, ENCODE_NUMERIC or ENCODE_ORDINAL (level
+            codes, declared to the estimator as categorical_features)
+        random_state: Default seed when the caller passes None
+        stratify: Stratify the train/test split on the target
+        encode_target: Label-encode object/category targets
+        scale: Standardize the features before fitting
+        sparse: The estimator accepts SciPy sparse input; wide categorical
+            layouts are then encoded as CSR and huge vocabularies hashed
+        parallel: The estimator runs on several cores (n_jobs, OpenMP); it
+            then gets every idle core of the CPU budget instead of one
+        normalize: Optional normalize(params) -> params, applied before build
+        dispatch: Optional dispatch(params, n_samples) -> (name, params)
+            handing the request to another registered model (name None
+            keeps this one), e.g. a faster engine for large datasets
+        fit: Optional fit(run) replacing the supervised fit step
+        fit_params: Optional fit_params(run) -> extra keyword arguments for
+            model.fit in the supervised fit step (e.g. a progress monitor)
+        persist: Optional persist(run, result) -> extra payload keys;
+            defaults to a joblib file in trained_models/
+    """
+    ESTIMATORS[name] = {
+        "name": name,
+        "model_type": model_type,
+        "task": task,
+        "build": build,
+        "result": result,
+        "encoding": encoding,
+        "random_state": random_state,
+        "stratify": stratify,
+        "encode_target": encode_target,
+        "scale": scale,
+        "sparse": sparse,
+        "parallel": parallel,
+        "normalize": normalize,
+        "dispatch": dispatch,
+        "fit": fit or fit_supervised,
+        "fit_params": fit_params,
+        "persist": persist or save_local,
+    }
+
+
+def register_alias(alias, name, **params):
+    """Accept another name for a registered model, with preset params"""
+    MODEL_ALIASES[alias] = (name, params)
+
+
+def resolve_model(name, params=None):
+    """
+    Resolve an alias to its registered model name
+
+    Returns:
+        tuple: (name, params) with the alias presets under the given params
+    """
+    if name in MODEL_ALIASES:
+        target, preset = MODEL_ALIASES[name]
+        return target, {**preset, **(params or {})}
+    return name, dict(params or {})
+
+
+def dispatch_model(name, params, n_samples):
+    """
+    Registered model that trains a request on a dataset of n_samples rows
+
+    Returns:
+        tuple: (name, params) after alias resolution and the model's dispatch hook
+    """
+    name, params = resolve_model(name, params)
+    dispatch = get_estimator(name)["dispatch"]
+    if dispatch:
+        target, params = dispatch(params, n_samples)
+        name = target or name
+    return name, params
+
+
+def get_estimator(name):
+    """Registry entry for a model name or alias; raises ValueError for unknown models"""
+    name = resolve_model(name)[0]
+    if name not in ESTIMATORS:
+        raise ValueError(f"Unknown model: {name}")
+    return ESTIMATORS[name]
+
+
+def _cache_get(key):
+    with _prepared_lock:
+        if key in _prepared_cache:
+            _prepared_cache.move_to_end(key)
+            return _prepared_cache[key]
+    return None
+
+
+def _cache_put(key, value):
+    with _prepared_lock:
+        _prepared_cache[key] = value
+        _prepared_cache.move_to_end(key)
+        while len(_prepared_cache) > PREPARED_CACHE_SIZE:
+            _prepared_cache.popitem(last=False)
+
+
+def clear_prepared_cache():
+    """Drop all cached cleaned frames and encoded datasets"""
+    with _prepared_lock:
+        _prepared_cache.clear()
+
+
+def _cleaned_frame(df, cleaned_data, dataset_key):
+    """Run clean_data unless the data is already clean (cached per dataset)"""
+    if cleaned_data:
+        return df
+    key = (dataset_key, "cleaned") if dataset_key else None
+    cleaned = _cache_get(key) if key else None
+    if cleaned is None:
+        report_progress("clean")
+        cleaned, _ = clean_data(df=df)
+        if key:
+            _cache_put(key, cleaned)
+    return cleaned
+
+
+def _encode(df, target_column, encoding, require_target, sparse=False):
+    """Split a cleaned frame into encoded features and target"""
+    if require_target:
+        if not target_column:
+            target_column = df.columns[-1]
+        if target_column not in df.columns:
+            raise ValueError(f"Target column '{target_column}' not found.")
+        X = df.drop(columns=[target_column])
+        y = df[target_column]
+    elif target_column and target_column in df.columns:
+        X = df.drop(columns=[target_column])
+        y = df[target_column]
+    else:
+        X = df
+        y = None
+
+    # The fitted pipeline is saved with the model so prediction encodes alike
+    pipeline = FeaturePipeline(encoding, sparse=sparse).fit(X)
+    X = pipeline.transform_frame(X)
+
+    return PreparedData(df, target_column, X, y, encoding, pipeline)
+
+
+def prepare_training_data(
+    file,
+    target_column=None,
+    cleaned_data=True,
+    encoding=ENCODE_DUMMIES,
+    require_target=True,
+    dataset_key=None,
+    sparse=False,
+):
+    """
+    Read, clean and encode a dataset for training
+
+    Args:
+        file: Uploaded file or an already parsed DataFrame
+        target_column: Target column (defaults to the last column when required)
+        cleaned_data: If True, skip clean_data
+        encoding: ENCODE_DUMMIES, ENCODE_NUMERIC or ENCODE_ORDINAL
+        require_target: If False the target is optional (unsupervised models)
+        dataset_key: Cache key of the dataset; defaults to df.attrs['dataset_id']
+        sparse: Encode for an estimator accepting sparse input
+
+    Returns:
+        PreparedData
+
+    Raises:
+        ValueError: Empty file, unknown target or no usable features
+    """
+    report_progress("parse")
+    df = read_uploaded_file(file)
+    if df.empty:
+        raise ValueError("Uploaded file is empty.")
+    dataset_key = dataset_key or df.attrs.get("dataset_id")
+    return _prepare_frame(df, target_column, cleaned_data, encoding, require_target, dataset_key, {}, sparse)
+
+
+def _prepare_frame(df, target_column, cleaned_data, encoding, require_target, dataset_key, memo, sparse=False):
+    """prepare_training_data on a parsed frame; memo holds the cleaned frame"""
+    key = None
+    if dataset_key:
+        key = (dataset_key, bool(cleaned_data), target_column, encoding, bool(require_target), bool(sparse))
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+
+    if "cleaned" not in memo:
+        memo["cleaned"] = _cleaned_frame(df, cleaned_data, dataset_key)
+    report_progress("encode", message=f"{encoding} (sparse)" if sparse else encoding)
+    data = _encode(memo["cleaned"], target_column, encoding, require_target, sparse)
+    if key:
+        _cache_put(key, data)
+    return data
+
+
+def fit_supervised(run):
+    """Default fit step: shared split (and scaling), fit, predict the test rows"""
+    spec = run.spec
+    data = run.data
+    split_args = (run.test_size, run.random_state, spec["stratify"], spec["encode_target"])
+
+    X_train, X_test, run.y_train, run.y_test = data.split(*split_args)
+    if spec["scale"]:
+        X_train, X_test, run.scaler = data.scaled_split(*split_args)
+    if spec["encode_target"]:
+        run.label_encoder = data.encoded_target()[1]
+    run.X_train, run.X_test = X_train, X_test
+
+    run.model = spec["build"](run.params, run.random_state)
+    if data.pipeline is not None and data.pipeline.ordinal and any(data.pipeline.categorical_mask):
+        run.model.set_params(categorical_features=data.pipeline.categorical_mask)
+    fit_params = spec["fit_params"](run) if spec["fit_params"] else {}
+    run.model.fit(X_train, run.y_train, **fit_params)
+    run.preds = run.model.predict(X_test)
+
+
+def model_artifact(run):
+    """Dictionary pickled for a trained model"""
+    artifact = {
+        "model": run.model,
+        "feature_names": run.feature_names,
+        "target_column": run.data.target_column,
+        "model_id": run.model_id,
+        "config": dict(run.params),
+        "pipeline": run.pipeline,
+    }
+    if run.spec["encode_target"]:
+        artifact["label_encoder"] = run.label_encoder
+    if run.scaler is not None:
+        artifact["scaler"] = run.scaler
+    return artifact
+
+
+def save_local(run, result):
+    """Default persist step: joblib file in trained_models/"""
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    joblib.dump(model_artifact(run), os.path.join(MODEL_DIR, f"{run.model_id}.pkl"))
+    return {}
+
+
+def fit_estimator(name, data, test_size=0.3, random_state=None, params=None, model_id=None):
+    """
+    Fit one registered model on prepared data (no payload, nothing saved)
+
+    Returns:
+        TrainingRun
+    """
+    name, params = resolve_model(name, params)
+    spec = get_estimator(name)
+    if spec["normalize"]:
+        params = spec["normalize"](params)
+    if random_state is None:
+        random_state = spec["random_state"]
+
+    run = TrainingRun(spec["name"], spec, data, params, test_size, random_state)
+    if model_id:
+        run.model_id = model_id
+    report_progress("fit", message=spec["name"])
+    with cpu_slot(estimator_cores(spec)):
+        spec["fit"](run)
+    return run
+
+
+def evaluate_estimator(run):
+    """Result payload of a fitted run, computed on the model's share of the CPU budget"""
+    with cpu_slot(estimator_cores(run.spec)):
+        return run.spec["result"](run)
+
+
+def run_estimator(name, data, test_size=0.3, random_state=None, params=None):
+    """
+    Fit one registered model on prepared data, report and persist it
+
+    Returns:
+        dict: The model's result payload (raises on failure)
+    """
+    run = fit_estimator(name, data, test_size, random_state, params)
+    report_progress("evaluate", message=run.name)
+    result = evaluate_estimator(run)
+    report_progress("persist", message=run.model_id)
+    result.update(run.spec["persist"](run, result))
+    return result
+
+
+def estimator_cores(spec):
+    """Cores a model asks the CPU budget for: None (all idle ones) or 1"""
+    return None if spec["parallel"] else 1
+
+
+def estimator_layout(spec):
+    """(encoding, require_target, sparse) of the prepared data a model trains on"""
+    return (spec["encoding"], spec["task"] != "decomposition", spec["sparse"])
+
+
+def prepare_layouts(file, layouts, target_column=None, cleaned_data=True, dataset_key=None):
+    """
+    Prepare one dataset for several layouts, reading and cleaning it once
+
+    Returns:
+        dict: {layout: PreparedData}
+    """
+    report_progress("parse")
+    df = read_uploaded_file(file)
+    if df.empty:
+        raise ValueError("Uploaded file is empty.")
+    dataset_key = dataset_key or df.attrs.get("dataset_id")
+    memo = {}
+    return {
+        layout: _prepare_frame(df, target_column, cleaned_data, *layout[:2], dataset_key, memo, layout[2])
+        for layout in layouts
+    }
+
+
+def train_model(
+    name,
+    file,
+    target_column=None,
+    test_size=0.3,
+    random_state=None,
+    cleaned_data=True,
+    params=None,
+    dataset_key=None,
+):
+    """
+    Prepare a dataset (or reuse the cached preparation) and train one model
+
+    Args:
+        name: Registered model name
+        file: Uploaded file or parsed DataFrame
+        target_column: Target column (defaults to the last column)
+        test_size: Fraction of rows held out for evaluation
+        random_state: Seed; None uses the model's default
+        cleaned_data: If True, skip clean_data
+        params: Model hyperparameters
+        dataset_key: Optional cache key of the dataset
+
+    Returns:
+        dict: Result payload or {'error': ...}
+    """
+    try:
+        report_progress("parse")
+        df = read_uploaded_file(file)
+        name, params = dispatch_model(name, params, len(df))
+        spec = get_estimator(name)
+        data = prepare_training_data(
+            df,
+            target_column,
+            cleaned_data,
+            spec["encoding"],
+            spec["task"] != "decomposition",
+            dataset_key,
+            spec["sparse"],
+        )
+        return run_estimator(name, data, test_size, random_state, params)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def train_models(
+    models,
+    file,
+    target_column=None,
+    test_size=0.3,
+    random_state=None,
+    cleaned_data=True,
+    dataset_key=None,
+):
+    """
+    Train several models on one dataset, reading and cleaning it once and
+    encoding it once per encoding
+
+    Args:
+        models: List of {'model': name, 'params': {...}} specs
+        Other args as in train_model
+
+    Returns:
+        list: [{'model': name, 'result': payload or {'error': ...}}, ...]
+    """
+    results = []
+    try:
+        report_progress("parse")
+        df = read_uploaded_file(file)
+        dispatched = []
+        for entry in models:
+            try:
+                dispatched.append(dispatch_model(entry.get("model"), entry.get("params"), len(df)))
+            except ValueError as e:
+                dispatched.append(e)
+        layouts = {estimator_layout(get_estimator(d[0])) for d in dispatched if not isinstance(d, Exception)}
+        prepared = prepare_layouts(df, layouts, target_column, cleaned_data, dataset_key)
+    except Exception as e:
+        return [{"model": entry.get("model"), "result": {"error": str(e)}} for entry in models]
+
+    for done, (entry, model) in enumerate(zip(models, dispatched)):
+        name = entry.get("model")
+        report_progress("fit", fraction=done / len(models), message=name)
+        try:
+            if isinstance(model, Exception):
+                raise model
+            model_name, params = model
+            spec = get_estimator(model_name)
+            result = run_estimator(model_name, prepared[estimator_layout(spec)], test_size, random_state, params)
+        except Exception as e:
+            result = {"error": str(e)}
+        results.append({"model": name, "result": result})
+    return results
+
+
+# Registers the built-in models
+from app.services import estimators  # noqa: E402,F401
@@ -0,0 +1,232 @@
+"""
+Per-process CPU budget for training and scoring
+
+Parallel estimators used to run either single-threaded (n_jobs left at its
+default) or, with n_jobs=-1, on every core regardless of what else the process
+was doing. Work that can use several cores now runs inside a slot of the
+process-wide budget:
+
+    with cpu_slot() as cores:       # all idle cores (at least one)
+        model.fit(X, y)
+    with cpu_slot(1):               # a single core
+        ...
+
+Within a slot, joblib's n_jobs (used by sklearn estimators whose n_jobs is
+left at None) and the OpenMP threads of the calling thread are limited to the
+granted cores. BLAS thread pools are process-wide, so they are limited to the
+smallest grant among the running slots. One large job gets every idle core;
+jobs that start while it runs get what is left, and at least one core, so
+slots never wait but concurrent jobs oversubscribe the machine by at most one
+thread each.
+
+Slots nest: a slot opened on a thread that already holds one runs within the
+outer allocation instead of taking cores twice.
+
+The budget covers one process. With several server processes, set CPU_BUDGET
+to the cores each of them may use; worker processes of the model race get
+their share through reset_cpu_budget.
+
+Worker process pools are created with process_pool. The server process is
+multithreaded and has usually run OpenMP code (histogram boosting, BLAS), so
+forking it can leave a child deadlocked on a lock held by another thread, or
+crash it in the OpenMP runtime. Workers therefore start from a fork server
+(WORKER_START_METHOD) that imports the training modules once. Like every
+non-fork start method, it imports the entry script (run.py, wsgi.py) as
+__mp_main__, so those must only build the app at import time.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from joblib import parallel_config
+
+try:
+    from threadpoolctl import ThreadpoolController
+except ImportError:  # pragma: no cover - optional dependency
+    ThreadpoolController = None
+
+_local = threading.local()
+
+
+class CpuBudget:
+    """
+    Cores of this process shared by the running jobs
+
+    Args:
+        total: Cores to hand out (defaults to os.cpu_count())
+    """
+
+    def __init__(self, total: Optional[int] = None):
+        self.total = max(1, int(total or os.cpu_count() or 1))
+        self._lock = threading.Lock()
+        self._grants: Dict[int, int] = {}
+        self._next_slot = 0
+        self._controller = None
+        self._blas = None
+        self._blas_limit = None
+        self.slots = 0
+        self.peak = 0
+
+    def _threadpools(self):
+        """threadpoolctl controller of the loaded BLAS/OpenMP libraries, if available"""
+        if self._controller is None and ThreadpoolController is not None:
+            self._controller = ThreadpoolController()
+        return self._controller
+
+    def _limit_blas(self) -> None:
+        # Called with the lock held
+        limit = min(self._grants.values()) if self._grants else None
+        if limit == self._blas_limit or self._threadpools() is None:
+            return
+        if self._blas is not None:
+            self._blas.restore_original_limits()
+            self._blas = None
+        if limit is not None:
+            self._blas = self._controller.select(user_api='blas').limit(limits=limit)
+        self._blas_limit = limit
+
+    def acquire(self, want: Optional[int] = None) -> tuple:
+        """
+        Reserve cores
+
+        Args:
+            want: Cores wanted; None takes every idle core
+
+        Returns:
+            tuple: (slot, cores) with 1 <= cores <= max(want, 1)
+        """
+        with self._lock:
+            free = self.total - sum(self._grants.values())
+            cores = max(1, free if want is None else min(want, free))
+            slot = self._next_slot
+            self._next_slot += 1
+            self._grants[slot] = cores
+            self.slots += 1
+            self.peak = max(self.peak, sum(self._grants.values()))
+            self._limit_blas()
+        return slot, cores
+
+    def release(self, slot: int) -> None:
+        with self._lock:
+            self._grants.pop(slot, None)
+            self._limit_blas()
+
+    @contextmanager
+    def _limits(self, cores: int) -> Iterator[int]:
+        """joblib and OpenMP limits of the calling thread"""
+        openmp = None
+        if self._threadpools() is not None:
+            openmp = self._controller.select(user_api='openmp').limit(limits=cores)
+        try:
+            with parallel_config(n_jobs=cores):
+                yield cores
+        finally:
+            if openmp is not None:
+                openmp.restore_original_limits()
+
+    @contextmanager
+    def slot(self, want: Optional[int] = None) -> Iterator[int]:
+        """
+        Run a block on a share of the budget
+
+        Args:
+            want: Cores wanted; None takes every idle core
+
+        Yields:
+            int: Cores granted
+        """
+        held = getattr(_local, 'cores', None)
+        if held is not None:
+            cores = held if want is None else max(1, min(want, held))
+            _local.cores = cores
+            try:
+                with self._limits(cores):
+                    yield cores
+            finally:
+                _local.cores = held
+            return
+
+        slot, cores = self.acquire(want)
+        _local.cores = cores
+        try:
+            with self._limits(cores):
+                yield cores
+        finally:
+            _local.cores = None
+            self.release(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'total': self.total,
+                'in_use': sum(self._grants.values()),
+                'running': len(self._grants),
+                'slots': self.slots,
+                'peak': self.peak,
+                'blas_limit': self._blas_limit,
+                'threadpoolctl': ThreadpoolController is not None,
+            }
+
+
+_budget = CpuBudget()
+
+# Start method of worker process pools, and modules the fork server preloads
+DEFAULT_START_METHOD = 'forkserver'
+POOL_PRELOAD = ['__main__', 'app.services.training_engine']
+_start_method = DEFAULT_START_METHOD
+
+
+def get_cpu_budget() -> CpuBudget:
+    """The budget of this process"""
+    return _budget
+
+
+def cpu_slot(want: Optional[int] = None):
+    """Context manager running a block on cores of this process's budget (see CpuBudget.slot)"""
+    return _budget.slot(want)
+
+
+def reset_cpu_budget(total: Optional[int] = None) -> CpuBudget:
+    """
+    Replace this process's budget
+
+    Used by worker processes of the race and search pools, which only own a
+    share of the parent's cores (and, when forked, inherit its allocations
+    and the slot of the thread that forked them).
+    """
+    global _budget
+    _local.cores = None
+    _budget = CpuBudget(total)
+    return _budget
+
+
+def process_pool(max_workers: int, initializer=None, initargs=()) -> ProcessPoolExecutor:
+    """
+    Process pool whose workers are started with WORKER_START_METHOD
+
+    Falls back to 'spawn' where the method is not available. Pool arguments
+    (initargs included) are pickled to every worker.
+    """
+    method = _start_method if _start_method in multiprocessing.get_all_start_methods() else 'spawn'
+    context = multiprocessing.get_context(method)
+    if method == 'forkserver':
+        context.set_forkserver_preload(POOL_PRELOAD)
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                               initializer=initializer, initargs=initargs)
+
+
+# ---------------------------------------------------------------------------
+# Flask wiring
+# ---------------------------------------------------------------------------
+
+def init_cpu_budget(app) -> CpuBudget:
+    """Size the budget from CPU_BUDGET, pick the pool start method and attach the budget to the app"""
+    global _start_method
+    _start_method = app.config.get('WORKER_START_METHOD', DEFAULT_START_METHOD)
+    budget = reset_cpu_budget(app.config.get('CPU_BUDGET'))
+    app.extensions['cpu_budget'] = budget
+    print(f"CPU budget initialized ({budget.total} cores)")
+    return budget
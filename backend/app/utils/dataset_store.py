@@ -0,0 +1,442 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional
+
+import pandas as pd
+from flask import current_app
+
+from app.utils.file_processor import read_raw_file
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # Arrow support is optional; frames are pickled instead
+    pa = None
+    feather = None
+
+# Hex digits of the SHA-256 content hash used as dataset_id
+DATASET_ID_LENGTH = 32
+
+UPLOAD_BLOCK_SIZE = 1 << 20
+
+# Spooled uploads / staging folders older than this are removed at startup
+STALE_UPLOAD_SECONDS = 3600
+
+
+class DatasetNotFound(KeyError):
+    """Raised when a dataset_id is not (or no longer) in the store"""
+
+
+class DatasetStore:
+    """
+    Content-addressed cache of parsed uploads
+
+    Each upload is hashed while it is written to disk; the hash is the
+    dataset_id. The parsed frame is kept as an uncompressed Arrow IPC
+    (Feather v2) file, pickle for frames Arrow cannot hold, next to a
+    meta.json and any cached profiles. The least recently used datasets are
+    evicted once the store exceeds its byte or entry limit.
+
+    Arrow files are memory-mapped, so every worker process reading a
+    dataset shares the OS page cache copy: through view() and iter_chunks()
+    numeric columns without missing values reach pandas as read-only views on
+    the mapping, and only the remaining columns are materialized per request.
+    load() returns a frame that owns its data.
+
+    Layout: <root>/<dataset_id>/{data.arrow|data.parquet|data.pkl, meta.json, profiles/<key>.json}
+    """
+
+    def __init__(self, root: str, max_bytes: int = 2 * 1024 ** 3, max_entries: int = 100):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # dataset_id -> meta, oldest access first
+        self._index: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    # ----------------------------------------------------------------- index
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.root):
+            if not _is_dataset_id(name):
+                self._remove_stale(name)
+                continue
+            meta = self._read_meta(name)
+            if meta is not None:
+                entries.append(meta)
+        for meta in sorted(entries, key=lambda m: m.get('last_access', 0)):
+            self._index[meta['dataset_id']] = meta
+
+    def _remove_stale(self, name: str):
+        """Remove leftovers of interrupted uploads (older than STALE_UPLOAD_SECONDS)"""
+        path = os.path.join(self.root, name)
+        if not (name.startswith('.upload-') or name.endswith('.tmp')):
+            return
+        try:
+            if time.time() - os.path.getmtime(path) < STALE_UPLOAD_SECONDS:
+                return
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+        except OSError:
+            pass
+
+    def _read_meta(self, dataset_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self._dir(dataset_id), 'meta.json')) as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+    def _lookup(self, dataset_id: str) -> Optional[Dict[str, Any]]:
+        """Index entry for dataset_id, picking up entries stored by other worker processes"""
+        with self._lock:
+            meta = self._index.get(dataset_id)
+        if meta is not None or not _is_dataset_id(dataset_id):
+            return meta
+        meta = self._read_meta(dataset_id)
+        if meta is not None:
+            with self._lock:
+                meta = self._index.setdefault(dataset_id, meta)
+        return meta
+
+    def _forget(self, dataset_id: str):
+        """Drop an entry whose files were removed (e.g. evicted by another worker)"""
+        with self._lock:
+            self._index.pop(dataset_id, None)
+
+    def _dir(self, dataset_id: str) -> str:
+        return os.path.join(self.root, dataset_id)
+
+    def _write_meta(self, meta: Dict[str, Any]):
+        path = os.path.join(self._dir(meta['dataset_id']), 'meta.json')
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as handle:
+            json.dump(meta, handle)
+        os.replace(tmp_path, path)
+
+    def _touch(self, dataset_id: str) -> Dict[str, Any]:
+        if self._lookup(dataset_id) is None:
+            raise DatasetNotFound(dataset_id)
+        with self._lock:
+            meta = self._index.get(dataset_id)
+            if meta is None:
+                raise DatasetNotFound(dataset_id)
+            meta['last_access'] = time.time()
+            self._index.move_to_end(dataset_id)
+        try:
+            self._write_meta(meta)
+        except OSError:
+            self._forget(dataset_id)
+            raise DatasetNotFound(dataset_id)
+        return meta
+
+    def _evict(self):
+        """Drop least recently used datasets until the limits hold"""
+        with self._lock:
+            total = sum(meta['size_bytes'] for meta in self._index.values())
+            while self._index and (len(self._index) > self.max_entries or total > self.max_bytes):
+                dataset_id, meta = self._index.popitem(last=False)
+                total -= meta['size_bytes']
+                shutil.rmtree(self._dir(dataset_id), ignore_errors=True)
+                print(f"Evicted dataset {dataset_id} from cache")
+
+    def _entry_size(self, dataset_id: str) -> int:
+        size = 0
+        for folder, _, files in os.walk(self._dir(dataset_id)):
+            size += sum(os.path.getsize(os.path.join(folder, name)) for name in files)
+        return size
+
+    # ---------------------------------------------------------------- public
+
+    def contains(self, dataset_id: str) -> bool:
+        return self._lookup(dataset_id) is not None
+
+    def add(self, file) -> str:
+        """
+        Store an uploaded file, parsing it only if its content is new
+
+        Args:
+            file: werkzeug FileStorage (CSV or Excel)
+
+        Returns:
+            dataset_id (content hash)
+
+        Raises:
+            ValueError: If the file format is unsupported or cannot be parsed
+        """
+        filename = file.filename or 'dataset.csv'
+        extension = os.path.splitext(filename)[1].lower() or '.csv'
+        tmp_path = os.path.join(self.root, f".upload-{uuid.uuid4().hex}{extension}")
+
+        # Hash while spooling to disk, so the upload is read once
+        digest = hashlib.sha256()
+        stream = getattr(file, 'stream', file)
+        with open(tmp_path, 'wb') as handle:
+            for block in iter(lambda: stream.read(UPLOAD_BLOCK_SIZE), b''):
+                digest.update(block)
+                handle.write(block)
+        dataset_id = digest.hexdigest()[:DATASET_ID_LENGTH]
+
+        try:
+            if self.contains(dataset_id):
+                self._touch(dataset_id)
+                return dataset_id
+
+            df = read_raw_file(tmp_path)
+            self._save_frame(dataset_id, df, filename)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self._evict()
+        return dataset_id
+
+    def _save_frame(self, dataset_id: str, df: pd.DataFrame, filename: str):
+        folder = self._dir(dataset_id)
+        staging = f"{folder}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(os.path.join(staging, 'profiles'))
+
+        data_format = 'pickle'
+        if feather is not None:
+            try:
+                # Uncompressed so the file can be mapped without decoding
+                feather.write_feather(df, os.path.join(staging, 'data.arrow'), compression='uncompressed')
+                data_format = 'arrow'
+            except (ValueError, TypeError, pa.ArrowException) as e:
+                # Mixed-type object columns and non-string headers cannot be written as Arrow
+                print(f"Arrow write failed for {dataset_id}, storing pickle: {str(e)}")
+                if os.path.exists(os.path.join(staging, 'data.arrow')):
+                    os.remove(os.path.join(staging, 'data.arrow'))
+        if data_format == 'pickle':
+            df.to_pickle(os.path.join(staging, 'data.pkl'))
+
+        now = time.time()
+        size_bytes = sum(
+            os.path.getsize(os.path.join(staging, name))
+            for name in os.listdir(staging) if name != 'profiles'
+        )
+        meta = {
+            'dataset_id': dataset_id,
+            'filename': filename,
+            'format': data_format,
+            'rows': int(len(df)),
+            'columns': [str(col) for col in df.columns],
+            'created_at': now,
+            'last_access': now,
+            'size_bytes': size_bytes,
+            'conversions': None,
+        }
+        with open(os.path.join(staging, 'meta.json'), 'w') as handle:
+            json.dump(meta, handle)
+
+        # Publish the complete directory in one rename
+        with self._lock:
+            try:
+                os.replace(staging, folder)
+            except OSError:
+                # Another request or worker stored the same content first
+                shutil.rmtree(staging, ignore_errors=True)
+                return
+            self._index[dataset_id] = meta
+        print(f"Cached dataset {dataset_id} ({meta['rows']} rows, {meta['format']})")
+
+    def meta(self, dataset_id: str) -> Dict[str, Any]:
+        """Metadata of a stored dataset (filename, rows, columns, ...)"""
+        meta = self._lookup(dataset_id)
+        if meta is None:
+            raise DatasetNotFound(dataset_id)
+        return dict(meta)
+
+    def open_table(self, dataset_id: str) -> "pa.Table":
+        """
+        Memory-mapped Arrow table of a stored dataset (no data is copied)
+
+        Raises:
+            DatasetNotFound: If the dataset is unknown, was evicted or is not
+                stored in Arrow format
+        """
+        meta = self._touch(dataset_id)
+        if meta['format'] != 'arrow':
+            raise DatasetNotFound(dataset_id)
+        try:
+            source = pa.memory_map(os.path.join(self._dir(dataset_id), 'data.arrow'), 'r')
+        except FileNotFoundError:
+            self._forget(dataset_id)
+            raise DatasetNotFound(dataset_id)
+        # The mapping stays valid after eviction unlinks the file
+        return pa.ipc.open_file(source).read_all()
+
+    def load(self, dataset_id: str) -> pd.DataFrame:
+        """
+        Load the parsed frame of a stored dataset
+
+        The frame owns its data and can be modified freely. Every call returns
+        a new DataFrame object, tagged with df.attrs['dataset_id'] so
+        downstream caches can key on the content.
+
+        Raises:
+            DatasetNotFound: If the dataset is unknown or was evicted
+        """
+        return self._read(dataset_id, writable=True)
+
+    def view(self, dataset_id: str) -> pd.DataFrame:
+        """
+        Zero-copy frame of a stored dataset, for read-only analysis
+
+        Arrow datasets are converted column by column from the memory map;
+        numeric columns without missing values are read-only views on it, so
+        their values must not be modified in place (replacing columns is
+        fine). Use load() for a frame that will be edited.
+
+        Raises:
+            DatasetNotFound: If the dataset is unknown or was evicted
+        """
+        return self._read(dataset_id, writable=False)
+
+    def _read(self, dataset_id: str, writable: bool) -> pd.DataFrame:
+        meta = self._touch(dataset_id)
+        folder = self._dir(dataset_id)
+        try:
+            if meta['format'] == 'arrow':
+                df = _table_to_frame(self.open_table(dataset_id), writable)
+            elif meta['format'] == 'parquet':
+                df = pd.read_parquet(os.path.join(folder, 'data.parquet'))
+            else:
+                df = pd.read_pickle(os.path.join(folder, 'data.pkl'))
+        except FileNotFoundError:
+            self._forget(dataset_id)
+            raise DatasetNotFound(dataset_id)
+        df.attrs['dataset_id'] = dataset_id
+        return df
+
+    def iter_chunks(self, dataset_id: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        """
+        Stream a stored dataset in chunks of about chunk_rows rows
+
+        Chunks of Arrow datasets are zero-copy, read-only views like view().
+
+        Raises:
+            DatasetNotFound: If the dataset is unknown or was evicted
+        """
+        meta = self._touch(dataset_id)
+        if meta['format'] == 'arrow':
+            table = self.open_table(dataset_id)
+            for start in range(0, table.num_rows, chunk_rows):
+                yield _table_to_frame(table.slice(start, chunk_rows), writable=False)
+            return
+        df = self.view(dataset_id)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+    def set_conversions(self, dataset_id: str, conversions: Dict[str, str]):
+        """Remember the column conversions inferred for analysis"""
+        with self._lock:
+            meta = self._index.get(dataset_id)
+            if meta is None:
+                return
+            meta['conversions'] = conversions
+        self._write_meta(meta)
+
+    def get_profile(self, dataset_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """Cached profile/analysis result for dataset_id under key, if any"""
+        if not self.contains(dataset_id):
+            return None
+        path = os.path.join(self._dir(dataset_id), 'profiles', f"{_profile_name(key)}.json")
+        try:
+            with open(path) as handle:
+                profile = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        self._touch(dataset_id)
+        return profile
+
+    def put_profile(self, dataset_id: str, key: str, profile: Dict[str, Any]):
+        """Cache a JSON-serializable profile/analysis result for dataset_id"""
+        if not self.contains(dataset_id):
+            return
+        folder = os.path.join(self._dir(dataset_id), 'profiles')
+        path = os.path.join(folder, f"{_profile_name(key)}.json")
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'w') as handle:
+                json.dump(profile, handle)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Could not cache profile for {dataset_id}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            meta = self._index.get(dataset_id)
+            if meta is not None:
+                meta['size_bytes'] = self._entry_size(dataset_id)
+        if meta is not None:
+            try:
+                self._write_meta(meta)
+            except OSError:
+                self._forget(dataset_id)
+        self._evict()
+
+
+def _table_to_frame(table: "pa.Table", writable: bool) -> pd.DataFrame:
+    if writable:
+        # Consolidating into 2-D blocks copies every column into memory pandas owns
+        return table.to_pandas()
+    # One block per column lets pandas wrap null-free primitive columns without copying
+    return table.to_pandas(split_blocks=True)
+
+
+def _is_dataset_id(name: str) -> bool:
+    return len(name) == DATASET_ID_LENGTH and all(ch in '0123456789abcdef' for ch in name)
+
+
+def _profile_name(key: str) -> str:
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]
+
+
+def init_dataset_store(app):
+    """Create the app-wide DatasetStore from config"""
+    app.extensions['dataset_store'] = DatasetStore(
+        root=app.config['DATASET_CACHE_DIR'],
+        max_bytes=app.config['DATASET_CACHE_MAX_BYTES'],
+        max_entries=app.config['DATASET_CACHE_MAX_ENTRIES'],
+    )
+    print(f"Dataset cache initialized at {app.config['DATASET_CACHE_DIR']}")
+
+
+def get_dataset_store() -> DatasetStore:
+    """DatasetStore of the current app"""
+    return current_app.extensions['dataset_store']
+
+
+def dataset_id_from_request(req) -> str:
+    """
+    Resolve the dataset of a request: a new upload in 'file' or a 'dataset_id' form field
+
+    Raises:
+        ValueError: If neither a file nor a dataset_id was sent
+        DatasetNotFound: If the dataset_id is unknown or was evicted
+    """
+    store = get_dataset_store()
+    file = req.files.get('file')
+    if file is not None and file.filename:
+        return store.add(file)
+
+    dataset_id = req.form.get('dataset_id')
+    if not dataset_id:
+        raise ValueError('No file or dataset_id provided')
+    if not store.contains(dataset_id):
+        raise DatasetNotFound(dataset_id)
+    return dataset_id
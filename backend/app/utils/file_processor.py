@@ -1,14 +1,383 @@
 import pandas as pd
 import numpy as np
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Iterator, Optional
 import io
+import warnings
 
-def process_file(file_path: str) -> pd.DataFrame:
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # Fall back to the pandas C parser
+    pa = None
+    pa_csv = None
+
+try:
+    import pyarrow.parquet as pa_parquet
+except ImportError:
+    pa_parquet = None
+
+# Rows per chunk when streaming uploads
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Leading rows used to infer the schema applied to every later chunk
+SCHEMA_SAMPLE_ROWS = 10_000
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+
+# Non-null values tried before converting a whole text column to datetime
+DATETIME_PROBE_ROWS = 200
+
+# Strings pandas reads as missing by default; the pyarrow path uses the same set
+NA_STRINGS = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None',
+    'n/a', 'nan', 'null'
+]
+
+
+def _source_name(source) -> str:
+    """Best-effort filename for a path, werkzeug FileStorage or file object"""
+    if isinstance(source, str):
+        return source.lower()
+    name = getattr(source, 'filename', None) or getattr(source, 'name', None) or ''
+    return str(name).lower()
+
+def _open_source(source):
+    """Return something pandas can read without copying the upload into memory"""
+    if isinstance(source, str):
+        return source
+    stream = getattr(source, 'stream', source)
+    if hasattr(stream, 'seek'):
+        try:
+            stream.seek(0)
+        except (OSError, ValueError):
+            pass
+    return stream
+
+def _convert_object_column(values: pd.Series) -> Tuple[pd.Series, str]:
+    """
+    Convert one object column to datetime or numeric if every value allows it
+
+    A short probe of non-null values is parsed first, so text columns are
+    rejected without parsing every row (a probe failure implies the full
+    conversion fails too).
+
+    Returns:
+        Tuple of (values, kind) where kind is 'datetime', 'numeric' or 'object'
+    """
+    probe = values.dropna().head(DATETIME_PROBE_ROWS)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            pd.to_datetime(probe)
+            return pd.to_datetime(values), 'datetime'
+    except:
+        pass
+    try:
+        return pd.to_numeric(values), 'numeric'
+    except:
+        return values, 'object'
+
+def prepare_dataframe(df: pd.DataFrame,
+                      conversions: Optional[Dict[str, str]] = None) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """
+    Apply process_file's cleanup to an already-parsed frame
+
+    Strips column names, converts object columns to datetime / numeric and
+    replaces infinite values.
+
+    Args:
+        df: Raw parsed DataFrame (modified in place)
+        conversions: Conversions returned by an earlier call on the same
+            data; skips inference when given
+
+    Returns:
+        Tuple of (DataFrame, conversions)
+    """
+    df.columns = [str(col).strip() for col in df.columns]
+    if conversions is None:
+        conversions = {}
+        for col in df.columns:
+            if df[col].dtype == 'object':
+                df[col], kind = _convert_object_column(df[col])
+                if kind != 'object':
+                    conversions[col] = kind
+    else:
+        for col, kind in conversions.items():
+            if kind == 'datetime':
+                df[col] = pd.to_datetime(df[col])
+            else:
+                df[col] = pd.to_numeric(df[col])
+
+    float_cols = df.select_dtypes(include='float').columns
+    if len(float_cols):
+        df[float_cols] = df[float_cols].replace([np.inf, -np.inf], np.nan)
+    return df, conversions
+
+def _convert_object_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert object columns to datetime or numeric where every value allows it"""
+    for col in df.columns:
+        if df[col].dtype == 'object':
+            df[col], _ = _convert_object_column(df[col])
+    return df
+
+def infer_schema(sample: pd.DataFrame, convert_types: bool = True) -> Dict[str, str]:
+    """
+    Infer a column schema from a leading sample of the file
+
+    Args:
+        sample: First rows of the file as read by pandas
+        convert_types: Also detect datetime / numeric object columns
+
+    Returns:
+        Dictionary mapping column name to 'numeric', 'datetime', 'bool' or 'object'
+    """
+    if convert_types:
+        sample = _convert_object_columns(sample.copy())
+
+    schema = {}
+    for col in sample.columns:
+        dtype = sample[col].dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            schema[col] = 'bool'
+        elif pd.api.types.is_numeric_dtype(dtype):
+            schema[col] = 'numeric'
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            schema[col] = 'datetime'
+        else:
+            schema[col] = 'object'
+    return schema
+
+def apply_schema(chunk: pd.DataFrame, schema: Dict[str, str]) -> pd.DataFrame:
+    """
+    Coerce a chunk to the schema inferred from the leading sample
+
+    Values that do not fit the column's inferred type become missing, so all
+    chunks share the same dtypes.
+    """
+    for col, kind in schema.items():
+        if col not in chunk.columns:
+            continue
+        dtype = chunk[col].dtype
+        if kind == 'numeric' and not pd.api.types.is_numeric_dtype(dtype):
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+        elif kind == 'datetime' and not pd.api.types.is_datetime64_any_dtype(dtype):
+            chunk[col] = pd.to_datetime(chunk[col], errors='coerce')
+    return chunk
+
+def _reader_chunks(reader, sample_rows: int) -> Iterator[pd.DataFrame]:
+    """Pull the leading sample, then regular chunks, from a TextFileReader"""
+    try:
+        yield reader.get_chunk(sample_rows)
+        while True:
+            yield reader.get_chunk()
+    except StopIteration:
+        return
+
+def typed_chunks(chunks, convert_types: bool = True) -> Iterator[pd.DataFrame]:
+    """
+    Give a stream of raw chunks one schema, inferred from the first chunk
+
+    Args:
+        chunks: Iterable of DataFrames with the same columns
+        convert_types: Detect datetime / numeric object columns; when False
+            only numeric columns are pinned
+
+    Yields:
+        pandas DataFrames with stripped column names and no infinite values
+    """
+    schema = None
+    for chunk in chunks:
+        chunk.columns = [str(col).strip() for col in chunk.columns]
+        if schema is None:
+            schema = infer_schema(chunk, convert_types=convert_types)
+            if not convert_types:
+                schema = {col: kind for col, kind in schema.items() if kind == 'numeric'}
+        chunk = apply_schema(chunk, schema)
+        yield chunk.replace([np.inf, -np.inf], np.nan)
+
+def iter_file_chunks(source, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                     sample_rows: int = SCHEMA_SAMPLE_ROWS,
+                     convert_types: bool = True) -> Iterator[pd.DataFrame]:
+    """
+    Stream an uploaded file as DataFrame chunks sharing one schema
+
+    CSV files are parsed straight from the path or upload stream with a
+    single TextFileReader: the first sample_rows rows fix the schema and
+    later chunks are coerced to it. Parquet files are read batch by batch
+    (their schema is stored in the file). Excel files cannot be streamed and
+    are yielded as a single chunk; an already-parsed DataFrame is sliced.
+
+    Args:
+        source: File path, werkzeug FileStorage, binary file object or DataFrame
+        chunk_rows: Rows per chunk after the leading sample
+        sample_rows: Rows used for schema inference
+        convert_types: Detect datetime / numeric object columns (process_file
+            behaviour); when False only numeric columns are pinned
+
+    Yields:
+        pandas DataFrames
+
+    Raises:
+        ValueError: If file format is unsupported
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_rows):
+            yield source.iloc[start:start + chunk_rows].copy()
+        return
+
+    name = _source_name(source)
+    handle = _open_source(source)
+
+    if name.endswith(EXCEL_EXTENSIONS):
+        engine = 'xlrd' if name.endswith('.xls') else 'openpyxl'
+        df = pd.read_excel(handle, engine=engine)
+        df.columns = [str(col).strip() for col in df.columns]
+        if convert_types:
+            df = _convert_object_columns(df)
+        yield df.replace([np.inf, -np.inf], np.nan)
+        return
+
+    if name.endswith(PARQUET_EXTENSIONS):
+        if pa_parquet is None:
+            raise ValueError("Reading Parquet files requires pyarrow")
+        parquet_file = pa_parquet.ParquetFile(handle)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows):
+            chunk = batch.to_pandas()
+            chunk.columns = [str(col).strip() for col in chunk.columns]
+            yield chunk
+        return
+
+    if isinstance(source, str) and not name.endswith('.csv'):
+        raise ValueError(f"Unsupported file format: {source}")
+
+    with pd.read_csv(handle, chunksize=chunk_rows) as reader:
+        yield from typed_chunks(_reader_chunks(reader, sample_rows), convert_types=convert_types)
+
+def read_uploaded_file(file, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Read an uploaded CSV/Excel file for training without buffering a copy
+
+    Parses directly from the upload stream in chunks (numeric columns pinned
+    from the leading sample) and concatenates them once.
+
+    Args:
+        file: werkzeug FileStorage, file object or an already-parsed
+            DataFrame (e.g. from the dataset cache; returned as is)
+        chunk_rows: Rows per chunk
+
+    Returns:
+        pandas DataFrame
+    """
+    if isinstance(file, pd.DataFrame):
+        return file
+    chunks = list(iter_file_chunks(file, chunk_rows=chunk_rows, convert_types=False))
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
+
+def _arrow_convert_options(column_types=None):
+    """pyarrow CSV options matching pandas' default missing-value and boolean parsing"""
+    return pa_csv.ConvertOptions(
+        null_values=NA_STRINGS,
+        strings_can_be_null=True,
+        true_values=['True', 'TRUE', 'true'],
+        false_values=['False', 'FALSE', 'false'],
+        column_types=column_types
+    )
+
+def _check_unique_columns(names):
+    if len(set(names)) < len(names):
+        # pandas renames duplicates ("a.1"); leave those files to the pandas reader
+        raise ValueError("Duplicate column names")
+
+def read_csv_raw(file_path: str) -> pd.DataFrame:
+    """
+    Read a CSV with pyarrow into the frame pd.read_csv would return
+
+    Date, time and timestamp columns are kept as text (pyarrow would
+    otherwise type them while parsing), null-only columns become float NaN
+    and missing booleans become NaN, as in pandas. Integer columns pyarrow
+    widens to float because they exceed int64 are read again by pandas
+    (uint64 or object there).
+
+    Args:
+        file_path: Path to a CSV file
+
+    Returns:
+        pandas DataFrame
+
+    Raises:
+        ValueError: If pyarrow rejects the file or column names repeat
+    """
+    # Types pyarrow infers from the first block; pin dates and times back to text
+    head_schema = pa_csv.open_csv(file_path, convert_options=_arrow_convert_options()).schema
+    _check_unique_columns(head_schema.names)
+    column_types = {
+        field.name: pa.string() for field in head_schema
+        if pa.types.is_date(field.type) or pa.types.is_time(field.type) or pa.types.is_timestamp(field.type)
+    }
+
+    table = pa_csv.read_csv(file_path, convert_options=_arrow_convert_options(column_types))
+    df = table.to_pandas()
+    wide_ints = []
+    for col, field in zip(df.columns, table.schema):
+        if pa.types.is_null(field.type):
+            df[col] = np.nan
+        elif pa.types.is_boolean(field.type) and df[col].dtype == 'object':
+            df[col] = df[col].where(df[col].notna(), np.nan)
+        elif pa.types.is_floating(field.type) and _beyond_int64(df[col].to_numpy()):
+            wide_ints.append(col)
+    if wide_ints:
+        reread = pd.read_csv(file_path, usecols=wide_ints)
+        for col in wide_ints:
+            df[col] = reread[col]
+    return df
+
+def _beyond_int64(values: np.ndarray) -> bool:
+    """True if a float column holds finite values outside the int64 range (all whole numbers)"""
+    with np.errstate(invalid='ignore'):
+        return bool((np.isfinite(values) & (np.abs(values) >= 2.0 ** 63)).any())
+
+def read_raw_file(file_path: str) -> pd.DataFrame:
+    """
+    Parse a CSV or Excel file without process_file's type conversions
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        pandas DataFrame as pd.read_csv / pd.read_excel return it
+
+    Raises:
+        ValueError: If file format is unsupported
+    """
+    name = file_path.lower()
+    if name.endswith(EXCEL_EXTENSIONS):
+        return pd.read_excel(file_path, engine='xlrd' if name.endswith('.xls') else 'openpyxl')
+    if not name.endswith('.csv'):
+        raise ValueError(f"Unsupported file format: {file_path}")
+    if pa_csv is not None:
+        try:
+            return read_csv_raw(file_path)
+        except ValueError:
+            pass
+    return pd.read_csv(file_path)
+
+def process_file(file_path: str, chunk_rows: Optional[int] = None) -> pd.DataFrame:
     """
     Process uploaded file (CSV or Excel) into pandas DataFrame
+
+    CSV files are parsed with pyarrow when it is installed (see read_raw_file);
+    object columns are then converted as before (see prepare_dataframe).
     
     Args:
         file_path: Path to uploaded file
+        chunk_rows: Parse CSV files in chunks of this many rows (schema taken
+            from the leading sample) instead of all at once
         
     Returns:
         pandas DataFrame
@@ -16,33 +385,20 @@ def process_file(file_path: str) -> pd.DataFrame:
     Raises:
         ValueError: If file format is unsupported or corrupted
     """
+    if chunk_rows and file_path.endswith('.csv'):
+        chunks = list(iter_file_chunks(file_path, chunk_rows=chunk_rows))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
     # Determine file type by extension
     if file_path.endswith('.csv'):
-        df = pd.read_csv(file_path)
+        df = read_raw_file(file_path)
     elif file_path.endswith(('.xlsx', '.xls')):
         df = pd.read_excel(file_path, engine='openpyxl')
     else:
         raise ValueError(f"Unsupported file format: {file_path}")
-    
-    # Clean column names
-    df.columns = [str(col).strip() for col in df.columns]
-    
-    # Convert object types to appropriate types
-    for col in df.columns:
-        if df[col].dtype == 'object':
-            # Try to convert to datetime
-            try:
-                df[col] = pd.to_datetime(df[col])
-            except:
-                # Try to convert to numeric
-                try:
-                    df[col] = pd.to_numeric(df[col], errors='ignore')
-                except:
-                    pass
-    
-    # Replace infinite values with NaN
-    df = df.replace([np.inf, -np.inf], np.nan)
-    
+
+    # Clean column names, convert object types and replace infinite values
+    df, _ = prepare_dataframe(df)
     return df
 
 def validate_dataframe(df: pd.DataFrame) -> Tuple[bool, str]:
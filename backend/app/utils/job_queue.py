@@ -0,0 +1,333 @@
+"""
+Background training jobs
+
+Long fits run on a bounded pool of worker threads instead of inside the HTTP
+request. Each job runs inside the Flask app context (R2 uploads and database
+writes keep working) and exposes its status, progress and result.
+
+Progress and cancellation are cooperative: training code calls
+report_progress(stage, ...) at its checkpoints, which records the progress of
+the current job and raises JobCancelled once the job was asked to stop. Outside
+a job both are no-ops, so the same code runs synchronously unchanged.
+
+Every job keeps a short numbered event log (status changes, stage transitions
+with the time spent in the previous stage, progress with elapsed and ETA
+seconds) that clients can follow with wait_events, e.g. over Server-Sent Events.
+
+Jobs live in this process only; with several Flask worker processes, status
+requests must reach the process that accepted the job (sticky sessions or a
+single training worker).
+"""
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app
+
+JOB_STATES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATES = ('succeeded', 'failed', 'cancelled')
+
+# Events kept per job for clients that (re)connect late
+EVENT_HISTORY = 500
+# Minimum seconds between two progress events of the same stage; the latest
+# progress is always visible in Job.progress
+PROGRESS_EVENT_INTERVAL = 0.25
+
+_local = threading.local()
+
+
+class JobCancelled(BaseException):
+    """
+    Raised at a progress checkpoint when the running job was cancelled
+
+    Derives from BaseException (like asyncio.CancelledError) so the
+    catch-all `except Exception` blocks of the training services let it through.
+    """
+
+
+class QueueFull(Exception):
+    """Raised by submit when too many jobs are waiting"""
+
+
+class Job:
+    """One background training job"""
+
+    def __init__(self, name: str, meta: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.meta = meta or {}
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = {'stage': 'queued', 'fraction': None, 'message': None}
+        self.result = None
+        self.error = None
+        self.future = None
+        self.cancel_requested = threading.Event()
+        self.stage = None
+        self.stage_started_at = None
+        self.stages = []
+        self.events = deque(maxlen=EVENT_HISTORY)
+        self._last_event_id = 0
+        self._last_progress_at = 0.0
+        self._changed = threading.Condition()
+        self._emit('status', {'status': self.status})
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @property
+    def last_event_id(self) -> int:
+        return self._last_event_id
+
+    def _emit(self, event: str, data: Dict[str, Any]) -> None:
+        with self._changed:
+            self._last_event_id += 1
+            self.events.append({'id': self._last_event_id, 'event': event, 'time': time.time(), 'data': data})
+            self._changed.notify_all()
+
+    def _enter_stage(self, stage: str, now: float) -> None:
+        """Close the current stage and emit a stage transition"""
+        previous = self.stage
+        previous_seconds = None
+        if previous is not None:
+            previous_seconds = round(now - self.stage_started_at, 3)
+            self.stages.append({'stage': previous, 'seconds': previous_seconds})
+        self.stage = stage
+        self.stage_started_at = now
+        self._last_progress_at = 0.0
+        self._emit('stage', {'stage': stage, 'previous': previous, 'previous_seconds': previous_seconds})
+
+    def record_progress(self, stage: str, fraction: Optional[float] = None,
+                        message: Optional[str] = None, **info: Any) -> None:
+        """
+        Update the progress, adding elapsed seconds and (when the fraction is
+        known) the ETA of the current stage
+        """
+        now = time.time()
+        if stage != self.stage:
+            self._enter_stage(stage, now)
+        stage_seconds = now - self.stage_started_at
+        eta = None
+        if fraction is not None and 0 < fraction < 1:
+            eta = round(stage_seconds * (1 - fraction) / fraction, 3)
+        elif fraction is not None and fraction >= 1:
+            eta = 0.0
+        self.progress = {
+            'stage': stage,
+            'fraction': fraction,
+            'message': message,
+            **info,
+            'elapsed_seconds': round(now - self.started_at, 3) if self.started_at else None,
+            'stage_seconds': round(stage_seconds, 3),
+            'eta_seconds': eta,
+        }
+        if fraction is None or fraction >= 1 or now - self._last_progress_at >= PROGRESS_EVENT_INTERVAL:
+            self._last_progress_at = now
+            self._emit('progress', self.progress)
+
+    def wait_events(self, after: int = 0, timeout: Optional[float] = None) -> list:
+        """
+        Events with an id greater than `after`, waiting up to timeout seconds
+        for one to arrive (returns [] on timeout or when the job is finished)
+        """
+        with self._changed:
+            if self._last_event_id <= after and not self.finished:
+                self._changed.wait(timeout)
+            return [event for event in self.events if event['id'] > after]
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            'job_id': self.id,
+            'name': self.name,
+            'meta': self.meta,
+            'status': self.status,
+            'progress': self.progress,
+            'stages': self.stages,
+            'error': self.error,
+            'cancel_requested': self.cancel_requested.is_set(),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'elapsed_seconds': round(end - self.started_at, 3) if self.started_at else None,
+            'has_result': self.result is not None,
+        }
+
+
+class JobQueue:
+    """
+    Bounded in-process job queue
+
+    Args:
+        max_workers: Jobs running at the same time
+        max_pending: Jobs allowed to wait for a worker before submit refuses
+        ttl: Seconds finished jobs (and their results) are kept
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 20, ttl: float = 3600):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='training-job')
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[[], Dict[str, Any]], name: str,
+               meta: Optional[Dict[str, Any]] = None) -> Job:
+        """
+        Queue fn() to run in the background
+
+        fn returns the result payload; a payload with an 'error' key marks the
+        job failed.
+
+        Raises:
+            QueueFull: If max_pending jobs are already waiting
+        """
+        self._prune()
+        job = Job(name, meta)
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if j.status == 'queued')
+            if pending >= self.max_pending:
+                raise QueueFull(f'{pending} jobs are already waiting')
+            self._jobs[job.id] = job
+
+        app = current_app._get_current_object()
+        job.future = self._executor.submit(self._run, job, fn, app)
+        return job
+
+    def _run(self, job: Job, fn: Callable[[], Dict[str, Any]], app) -> None:
+        if job.cancel_requested.is_set():
+            self._finish(job, 'cancelled')
+            return
+
+        job.status = 'running'
+        job.started_at = time.time()
+        job._emit('status', {'status': job.status})
+        job.record_progress('started', 0.0)
+        _local.job = job
+        try:
+            with app.app_context():
+                result = fn()
+            if isinstance(result, dict) and 'error' in result:
+                job.result = result
+                job.error = result['error']
+                self._finish(job, 'failed')
+            else:
+                job.result = result
+                self._finish(job, 'succeeded')
+        except JobCancelled:
+            self._finish(job, 'cancelled')
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            self._finish(job, 'failed')
+        finally:
+            _local.job = None
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished_at = time.time()
+        if job.stage is not None:
+            job.stages.append({'stage': job.stage, 'seconds': round(job.finished_at - job.stage_started_at, 3)})
+            job.stage = None
+        job.progress = dict(job.progress, stage=status)
+        job._emit('status', {'status': status, 'error': job.error,
+                             'elapsed_seconds': round(job.finished_at - job.started_at, 3) if job.started_at else None})
+        print(f"Job {job.id} ({job.name}) {status}")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list:
+        self._prune()
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Ask a job to stop: queued jobs never start, running jobs stop at
+        their next progress checkpoint
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_requested.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, 'cancelled')
+        return job
+
+    def _prune(self) -> None:
+        """Forget finished jobs older than the TTL"""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+    def shutdown(self, wait: bool = True) -> None:
+        for job in self.list():
+            if not job.finished:
+                job.cancel_requested.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def current_job() -> Optional[Job]:
+    """The job running on this thread, if any"""
+    return getattr(_local, 'job', None)
+
+
+def clear_current_job() -> None:
+    """Detach this thread (or a forked worker process) from its job"""
+    _local.job = None
+
+
+def report_progress(stage: str, fraction: Optional[float] = None, message: Optional[str] = None,
+                    **info: Any) -> None:
+    """
+    Record progress of the current job and honour cancellation
+
+    No-op outside a background job.
+
+    Args:
+        stage: Short stage name (e.g. 'parse', 'encode', 'fit', 'evaluate')
+        fraction: Completion of the stage in [0, 1], if known
+        message: Human readable detail
+        **info: Extra fields shown with the progress
+
+    Raises:
+        JobCancelled: If the job was cancelled
+    """
+    job = current_job()
+    if job is None:
+        return
+    if job.cancel_requested.is_set():
+        raise JobCancelled(job.id)
+    job.record_progress(stage, fraction, message, **info)
+
+
+# ---------------------------------------------------------------------------
+# Flask wiring
+# ---------------------------------------------------------------------------
+
+def init_job_queue(app) -> JobQueue:
+    """Create the job queue from app.config and attach it to the app"""
+    queue = JobQueue(
+        max_workers=app.config.get('JOB_MAX_WORKERS', 2),
+        max_pending=app.config.get('JOB_MAX_PENDING', 20),
+        ttl=app.config.get('JOB_RESULT_TTL', 3600),
+    )
+    app.extensions['job_queue'] = queue
+    print(f"Training job queue initialized ({queue.max_workers} workers)")
+    return queue
+
+
+def get_job_queue() -> JobQueue:
+    """Job queue of the current Flask app"""
+    return current_app.extensions['job_queue']
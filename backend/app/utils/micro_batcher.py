@@ -0,0 +1,160 @@
+"""
+Dynamic micro-batching of online predictions
+
+Under many concurrent single-row requests, each request paid a separate
+estimator predict call whose fixed Python overhead dwarfs the per-row work.
+With micro-batching enabled, concurrent requests for the same model are
+coalesced: the first request of a batch waits up to `window` seconds (or until
+`max_batch_size` rows have joined), runs one vectorized predict over all rows
+and hands every request its slice of the results.
+
+The window is the latency/throughput tradeoff: a longer window builds bigger
+batches (more throughput per CPU) and adds up to that much latency to a
+request that arrives alone. No background thread is involved; the request
+that opens a batch runs it.
+
+An exception raised by the batch predict is raised in every request of the
+batch, so inputs should be validated before they are submitted.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+import scipy.sparse as sp
+from flask import current_app
+
+
+class _Batch:
+    """Rows collected for one predict call"""
+
+    def __init__(self):
+        self.parts: List[np.ndarray] = []
+        self.proba = False
+        self.rows = 0
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, list]] = None
+        self.error: Optional[BaseException] = None
+
+    def add(self, X: np.ndarray, proba: bool) -> int:
+        """Append rows and return their offset in the batch"""
+        offset = self.rows
+        self.parts.append(X)
+        self.rows += X.shape[0]
+        self.proba = self.proba or proba
+        return offset
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent predictions per key (model)
+
+    Args:
+        window: Seconds the first request of a batch waits for others
+        max_batch_size: Rows that close a batch before the window ends
+    """
+
+    def __init__(self, window: float = 0.003, max_batch_size: int = 64):
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._open: Dict[Hashable, _Batch] = {}
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+
+    def predict(self, key: Hashable, X: np.ndarray, proba: bool,
+                run: Callable[[np.ndarray, bool], Dict[str, list]]) -> Dict[str, list]:
+        """
+        Predict the rows of X as part of a shared batch
+
+        Args:
+            key: Batch key; requests are only coalesced with the same key
+            X: Encoded feature matrix of this request (dense or CSR)
+            proba: Whether this request wants class probabilities
+            run: run(X, proba) -> {'predictions': [...], 'probabilities': [...]}
+                with one list entry per row (the same contract as
+                prediction_service.predict_records)
+
+        Returns:
+            run's result restricted to this request's rows
+        """
+        if X.shape[0] >= self.max_batch_size:
+            return run(X, proba)
+
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+                self._open[key] = batch
+            offset = batch.add(X, proba)
+            if batch.rows >= self.max_batch_size:
+                del self._open[key]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+                self.batches += 1
+                self.requests += len(batch.parts)
+                self.rows += batch.rows
+            try:
+                if len(batch.parts) == 1:
+                    rows = batch.parts[0]
+                elif any(sp.issparse(part) for part in batch.parts):
+                    rows = sp.vstack(batch.parts, format="csr")
+                else:
+                    rows = np.vstack(batch.parts)
+                batch.result = run(rows, batch.proba)
+            except BaseException as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        end = offset + X.shape[0]
+        result = {"predictions": batch.result["predictions"][offset:end]}
+        if proba:
+            result["probabilities"] = batch.result["probabilities"][offset:end]
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "window_ms": round(self.window * 1000, 3),
+                "max_batch_size": self.max_batch_size,
+                "batches": self.batches,
+                "requests": self.requests,
+                "rows": self.rows,
+                "avg_batch_rows": round(self.rows / self.batches, 2) if self.batches else None,
+            }
+
+
+# ---------------------------------------------------------------------------
+# Flask wiring
+# ---------------------------------------------------------------------------
+
+def init_micro_batcher(app) -> Optional[MicroBatcher]:
+    """Create the micro-batcher when PREDICT_MICROBATCH is enabled"""
+    if not app.config.get('PREDICT_MICROBATCH', False):
+        app.extensions['micro_batcher'] = None
+        return None
+    batcher = MicroBatcher(
+        window=app.config.get('PREDICT_MICROBATCH_WINDOW_MS', 3) / 1000,
+        max_batch_size=app.config.get('PREDICT_MICROBATCH_MAX_SIZE', 64),
+    )
+    app.extensions['micro_batcher'] = batcher
+    print(f"Prediction micro-batching enabled ({batcher.window * 1000:g} ms window, "
+          f"up to {batcher.max_batch_size} rows)")
+    return batcher
+
+
+def get_micro_batcher() -> Optional[MicroBatcher]:
+    """MicroBatcher of the current app, or None when micro-batching is off"""
+    return current_app.extensions.get('micro_batcher')
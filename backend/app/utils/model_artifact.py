@@ -0,0 +1,398 @@
+"""
+Versioned model artifact format
+
+An artifact is one file (or R2 object):
+
+    payload    joblib pickle of the object, compressed with the artifact codec
+    manifest   UTF-8 JSON: format version, codec, library versions, feature
+               schema, payload size (stored and uncompressed) and SHA-256
+    trailer    <u64 manifest length><u16 format version>LOTUSART
+
+The manifest sits behind the payload so artifacts are written in one pass
+(the checksum is known once the payload is written). Payloads with codec
+'none' are plain joblib files with trailing bytes, so a local artifact can be
+loaded with numpy arrays memory-mapped (load_artifact_file). Objects without
+the trailer are read as legacy joblib pickles.
+
+Codecs: 'zstd' (zstandard) and 'lz4' (lz4) are optional dependencies; 'gzip'
+and 'none' always work. 'auto' picks the first available of zstd, lz4, gzip.
+"""
+import gzip
+import hashlib
+import io
+import json
+import platform
+import struct
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import joblib
+import numpy as np
+import sklearn
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; 'auto' falls back to lz4 or gzip
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # lz4 is optional
+    lz4_frame = None
+
+FORMAT_NAME = 'lotus-model-artifact'
+FORMAT_VERSION = 1
+ARTIFACT_EXTENSION = '.artifact'
+
+_MAGIC = b'LOTUSART'
+_TRAILER = struct.Struct('<QH')
+_TRAILER_SIZE = _TRAILER.size + len(_MAGIC)
+
+DEFAULT_LEVELS = {'zstd': 3, 'lz4': 0, 'gzip': 3, 'none': None}
+_CHUNK = 1 << 20
+
+
+class ArtifactError(ValueError):
+    """Raised for malformed artifacts, checksum mismatches or unavailable codecs"""
+
+
+def available_codecs() -> list:
+    codecs = []
+    if zstandard is not None:
+        codecs.append('zstd')
+    if lz4_frame is not None:
+        codecs.append('lz4')
+    return codecs + ['gzip', 'none']
+
+
+def resolve_codec(codec: Optional[str]) -> str:
+    """Concrete codec for a configured name ('auto' or an unavailable one falls back)"""
+    codec = (codec or 'auto').lower()
+    available = available_codecs()
+    if codec == 'auto':
+        return available[0]
+    if codec not in DEFAULT_LEVELS:
+        raise ArtifactError(f"Unknown artifact codec '{codec}'. Available: {', '.join(available)}")
+    if codec not in available:
+        print(f"Artifact codec '{codec}' is not installed, using '{available[0]}'")
+        return available[0]
+    return codec
+
+
+# ---------------------------------------------------------------------------
+# Stream helpers
+# ---------------------------------------------------------------------------
+
+class _HashingWriter:
+    """Write-through file wrapper that hashes and counts the bytes written"""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        self.sink.write(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Payload offset; joblib uses it to align arrays for memory-mapping
+        return self.size
+
+    def flush(self):
+        pass
+
+
+class _CountingWriter:
+    """Write-through file wrapper counting the uncompressed bytes"""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.size = 0
+
+    def write(self, data) -> int:
+        self.size += len(data)
+        self.sink.write(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.size
+
+    def flush(self):
+        pass
+
+
+class _PayloadReader(io.RawIOBase):
+    """Reads at most `length` bytes of a file from its current position"""
+
+    def __init__(self, source, length: int):
+        self.source = source
+        self.remaining = length
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self.remaining <= 0:
+            return 0
+        data = self.source.read(min(len(buffer), self.remaining))
+        self.remaining -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class _ReadAdapter(io.RawIOBase):
+    """RawIOBase over any object with read(n), so it can be buffered (joblib peeks)"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _compressing_writer(codec: str, level: Optional[int], sink):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level).stream_writer(sink, closefd=False)
+    if codec == 'lz4':
+        return lz4_frame.LZ4FrameFile(sink, mode='wb', compression_level=level)
+    if codec == 'gzip':
+        return gzip.GzipFile(fileobj=sink, mode='wb', compresslevel=level, mtime=0)
+    return None
+
+
+def _decompressing_reader(codec: str, source):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ArtifactError("Artifact is zstd-compressed but zstandard is not installed")
+        stream = zstandard.ZstdDecompressor().stream_reader(source, closefd=False)
+    elif codec == 'lz4':
+        if lz4_frame is None:
+            raise ArtifactError("Artifact is lz4-compressed but lz4 is not installed")
+        stream = lz4_frame.LZ4FrameFile(source, mode='rb')
+    elif codec == 'gzip':
+        stream = gzip.GzipFile(fileobj=source, mode='rb')
+    elif codec == 'none':
+        stream = source
+    else:
+        raise ArtifactError(f"Unknown artifact codec '{codec}'")
+    return io.BufferedReader(_ReadAdapter(stream), buffer_size=_CHUNK)
+
+
+# ---------------------------------------------------------------------------
+# Manifest
+# ---------------------------------------------------------------------------
+
+def _library_versions() -> Dict[str, str]:
+    import pandas as pd
+    return {
+        'python': platform.python_version(),
+        'sklearn': sklearn.__version__,
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'joblib': joblib.__version__,
+    }
+
+
+def _type_name(obj) -> str:
+    return f"{type(obj).__module__}.{type(obj).__qualname__}"
+
+
+def infer_schema(obj) -> Dict[str, Any]:
+    """Feature schema of a model dictionary or a fitted estimator"""
+    pipeline = None
+    if isinstance(obj, dict):
+        pipeline = obj.get('pipeline')
+        names = obj.get('feature_names')
+        if names is None and pipeline is not None:
+            names = pipeline.feature_names
+        target = obj.get('target_column')
+    else:
+        names = getattr(obj, 'feature_names_in_', None)
+        target = None
+    schema = {}
+    if names is not None:
+        schema['feature_names'] = [str(name) for name in names]
+        schema['n_features'] = len(schema['feature_names'])
+    if target is not None:
+        schema['target_column'] = str(target)
+    if pipeline is not None:
+        schema['preprocessing'] = pipeline.describe()
+    return schema
+
+
+def _check_versions(manifest: Dict[str, Any]) -> None:
+    saved = manifest.get('versions', {}).get('sklearn')
+    if saved and saved.split('.')[:2] != sklearn.__version__.split('.')[:2]:
+        print(f"Model artifact was written with scikit-learn {saved}, running {sklearn.__version__}")
+
+
+# ---------------------------------------------------------------------------
+# Write / read
+# ---------------------------------------------------------------------------
+
+def write_artifact(obj, fileobj, codec: str = 'auto', level: Optional[int] = None,
+                   schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Serialize obj as an artifact into fileobj (written sequentially)
+
+    Args:
+        obj: Model or model dictionary
+        fileobj: Writable binary file
+        codec: 'auto', 'zstd', 'lz4', 'gzip' or 'none'
+        level: Compression level (codec default if None)
+        schema: Feature schema; inferred from obj if None
+
+    Returns:
+        dict: The manifest
+    """
+    codec = resolve_codec(codec)
+    if level is None:
+        level = DEFAULT_LEVELS[codec]
+
+    payload = _HashingWriter(fileobj)
+    writer = _compressing_writer(codec, level, payload)
+    if writer is None:
+        joblib.dump(obj, payload)
+        raw_bytes = payload.size
+    else:
+        raw = _CountingWriter(writer)
+        try:
+            joblib.dump(obj, raw)
+        finally:
+            writer.close()
+        raw_bytes = raw.size
+
+    estimator = obj.get('model') if isinstance(obj, dict) else obj
+    manifest = {
+        'format': FORMAT_NAME,
+        'format_version': FORMAT_VERSION,
+        'codec': codec,
+        'level': level,
+        'created_at': datetime.utcnow().isoformat(),
+        'object_type': _type_name(obj),
+        'estimator': _type_name(estimator) if estimator is not None else None,
+        'versions': _library_versions(),
+        'schema': schema if schema is not None else infer_schema(obj),
+        'payload_bytes': payload.size,
+        'raw_bytes': raw_bytes,
+        'sha256': payload.sha256.hexdigest(),
+    }
+    encoded = json.dumps(manifest, default=str).encode('utf-8')
+    fileobj.write(encoded)
+    fileobj.write(_TRAILER.pack(len(encoded), FORMAT_VERSION) + _MAGIC)
+    return manifest
+
+
+def read_manifest(fileobj) -> Optional[Dict[str, Any]]:
+    """
+    Manifest of an artifact (seekable file), or None for a legacy joblib pickle
+
+    Leaves the file positioned at its start.
+    """
+    fileobj.seek(0, io.SEEK_END)
+    size = fileobj.tell()
+    manifest = None
+    if size >= _TRAILER_SIZE:
+        fileobj.seek(size - _TRAILER_SIZE)
+        trailer = fileobj.read(_TRAILER_SIZE)
+        if trailer.endswith(_MAGIC):
+            length, version = _TRAILER.unpack(trailer[:_TRAILER.size])
+            if version > FORMAT_VERSION:
+                raise ArtifactError(f"Artifact format {version} is newer than supported ({FORMAT_VERSION})")
+            if length > size - _TRAILER_SIZE:
+                raise ArtifactError("Artifact manifest is truncated")
+            fileobj.seek(size - _TRAILER_SIZE - length)
+            manifest = json.loads(fileobj.read(length).decode('utf-8'))
+    fileobj.seek(0)
+    return manifest
+
+
+def _payload_digest(fileobj, length: int) -> Tuple[str, int]:
+    """SHA-256 of the next `length` bytes; returns (hexdigest, bytes missing)"""
+    digest = hashlib.sha256()
+    while length > 0:
+        chunk = fileobj.read(min(_CHUNK, length))
+        if not chunk:
+            break
+        digest.update(chunk)
+        length -= len(chunk)
+    return digest.hexdigest(), length
+
+
+def read_artifact(fileobj, verify: bool = True) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """
+    Load an artifact (or legacy joblib pickle) from a seekable file
+
+    Args:
+        fileobj: Readable, seekable binary file
+        verify: Check the payload SHA-256 before unpickling anything
+
+    Returns:
+        tuple: (object, manifest or None for legacy pickles)
+
+    Raises:
+        ArtifactError: Bad checksum, unknown format or missing codec
+    """
+    manifest = read_manifest(fileobj)
+    if manifest is None:
+        return joblib.load(fileobj), None
+
+    _check_versions(manifest)
+    if verify:
+        digest, missing = _payload_digest(fileobj, manifest['payload_bytes'])
+        if missing or digest != manifest['sha256']:
+            raise ArtifactError("Model artifact checksum mismatch")
+        fileobj.seek(0)
+    payload = _PayloadReader(fileobj, manifest['payload_bytes'])
+    return joblib.load(_decompressing_reader(manifest['codec'], payload)), manifest
+
+
+def verify_artifact_file(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Check a local artifact's payload against its manifest checksum
+
+    Returns:
+        dict: The manifest (None for legacy pickles, which carry no checksum)
+
+    Raises:
+        ArtifactError: On checksum mismatch
+    """
+    with open(path, 'rb') as f:
+        manifest = read_manifest(f)
+        if manifest is None:
+            return None
+        digest, missing = _payload_digest(f, manifest['payload_bytes'])
+    if missing or digest != manifest['sha256']:
+        raise ArtifactError(f"Model artifact checksum mismatch: {path}")
+    return manifest
+
+
+def load_artifact_file(path: str, mmap: bool = True, verify: bool = False) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """
+    Load a local artifact file
+
+    Uncompressed ('none') artifacts and legacy uncompressed pickles are loaded
+    with numpy arrays memory-mapped read-only when mmap is True, so large
+    forests share the OS page cache instead of being copied per process.
+
+    Returns:
+        tuple: (object, manifest or None)
+    """
+    with open(path, 'rb') as f:
+        manifest = read_manifest(f)
+    if verify and manifest is not None:
+        verify_artifact_file(path)
+    if mmap and (manifest is None or manifest['codec'] == 'none'):
+        if manifest is not None:
+            _check_versions(manifest)
+        return joblib.load(path, mmap_mode='r'), manifest
+    with open(path, 'rb') as f:
+        return read_artifact(f, verify=False)
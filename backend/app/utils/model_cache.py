@@ -0,0 +1,585 @@
+"""
+Two-tier cache of models served by /api/model/predict
+
+/api/model/predict used to download and unpickle the model from R2 on every
+request. Models now go through two tiers, both keyed by (model_id, r2_path):
+
+    ModelCache      loaded models in memory, bounded by their uncompressed
+                    serialized size (least recently used first out), with a TTL
+    ModelDiskCache  artifact files in a local directory, bounded by size,
+                    checked against their manifest checksum (or the R2 ETag
+                    for legacy pickles) before first use
+
+A memory miss loads from disk, a disk miss downloads from R2. Deleting a model
+invalidates both tiers. Concurrent requests for a model that is not cached
+yet wait for a single load instead of each downloading it; on POSIX systems
+the download is also shared between worker processes using one directory.
+At startup the disk tier is warmed in the background with the most used
+models, so restarts and new replicas do not all fetch them on first request.
+
+The ranking comes from MLModel.prediction_count. Predictions are counted in
+memory (UsageCounter) and written in one transaction every few seconds by a
+background thread, so requests never wait on a database write.
+"""
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import current_app
+
+from app.utils.model_artifact import ArtifactError, load_artifact_file, verify_artifact_file
+
+try:
+    import fcntl
+except ImportError:  # Windows: downloads are only shared within one process
+    fcntl = None
+
+CacheKey = Tuple[str, str]
+
+
+class ModelCache:
+    """
+    Thread-safe LRU cache of loaded models, bounded by byte size
+
+    Args:
+        max_bytes: Total serialized size of the cached models
+        ttl: Seconds a loaded model is served before it is reloaded (0 = no expiry)
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 ** 2, ttl: float = 3600):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> {'model', 'size', 'loaded_at'}, least recently used first
+        self._entries: "OrderedDict[CacheKey, Dict[str, Any]]" = OrderedDict()
+        self._loading: Dict[CacheKey, threading.Lock] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return bool(self.ttl) and now - entry['loaded_at'] > self.ttl
+
+    def _lookup(self, key: CacheKey) -> Optional[Any]:
+        """Cached model for key (refreshing its LRU position), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, time.time()):
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry['model']
+
+    def _drop(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry['size']
+
+    def _store(self, key: CacheKey, model: Any, size: int) -> None:
+        with self._lock:
+            self._drop(key)
+            if size > self.max_bytes:
+                # Larger than the whole cache: serve it, don't keep it
+                return
+            self._entries[key] = {'model': model, 'size': size, 'loaded_at': time.time()}
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                old_key, old = self._entries.popitem(last=False)
+                self._bytes -= old['size']
+                self.evictions += 1
+                print(f"Model cache evicted {old_key[0]}")
+
+    def get(self, model_id: str, r2_path: str, loader: Callable[[], Tuple[Any, int]]) -> Any:
+        """
+        The model for (model_id, r2_path), loading it on a miss
+
+        Args:
+            model_id: Model id
+            r2_path: Object key the model was loaded from
+            loader: loader() -> (model, size_in_bytes), called at most once
+                at a time per key
+
+        Returns:
+            The loaded model
+        """
+        key = (model_id, r2_path)
+        model = self._lookup(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            load_lock = self._loading.setdefault(key, threading.Lock())
+        with load_lock:
+            # Another request may have loaded it while we waited
+            model = self._lookup(key)
+            if model is not None:
+                return model
+            try:
+                with self._lock:
+                    self.misses += 1
+                model, size = loader()
+                self._store(key, model, size)
+                return model
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+
+    def invalidate(self, model_id: str) -> int:
+        """Drop every cached version of a model; returns how many were dropped"""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == model_id]
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class ModelDiskCache:
+    """
+    Local directory of model artifacts in front of R2, bounded by size
+
+    Layout: <root>/<key>.artifact plus <key>.json ({model_id, r2_path, size,
+    etag, last_access}), where key hashes r2_path. Files are downloaded to a
+    temporary name and renamed into place, so readers never see partial
+    files; several processes may share one directory.
+
+    Args:
+        root: Cache directory
+        max_bytes: Total size of the cached files
+    """
+
+    def __init__(self, root: str, max_bytes: int = 5 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> meta, least recently used first
+        self._index: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._loading: Dict[str, threading.Lock] = {}
+        # Files checked against their checksum by this process
+        self._verified = set()
+        self.hits = 0
+        self.downloads = 0
+        self.evictions = 0
+        self.integrity_failures = 0
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    # ----------------------------------------------------------------- index
+
+    def _load_index(self) -> None:
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith('.tmp'):
+                # Leftover of an interrupted download
+                _remove(path)
+                continue
+            if not name.endswith('.json'):
+                continue
+            meta = self._read_meta(name[:-len('.json')])
+            if meta is not None:
+                entries.append(meta)
+        for meta in sorted(entries, key=lambda m: m.get('last_access', 0)):
+            self._index[meta['key']] = meta
+        self._evict()
+
+    def _read_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._meta_path(key)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self._file_path(key)):
+            _remove(self._meta_path(key))
+            return None
+        return meta
+
+    @staticmethod
+    def key_for(r2_path: str) -> str:
+        return hashlib.sha256(r2_path.encode('utf-8')).hexdigest()[:32]
+
+    def _file_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.artifact")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def _lock_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.lock")
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Index entry (adopting files another process downloaded), touched"""
+        with self._lock:
+            meta = self._index.get(key)
+        if meta is None:
+            meta = self._read_meta(key)
+            if meta is None:
+                return None
+        elif not os.path.exists(self._file_path(key)):
+            # Evicted by another process
+            with self._lock:
+                self._index.pop(key, None)
+            return None
+        meta['last_access'] = time.time()
+        with self._lock:
+            self._index[key] = meta
+            self._index.move_to_end(key)
+        return meta
+
+    def _evict(self) -> None:
+        with self._lock:
+            total = sum(meta['size'] for meta in self._index.values())
+            victims = []
+            while total > self.max_bytes and len(self._index) > 1:
+                key, meta = self._index.popitem(last=False)
+                total -= meta['size']
+                victims.append(key)
+        for key in victims:
+            self._remove_files(key)
+            self.evictions += 1
+            print(f"Model disk cache evicted {key}")
+
+    def _remove_files(self, key: str) -> None:
+        # Open readers (and memory maps) keep working after the unlink
+        _remove(self._file_path(key))
+        _remove(self._meta_path(key))
+        _remove(self._lock_path(key))
+        self._verified.discard(key)
+
+    # ----------------------------------------------------------------- fetch
+
+    def _download(self, key: str, model_id: str, r2_path: str, storage) -> Dict[str, Any]:
+        tmp_path = os.path.join(self.root, f"{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            info = storage.download_to_path(r2_path, tmp_path)
+            _check_download(tmp_path, info)
+            os.replace(tmp_path, self._file_path(key))
+        finally:
+            _remove(tmp_path)
+        meta = {
+            'key': key,
+            'model_id': model_id,
+            'r2_path': r2_path,
+            'size': os.path.getsize(self._file_path(key)),
+            'etag': info['etag'],
+            'last_access': time.time(),
+        }
+        with open(self._meta_path(key), 'w') as f:
+            json.dump(meta, f)
+        self._verified.add(key)
+        with self._lock:
+            self._index[key] = meta
+            self.downloads += 1
+        print(f"Model {model_id} cached on disk ({meta['size']} bytes)")
+        self._evict()
+        return meta
+
+    def ensure(self, model_id: str, r2_path: str, storage) -> str:
+        """
+        Local path of a model artifact, downloading it from R2 on a miss
+
+        Args:
+            model_id: Model id
+            r2_path: R2 object key
+            storage: R2Storage used for downloads
+
+        Returns:
+            str: Path of the cached file
+        """
+        key = self.key_for(r2_path)
+        if self._lookup(key) is not None:
+            self.hits += 1
+            return self._file_path(key)
+
+        with self._lock:
+            load_lock = self._loading.setdefault(key, threading.Lock())
+        with load_lock, _file_lock(self._lock_path(key)):
+            try:
+                if self._lookup(key) is not None:
+                    self.hits += 1
+                else:
+                    self._download(key, model_id, r2_path, storage)
+                return self._file_path(key)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+
+    def load(self, model_id: str, r2_path: str, storage) -> Tuple[Any, int]:
+        """
+        Load a model through the disk tier
+
+        Files are checked against their checksum the first time this process
+        uses them; a corrupt file is dropped and downloaded again.
+
+        Returns:
+            tuple: (model, uncompressed serialized size) as ModelCache loaders do
+        """
+        key = self.key_for(r2_path)
+        for attempt in range(2):
+            path = self.ensure(model_id, r2_path, storage)
+            try:
+                if key not in self._verified:
+                    verify_artifact_file(path)
+                    self._verified.add(key)
+                model, manifest = load_artifact_file(path, mmap=True)
+            except (ArtifactError, OSError, EOFError) as e:
+                self.integrity_failures += 1
+                print(f"Cached model {model_id} failed its integrity check: {e}")
+                with self._lock:
+                    self._index.pop(key, None)
+                self._remove_files(key)
+                if attempt:
+                    raise
+                continue
+            size = manifest.get('raw_bytes', os.path.getsize(path)) if manifest else os.path.getsize(path)
+            return model, size
+
+    def invalidate(self, model_id: str) -> int:
+        """Remove every cached file of a model; returns how many were removed"""
+        with self._lock:
+            keys = [key for key, meta in self._index.items() if meta.get('model_id') == model_id]
+            for key in keys:
+                self._index.pop(key, None)
+        for key in keys:
+            self._remove_files(key)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'root': self.root,
+                'entries': len(self._index),
+                'bytes': sum(meta['size'] for meta in self._index.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'downloads': self.downloads,
+                'evictions': self.evictions,
+                'integrity_failures': self.integrity_failures,
+            }
+
+    def warm(self, app, limit: int) -> None:
+        """Download the `limit` most used ready models (run in a background thread)"""
+        from app.models.ml_model import MLModel
+        from app.utils.r2_storage import get_r2_storage
+
+        try:
+            with app.app_context():
+                rows = (
+                    MLModel.query.filter_by(status='ready')
+                    .order_by(MLModel.prediction_count.desc(), MLModel.last_used_at.desc())
+                    .limit(limit)
+                    .all()
+                )
+                targets = [(row.model_id, row.r2_path) for row in rows]
+                storage = get_r2_storage()
+        except Exception as e:
+            print(f"Model disk cache warm-up skipped: {e}")
+            return
+
+        warmed = 0
+        for model_id, r2_path in targets:
+            try:
+                self.ensure(model_id, r2_path, storage)
+                warmed += 1
+            except Exception as e:
+                print(f"Model disk cache warm-up failed for {model_id}: {e}")
+        print(f"Model disk cache warmed: {warmed}/{len(targets)} models")
+
+
+class UsageCounter:
+    """
+    Prediction counts per MLModel row, flushed to the database in the background
+
+    Args:
+        app: Flask app whose database receives the counts
+        interval: Seconds between flushes
+    """
+
+    def __init__(self, app, interval: float = 10.0):
+        self.app = app
+        self.interval = interval
+        self._lock = threading.Lock()
+        # MLModel.id -> [predictions, last use]
+        self._pending: Dict[int, list] = {}
+        self._stop = threading.Event()
+        self.flushes = 0
+        self.failures = 0
+
+    def record(self, model_row_id: int) -> None:
+        """Count one prediction of a model"""
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._pending.get(model_row_id)
+            if entry is None:
+                self._pending[model_row_id] = [1, now]
+            else:
+                entry[0] += 1
+                entry[1] = now
+
+    def flush(self) -> int:
+        """Write the pending counts in one transaction; returns the models updated"""
+        from app.database.sql_db import db
+        from app.models.ml_model import MLModel
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            with self.app.app_context():
+                try:
+                    for row_id, (count, last_used) in pending.items():
+                        MLModel.query.filter_by(id=row_id).update({
+                            MLModel.prediction_count: MLModel.prediction_count + count,
+                            MLModel.last_used_at: last_used,
+                        }, synchronize_session=False)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    raise
+        except Exception as e:
+            # Keep the counts for the next flush
+            with self._lock:
+                for row_id, (count, last_used) in pending.items():
+                    entry = self._pending.setdefault(row_id, [0, last_used])
+                    entry[0] += count
+                    entry[1] = max(entry[1], last_used)
+                self.failures += 1
+            print(f"Warning: Failed to record model usage: {e}")
+            return 0
+        self.flushes += 1
+        return len(pending)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name='model-usage-flush', daemon=True).start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Stop the background thread and write what is left"""
+        self._stop.set()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'pending_models': len(self._pending),
+                'pending_predictions': sum(count for count, _ in self._pending.values()),
+                'flushes': self.flushes,
+                'failures': self.failures,
+                'interval': self.interval,
+            }
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _check_download(path: str, info: Dict[str, Any]) -> None:
+    """Check a downloaded file against its manifest checksum, or the ETag of legacy pickles"""
+    if os.path.getsize(path) != info['size']:
+        raise ArtifactError(f"Downloaded {os.path.getsize(path)} of {info['size']} bytes")
+    if verify_artifact_file(path) is not None:
+        return
+    etag = info.get('etag') or ''
+    if etag and '-' not in etag:
+        # Single-part uploads: the ETag is the MD5 of the object
+        digest = hashlib.md5()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        if digest.hexdigest() != etag:
+            raise ArtifactError("Downloaded model does not match its ETag")
+
+
+class _file_lock:
+    """Exclusive advisory lock on a file (no-op where fcntl is missing)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+
+
+def init_model_cache(app) -> ModelCache:
+    """Create the app-wide memory and disk model caches from config and start the warm-up"""
+    cache = ModelCache(
+        max_bytes=app.config.get('MODEL_CACHE_MAX_BYTES', 512 * 1024 ** 2),
+        ttl=app.config.get('MODEL_CACHE_TTL', 3600),
+    )
+    app.extensions['model_cache'] = cache
+    disk = ModelDiskCache(
+        root=app.config['MODEL_DISK_CACHE_DIR'],
+        max_bytes=app.config.get('MODEL_DISK_CACHE_MAX_BYTES', 5 * 1024 ** 3),
+    )
+    app.extensions['model_disk_cache'] = disk
+    print(f"Model cache initialized ({cache.max_bytes // 1024 ** 2} MB in memory, "
+          f"{disk.max_bytes // 1024 ** 2} MB on disk at {disk.root})")
+
+    warm = app.config.get('MODEL_DISK_CACHE_WARM', 20)
+    if warm:
+        threading.Thread(target=disk.warm, args=(app, warm), name='model-cache-warm', daemon=True).start()
+
+    usage = UsageCounter(app, interval=app.config.get('MODEL_USAGE_FLUSH_SECONDS', 10))
+    usage.start()
+    app.extensions['model_usage'] = usage
+    return cache
+
+
+def get_model_cache() -> ModelCache:
+    """ModelCache of the current app"""
+    return current_app.extensions['model_cache']
+
+
+def get_model_disk_cache() -> ModelDiskCache:
+    """ModelDiskCache of the current app"""
+    return current_app.extensions['model_disk_cache']
+
+
+def get_usage_counter() -> UsageCounter:
+    """UsageCounter of the current app"""
+    return current_app.extensions['model_usage']
@@ -1,12 +1,53 @@
+import atexit
 import boto3
-import io
 import os
+import tempfile
+import threading
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
 from datetime import datetime
-import joblib
+from app.utils.model_artifact import ARTIFACT_EXTENSION, read_artifact, write_artifact
 from concurrent.futures import ThreadPoolExecutor
 
 class R2Storage:
-    def __init__(self):
+    """
+    Cloudflare R2 model storage
+
+    One instance is shared by the whole process (see init_r2_storage): its
+    boto3 client keeps a pool of TLS connections, and background uploads run
+    on a single bounded executor. When max_pending uploads are already
+    queued or running, the next save waits for a free slot, which slows
+    down producers instead of queueing without limit.
+
+    Models are stored as versioned artifacts (app/utils/model_artifact.py):
+    compressed with the configured codec, with a manifest holding library
+    versions, the feature schema and a checksum that is verified on load.
+    Models saved before the artifact format still load.
+
+    Models are never held in memory as one serialized blob: the artifact is
+    written into a spooled temporary file (RAM up to spool_max_bytes, then
+    disk), which is sent as a multipart upload with parts transferred in
+    parallel; downloads use parallel ranged GETs into the same kind of spool
+    and the model is read back from it.
+
+    Args:
+        max_pool_connections: HTTP connections kept open to R2
+        upload_workers: Threads running background uploads
+        max_pending: Background uploads allowed to wait or run at once
+        connect_timeout / read_timeout: Socket timeouts in seconds
+        max_attempts: Attempts per request (adaptive retry mode)
+        multipart_threshold: Objects larger than this use multipart transfers
+        multipart_chunksize: Part size (R2 needs at least 5 MB)
+        transfer_concurrency: Parts transferred in parallel per object
+        spool_max_bytes: Serialized bytes kept in RAM before spilling to disk
+        codec / level: Artifact compression ('auto', 'zstd', 'lz4', 'gzip', 'none')
+    """
+
+    def __init__(self, max_pool_connections=20, upload_workers=4, max_pending=32,
+                 connect_timeout=5, read_timeout=60, max_attempts=3,
+                 multipart_threshold=16 * 1024 ** 2, multipart_chunksize=8 * 1024 ** 2,
+                 transfer_concurrency=4, spool_max_bytes=16 * 1024 ** 2,
+                 codec='auto', level=None):
         self.account_id = os.getenv('R2_ACCOUNT_ID')
         self.access_key = os.getenv('R2_ACCESS_KEY_ID')
         self.secret_key = os.getenv('R2_SECRET_ACCESS_KEY')
@@ -18,13 +59,144 @@ class R2Storage:
             endpoint_url=f'https://{self.account_id}.r2.cloudflarestorage.com',
             aws_access_key_id=self.access_key,
             aws_secret_access_key=self.secret_key,
-            region_name='auto'
+            region_name='auto',
+            config=BotoConfig(
+                max_pool_connections=max_pool_connections,
+                connect_timeout=connect_timeout,
+                read_timeout=read_timeout,
+                retries={'max_attempts': max_attempts, 'mode': 'adaptive'},
+                tcp_keepalive=True,
+            )
+        )
+        self.max_pool_connections = max_pool_connections
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=transfer_concurrency,
+            use_threads=transfer_concurrency > 1,
         )
+        self.spool_max_bytes = spool_max_bytes
+        self.codec = codec
+        self.level = level
         
-        # Thread pool for async uploads
-        self.executor = ThreadPoolExecutor(max_workers=5)
+        # Thread pool for async uploads, bounded by max_pending
+        self.upload_workers = upload_workers
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=upload_workers, thread_name_prefix='r2-upload')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._stats_lock = threading.Lock()
+        self._stats = {'queued': 0, 'running': 0, 'completed': 0, 'failed': 0,
+                       'throttled': 0, 'bytes_uploaded': 0}
+        self._closed = False
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self._stats[key] += delta
+
+    def _submit_upload(self, spool, size, object_key, model_id, app):
+        """Upload in the background; waits for a free slot when the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            self._count(throttled=1)
+            print(f"Upload queue full, waiting to queue {object_key}")
+            self._slots.acquire()
+
+        def task():
+            try:
+                self._count(queued=-1)
+                self._run_upload(spool, size, object_key, model_id, app)
+            finally:
+                self._slots.release()
+
+        self._count(queued=1)
+        try:
+            self.executor.submit(task)
+        except RuntimeError:
+            # Executor already shut down (process exiting): upload inline
+            self._slots.release()
+            self._count(queued=-1)
+            self._run_upload(spool, size, object_key, model_id, app)
+
+    def _run_upload(self, spool, size, object_key, model_id, app):
+        self._count(running=1)
+        try:
+            ok = self._upload_and_update_db(spool, size, object_key, model_id, app)
+        finally:
+            spool.close()
+            self._count(running=-1)
+        if ok:
+            self._count(completed=1, bytes_uploaded=size)
+        else:
+            self._count(failed=1)
+
+    def metrics(self):
+        """Upload queue depth and counters"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            'upload_workers': self.upload_workers,
+            'max_pending': self.max_pending,
+            'max_pool_connections': self.max_pool_connections,
+        })
+        return stats
+
+    def _serialize(self, obj, schema=None):
+        """Write obj as an artifact into a spooled temp file; returns (file at offset 0, size)"""
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_max_bytes)
+        try:
+            manifest = write_artifact(obj, spool, self.codec, self.level, schema)
+            size = spool.tell()
+            spool.seek(0)
+        except Exception:
+            spool.close()
+            raise
+        print(f"Serialized {manifest['estimator'] or manifest['object_type']}: {size} bytes ({manifest['codec']})")
+        return spool, size
+
+    def _put(self, fileobj, object_key):
+        """Upload a file object (multipart with parallel parts when large)"""
+        self.s3_client.upload_fileobj(
+            fileobj,
+            self.bucket_name,
+            object_key,
+            ExtraArgs={'ContentType': 'application/octet-stream'},
+            Config=self.transfer_config
+        )
+
+    def _download(self, object_key):
+        """Download an object into a spooled temp file (parallel ranged GETs when large)"""
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_max_bytes)
+        try:
+            self.s3_client.download_fileobj(
+                self.bucket_name,
+                object_key,
+                spool,
+                Config=self.transfer_config
+            )
+            size = spool.tell()
+            spool.seek(0)
+        except Exception:
+            spool.close()
+            raise
+        return spool, size
+    
+    def download_to_path(self, object_key, path):
+        """
+        Download an object to a local file (parallel ranged GETs when large)
+        
+        Returns:
+            dict: {'etag': ..., 'size': ...} of the object downloaded
+        """
+        head = self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)
+        self.s3_client.download_file(
+            self.bucket_name,
+            object_key,
+            path,
+            Config=self.transfer_config
+        )
+        return {'etag': head['ETag'].strip('"'), 'size': head['ContentLength']}
     
-    def _upload_and_update_db(self, buffer_data, object_key, model_id, app):
+    def _upload_and_update_db(self, spool, size, object_key, model_id, app):
         """Internal method to upload to R2 and update database status"""
         try:
             # Import here to avoid circular imports
@@ -32,12 +204,7 @@ class R2Storage:
             from app.database.sql_db import db
             
             # Upload to R2
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=object_key,
-                Body=buffer_data,
-                ContentType='application/octet-stream'
-            )
+            self._put(spool, object_key)
             
             print(f"✓ Model uploaded to R2: {object_key}")
             
@@ -47,9 +214,10 @@ class R2Storage:
                 if model:
                     model.status = 'ready'
                     model.upload_completed_at = datetime.utcnow()
-                    model.file_size = len(buffer_data)
+                    model.file_size = size
                     db.session.commit()
                     print(f"✓ Database updated for model: {model_id}")
+            return True
             
         except Exception as e:
             print(f"✗ Failed to upload to R2: {str(e)}")
@@ -66,16 +234,22 @@ class R2Storage:
                         db.session.commit()
             except Exception as db_error:
                 print(f"✗ Failed to update database status: {str(db_error)}")
+            return False
     
-    def save_model_only(self, sklearn_model, model_id, model_type='linear_regression'):
+    def save_model_only(self, sklearn_model, model_id, model_type='linear_regression', schema=None,
+                        pipeline=None):
         """
-        Save ONLY the sklearn model object to R2 (minimal storage)
+        Save ONLY the sklearn model object (and its preprocessing) to R2 (minimal storage)
         Metadata is stored in database
         
         Args:
             sklearn_model: The trained sklearn model object
             model_id: Unique identifier for the model
             model_type: Type of model
+            schema: Feature schema recorded in the artifact manifest
+                ({'feature_names': [...], 'target_column': ...})
+            pipeline: Fitted FeaturePipeline stored next to the model as
+                {'model': ..., 'pipeline': ...}
         
         Returns:
             str: r2_object_key
@@ -84,25 +258,17 @@ class R2Storage:
             from flask import current_app
             
             # Serialize ONLY the model object (not metadata)
-            buffer = io.BytesIO()
-            joblib.dump(sklearn_model, buffer)
-            buffer.seek(0)
-            buffer_data = buffer.getvalue()
+            obj = {'model': sklearn_model, 'pipeline': pipeline} if pipeline is not None else sklearn_model
+            spool, size = self._serialize(obj, schema)
             
             # R2 object key
-            object_key = f"trained_models/{model_type}/{model_id}.pkl"
+            object_key = f"trained_models/{model_type}/{model_id}{ARTIFACT_EXTENSION}"
             
             # Get current app instance to pass to background thread
             app = current_app._get_current_object()
             
             # Submit upload to background thread pool (non-blocking)
-            self.executor.submit(
-                self._upload_and_update_db,
-                buffer_data,
-                object_key,
-                model_id,
-                app
-            )
+            self._submit_upload(spool, size, object_key, model_id, app)
             
             # Return immediately
             return object_key
@@ -112,8 +278,8 @@ class R2Storage:
     
     def save_model_direct_async(self, model_data, model_id, model_type='linear_regression'):
         """
-        Serialize model in memory and upload directly to R2 in background
-        NO LOCAL STORAGE - Everything happens in memory
+        Serialize model to a spooled buffer and upload it to R2 in background
+        Nothing is written to trained_models/
         
         Args:
             model_data: Dictionary containing model and metadata
@@ -126,26 +292,17 @@ class R2Storage:
         try:
             from flask import current_app
             
-            # Serialize model to bytes in memory
-            buffer = io.BytesIO()
-            joblib.dump(model_data, buffer)
-            buffer.seek(0)
-            buffer_data = buffer.getvalue()
+            # Serialize model (RAM up to spool_max_bytes, then a temp file)
+            spool, size = self._serialize(model_data)
             
             # R2 object key
-            object_key = f"trained_models/{model_type}/{model_id}.pkl"
+            object_key = f"trained_models/{model_type}/{model_id}{ARTIFACT_EXTENSION}"
             
             # Get current app instance to pass to background thread
             app = current_app._get_current_object()
             
             # Submit upload to background thread pool (non-blocking)
-            self.executor.submit(
-                self._upload_and_update_db,
-                buffer_data,
-                object_key,
-                model_id,
-                app
-            )
+            self._submit_upload(spool, size, object_key, model_id, app)
             
             # Return immediately - upload happens in background
             return object_key
@@ -159,18 +316,11 @@ class R2Storage:
         Use only when immediate R2 persistence is required
         """
         try:
-            buffer = io.BytesIO()
-            joblib.dump(model_data, buffer)
-            buffer.seek(0)
-            
-            object_key = f"trained_models/{model_type}/{model_id}.pkl"
+            object_key = f"trained_models/{model_type}/{model_id}{ARTIFACT_EXTENSION}"
             
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=object_key,
-                Body=buffer.getvalue(),
-                ContentType='application/octet-stream'
-            )
+            spool, _ = self._serialize(model_data)
+            with spool:
+                self._put(spool, object_key)
             
             return object_key
             
@@ -180,16 +330,25 @@ class R2Storage:
     def load_model(self, object_key):
         """Load trained model from R2"""
         try:
-            response = self.s3_client.get_object(
-                Bucket=self.bucket_name,
-                Key=object_key
-            )
-            
-            # Load directly from stream
-            buffer = io.BytesIO(response['Body'].read())
-            model_data = joblib.load(buffer)
+            return self.load_model_sized(object_key)[0]
             
-            return model_data
+        except Exception as e:
+            raise Exception(f"Failed to load model from R2: {str(e)}")
+    
+    def load_model_sized(self, object_key):
+        """
+        Load a model from R2 and report its serialized size
+        
+        Args:
+            object_key: R2 object key of the model
+        
+        Returns:
+            tuple: (loaded object, size in bytes)
+        """
+        try:
+            spool, size = self._download(object_key)
+            with spool:
+                return read_artifact(spool)[0], size
             
         except Exception as e:
             raise Exception(f"Failed to load model from R2: {str(e)}")
@@ -206,16 +365,8 @@ class R2Storage:
             sklearn model object
         """
         try:
-            response = self.s3_client.get_object(
-                Bucket=self.bucket_name,
-                Key=object_key
-            )
-            
             # Load only the model
-            buffer = io.BytesIO(response['Body'].read())
-            model = joblib.load(buffer)
-            
-            return model
+            return self.load_model_sized(object_key)[0]
             
         except Exception as e:
             raise Exception(f"Failed to load model from R2: {str(e)}")
@@ -288,6 +439,38 @@ class R2Storage:
         except Exception as e:
             return None
     
-    def shutdown(self):
-        """Gracefully shutdown executor"""
-        self.executor.shutdown(wait=True)
\ No newline at end of file
+    def shutdown(self, wait=True):
+        """Gracefully shutdown executor (pending uploads finish first when wait is True)"""
+        if self._closed:
+            return
+        self._closed = True
+        self.executor.shutdown(wait=wait)
+
+
+def init_r2_storage(app):
+    """Create the process-wide R2Storage from app.config and attach it to the app"""
+    storage = R2Storage(
+        max_pool_connections=app.config.get('R2_MAX_POOL_CONNECTIONS', 20),
+        upload_workers=app.config.get('R2_UPLOAD_WORKERS', 4),
+        max_pending=app.config.get('R2_MAX_PENDING_UPLOADS', 32),
+        connect_timeout=app.config.get('R2_CONNECT_TIMEOUT', 5),
+        read_timeout=app.config.get('R2_READ_TIMEOUT', 60),
+        max_attempts=app.config.get('R2_MAX_ATTEMPTS', 3),
+        multipart_threshold=app.config.get('R2_MULTIPART_THRESHOLD', 16 * 1024 ** 2),
+        multipart_chunksize=app.config.get('R2_MULTIPART_CHUNKSIZE', 8 * 1024 ** 2),
+        transfer_concurrency=app.config.get('R2_TRANSFER_CONCURRENCY', 4),
+        spool_max_bytes=app.config.get('R2_SPOOL_MAX_BYTES', 16 * 1024 ** 2),
+        codec=app.config.get('MODEL_ARTIFACT_CODEC', 'auto'),
+        level=app.config.get('MODEL_ARTIFACT_LEVEL'),
+    )
+    app.extensions['r2_storage'] = storage
+    # Let queued uploads finish when the server process exits
+    atexit.register(storage.shutdown)
+    print(f"R2 storage initialized ({storage.upload_workers} upload workers)")
+    return storage
+
+
+def get_r2_storage():
+    """Shared R2Storage of the current Flask app"""
+    from flask import current_app
+    return current_app.extensions['r2_storage']
\ No newline at end of file
@@ -0,0 +1,353 @@
+import numpy as np
+import pandas as pd
+from typing import List, Sequence, Union
+
+
+class ReservoirSample:
+    """Uniform fixed-size sample over a stream of values (Algorithm R, vectorized per chunk)"""
+
+    def __init__(self, capacity: int = 10_000, seed: int = 0):
+        self.capacity = int(capacity)
+        self.seen = 0
+        self._values = None
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: Union[Sequence, np.ndarray, pd.Series]):
+        """Feed the next chunk of values"""
+        chunk = values.to_numpy() if isinstance(values, pd.Series) else np.asarray(values)
+        if not len(chunk):
+            return
+
+        # Fill the reservoir first
+        filled = 0 if self._values is None else len(self._values)
+        take = min(self.capacity - filled, len(chunk))
+        if take > 0:
+            head = chunk[:take]
+            self._values = head.copy() if self._values is None else self._concat(self._values, head)
+        rest = chunk[take:]
+        offset = self.seen + take
+        self.seen += len(chunk)
+        if not len(rest):
+            return
+
+        # Item i (0-based over the stream) replaces slot j ~ U[0, i] when j < capacity;
+        # NumPy assigns repeated slots in order, so later items win as in Algorithm R
+        slots = self._rng.integers(0, np.arange(offset, offset + len(rest)) + 1)
+        accepted = slots < self.capacity
+        if accepted.any():
+            if self._values.dtype != rest.dtype:
+                self._values = self._values.astype(object)
+            self._values[slots[accepted]] = rest[accepted]
+
+    @staticmethod
+    def _concat(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        # Mixed chunks fall back to object so values are never cast to strings
+        if left.dtype != right.dtype:
+            return np.concatenate([left.astype(object), right.astype(object)])
+        return np.concatenate([left, right])
+
+    @property
+    def values(self) -> np.ndarray:
+        """Current sample (all values while fewer than capacity have been seen)"""
+        return self._values if self._values is not None else np.empty(0)
+
+    @property
+    def is_exact(self) -> bool:
+        """True while the sample still holds every value seen"""
+        return self.seen <= self.capacity
+
+
+class QuantileSketch:
+    """
+    Mergeable streaming quantile sketch built from a hierarchy of compactors
+
+    Each level holds at most k values of weight 2**level. A full level is
+    sorted and every other value (random offset) is promoted to the next
+    level. A compaction at level h shifts any rank by at most 2**h, so the
+    accumulated total gives a deterministic bound on the rank error.
+    """
+
+    def __init__(self, k: int = 2048, seed: int = 0):
+        self.k = int(k)
+        self.count = 0
+        self._levels: List[np.ndarray] = [np.empty(0)]
+        self._error_weight = 0
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: Union[Sequence, np.ndarray]):
+        """Feed the next chunk of numeric values (NaN is ignored)"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compact()
+
+    def merge(self, other: 'QuantileSketch'):
+        """Fold another sketch into this one"""
+        for level, values in enumerate(other._levels):
+            if level == len(self._levels):
+                self._levels.append(np.empty(0))
+            self._levels[level] = np.concatenate([self._levels[level], values])
+        self.count += other.count
+        self._error_weight += other._error_weight
+        self._compact()
+
+    def _compact(self):
+        level = 0
+        while level < len(self._levels):
+            values = self._levels[level]
+            if len(values) > self.k:
+                values = np.sort(values)
+                keep = values[-1:] if len(values) % 2 else values[:0]
+                pairs = values[:len(values) - len(keep)]
+                promoted = pairs[self._rng.integers(2)::2]
+                self._levels[level] = keep
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                self._levels[level + 1] = np.concatenate([self._levels[level + 1], promoted])
+                self._error_weight += 2 ** level
+            level += 1
+
+    def _weighted(self):
+        values = np.concatenate(self._levels)
+        weights = np.concatenate([
+            np.full(len(level_values), 2.0 ** level)
+            for level, level_values in enumerate(self._levels)
+        ])
+        order = np.argsort(values, kind='stable')
+        return values[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        """Approximate values at the given quantiles (0-1)"""
+        if not self.count:
+            return np.full(len(qs), np.nan)
+        values, cumulative = self._weighted()
+        targets = np.asarray(qs, dtype=float) * cumulative[-1]
+        idx = np.searchsorted(cumulative, targets, side='left')
+        return values[np.clip(idx, 0, len(values) - 1)]
+
+    def rank(self, x: float, inclusive: bool = False) -> float:
+        """Approximate fraction of values below x (or at/below when inclusive)"""
+        if not self.count:
+            return 0.0
+        values, cumulative = self._weighted()
+        idx = np.searchsorted(values, x, side='right' if inclusive else 'left')
+        return float(cumulative[idx - 1] / cumulative[-1]) if idx else 0.0
+
+    @property
+    def rank_error(self) -> float:
+        """Upper bound on the rank error of any query, as a fraction of count"""
+        return float(self._error_weight / self.count) if self.count else 0.0
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Vectorized int.bit_length for uint64 arrays"""
+    values = values.copy()
+    lengths = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        shifted = values >> np.uint64(shift)
+        big = shifted > 0
+        lengths[big] += shift
+        values[big] = shifted[big]
+    return lengths + (values > 0)
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count estimator over 64-bit pandas hashes"""
+
+    def __init__(self, precision: int = 14):
+        self.precision = int(precision)
+        self.m = 1 << self.precision
+        self._registers = np.zeros(self.m, dtype=np.uint8)
+
+    def update(self, values: Union[Sequence, np.ndarray, pd.Series]):
+        """Feed the next chunk of values (NaN/None should already be dropped)"""
+        series = values if isinstance(values, pd.Series) else pd.Series(values)
+        if not len(series):
+            return
+        hashes = pd.util.hash_pandas_object(series, index=False).to_numpy(dtype=np.uint64)
+        tail_bits = 64 - self.precision
+        buckets = (hashes >> np.uint64(tail_bits)).astype(np.intp)
+        tails = hashes & np.uint64((1 << tail_bits) - 1)
+        ranks = (tail_bits - _bit_length(tails) + 1).astype(np.uint8)
+        np.maximum.at(self._registers, buckets, ranks)
+
+    def merge(self, other: 'HyperLogLog'):
+        """Fold another sketch with the same precision into this one"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        np.maximum(self._registers, other._registers, out=self._registers)
+
+    def estimate(self) -> int:
+        """Estimated number of distinct values"""
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / np.sum(np.exp2(-self._registers.astype(float)))
+        zeros = int(np.count_nonzero(self._registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * np.log(self.m / zeros)
+        return int(round(estimate))
+
+    @property
+    def relative_error(self) -> float:
+        """Standard error of the estimate relative to the true count"""
+        return float(1.04 / np.sqrt(self.m))
+
+
+class StreamingMoments:
+    """Count, mean, min/max and central moments merged chunk by chunk (Pebay's formulas)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self._m2 = 0.0
+        self._m3 = 0.0
+        self._m4 = 0.0
+
+    def update(self, values: np.ndarray):
+        """Feed the next chunk of finite float values"""
+        nb = len(values)
+        if not nb:
+            return
+        mean_b = float(np.mean(values))
+        deltas = values - mean_b
+        sq = deltas * deltas
+        m2_b = float(np.sum(sq))
+        m3_b = float(np.sum(sq * deltas))
+        m4_b = float(np.sum(sq * sq))
+
+        na = self.count
+        n = na + nb
+        delta = mean_b - self.mean
+        m2_a, m3_a = self._m2, self._m3
+
+        self._m4 += (m4_b + delta ** 4 * na * nb * (na * na - na * nb + nb * nb) / n ** 3
+                     + 6 * delta ** 2 * (na * na * m2_b + nb * nb * m2_a) / n ** 2
+                     + 4 * delta * (na * m3_b - nb * m3_a) / n)
+        self._m3 += (m3_b + delta ** 3 * na * nb * (na - nb) / n ** 2
+                     + 3 * delta * (na * m2_b - nb * m2_a) / n)
+        self._m2 += m2_b + delta ** 2 * na * nb / n
+        self.mean += delta * nb / n
+        self.count = n
+        self.min = min(self.min, float(np.min(values)))
+        self.max = max(self.max, float(np.max(values)))
+
+    def variance(self, ddof: int = 1) -> float:
+        return self._m2 / (self.count - ddof) if self.count > ddof else float('nan')
+
+    def skewness(self) -> float:
+        """Biased sample skewness (scipy.stats.skew default)"""
+        return float(np.sqrt(self.count) * self._m3 / self._m2 ** 1.5)
+
+    def kurtosis(self) -> float:
+        """Biased excess kurtosis (scipy.stats.kurtosis default)"""
+        return float(self.count * self._m4 / self._m2 ** 2 - 3)
+
+
+class NumericSketch:
+    """Streaming summary of a numeric column: exact moments, quantile sketch and a reservoir sample"""
+
+    def __init__(self, sample_size: int = 10_000, k: int = 2048, seed: int = 0):
+        self.seed = seed
+        self.moments = StreamingMoments()
+        self.quantiles = QuantileSketch(k=k, seed=seed)
+        self.sample = ReservoirSample(sample_size, seed=seed)
+
+    def update(self, values: np.ndarray):
+        """Feed the next chunk of float values; non-finite entries are skipped"""
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        self.moments.update(values)
+        self.quantiles.update(values)
+        self.sample.update(values)
+
+    @property
+    def count(self) -> int:
+        return self.moments.count
+
+
+class ColumnSketch:
+    """Streaming profile of one column: null counts, value sample, distinct count and numeric summary"""
+
+    def __init__(self, sample_size: int = 10_000, seed: int = 0):
+        self.rows = 0
+        self.nulls = 0
+        self.sample = ReservoirSample(sample_size, seed=seed)
+        self.distinct = HyperLogLog()
+        self.numeric = NumericSketch(sample_size=sample_size, seed=seed)
+
+    def update(self, non_null: pd.Series, numeric: np.ndarray, rows: int):
+        """
+        Feed the next chunk of a column
+
+        Args:
+            non_null: The chunk's non-missing values
+            numeric: Float coercion of non_null (NaN where not numeric)
+            rows: Total rows in the chunk, including missing values
+        """
+        self.rows += rows
+        self.nulls += rows - len(non_null)
+        self.sample.update(non_null)
+        self.distinct.update(non_null)
+        self.numeric.update(numeric)
+
+    @property
+    def non_null_count(self) -> int:
+        return self.rows - self.nulls
+
+
+class RowReservoir:
+    """Uniform fixed-size sample of DataFrame rows over a stream of chunks"""
+
+    def __init__(self, capacity: int = 10_000, seed: int = 0):
+        self.capacity = int(capacity)
+        self.seen = 0
+        self._frame = None
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, chunk: pd.DataFrame):
+        """Feed the next chunk of rows"""
+        if not len(chunk):
+            return
+
+        filled = 0 if self._frame is None else len(self._frame)
+        take = min(self.capacity - filled, len(chunk))
+        if take > 0:
+            head = chunk.iloc[:take]
+            self._frame = head.reset_index(drop=True) if self._frame is None else pd.concat(
+                [self._frame, head], ignore_index=True
+            )
+        rest = chunk.iloc[take:]
+        offset = self.seen + take
+        self.seen += len(chunk)
+        if not len(rest):
+            return
+
+        slots = self._rng.integers(0, np.arange(offset, offset + len(rest)) + 1)
+        accepted = np.flatnonzero(slots < self.capacity)
+        if not len(accepted):
+            return
+
+        # Keep only the last row landing in each slot, as sequential Algorithm R would
+        slots = slots[accepted]
+        _, last = np.unique(slots[::-1], return_index=True)
+        keep = len(slots) - 1 - last
+        slots, positions = slots[keep], accepted[keep]
+
+        for col in self._frame.columns:
+            column = self._frame[col].to_numpy(copy=True)
+            incoming = rest[col].to_numpy()[positions]
+            if column.dtype != incoming.dtype:
+                column = column.astype(object)
+            column[slots] = incoming
+            self._frame[col] = column
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """Sampled rows (every row while fewer than capacity have been seen)"""
+        return self._frame if self._frame is not None else pd.DataFrame()
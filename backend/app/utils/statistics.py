@@ -1,178 +1,449 @@
+import warnings
 import numpy as np
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union
 from scipy import stats
 import pandas as pd
+from app.utils.sketches import NumericSketch
 
-def calculate_stats(values: List) -> Optional[Dict[str, Any]]:
+# Strings that pd.to_datetime accepts as a missing timestamp instead of raising
+_NAT_STRINGS = frozenset({'', 'NaT', 'nat', 'NAT', 'nan', 'NaN', 'NAN'})
+
+# Strings that float() accepts as NaN but pd.to_numeric coerces away
+_NAN_STRINGS = frozenset({'nan', '+nan', '-nan'})
+
+# Rows per block when accumulating the correlation matrix
+_CORRELATION_CHUNK_ROWS = 100_000
+
+CORRELATION_METHODS = ('pearson', 'spearman')
+
+# Reservoir size for approximate profiling and the Shapiro-Wilk input cap
+DEFAULT_SAMPLE_SIZE = 10_000
+_SHAPIRO_MAX_SAMPLES = 5000
+
+
+def _as_series(values: Union[List, pd.Series]) -> pd.Series:
+    """Wrap a list of values in a Series without copying an existing one"""
+    if isinstance(values, pd.Series):
+        return values
+    return pd.Series(values, dtype=object) if len(values) else pd.Series([], dtype=object)
+
+
+def coerce_numeric(series: pd.Series) -> np.ndarray:
+    """
+    Convert a column to a float array in one vectorized pass
+
+    Values that float() would reject (text, timestamps) become NaN.
+
+    Args:
+        series: Column values
+
+    Returns:
+        float64 NumPy array aligned with the input
+    """
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+        return series.to_numpy(dtype='float64', na_value=np.nan)
+    if pd.api.types.is_datetime64_any_dtype(dtype) or pd.api.types.is_timedelta64_dtype(dtype):
+        return np.full(len(series), np.nan)
+    result = pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+    # pd.to_numeric rejects some strings float() accepts ('1_000', non-ASCII
+    # digits, '1e500'); retry the rejected strings that contain a digit
+    rejected = np.flatnonzero(np.isnan(result) & series.notna().to_numpy())
+    if len(rejected):
+        values = series.iloc[rejected]
+        strings = values.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+        if strings.any():
+            retry = np.zeros(len(values), dtype=bool)
+            retry[strings] = values[strings].str.contains(r'\d', regex=True).to_numpy(dtype=bool)
+            result[rejected[retry]] = [_to_float(v) for v in values[retry]]
+    return result
+
+
+def _to_float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def calculate_stats(values: Union[List, pd.Series]) -> Optional[Dict[str, Any]]:
     """
     Calculate statistical measures for numeric values
-    
+
     Args:
-        values: List of values
-        
+        values: List or Series of values
+
     Returns:
         Dictionary of statistics or None if insufficient data
     """
     # Filter numeric values
-    numeric = []
-    for v in values:
-        try:
-            if v is None or pd.isna(v):
-                continue
-            num = float(v)
-            if np.isfinite(num):
-                numeric.append(num)
-        except:
-            continue
-    
-    if len(numeric) < 2:
+    numeric_array = coerce_numeric(_as_series(values))
+    numeric_array = numeric_array[np.isfinite(numeric_array)]
+    n = len(numeric_array)
+
+    if n < 2:
         return None
-    
-    numeric_array = np.array(numeric)
-    
+
+    # q1 and q3 from a single partition of the array
+    q1, q3 = np.percentile(numeric_array, [25, 75])
+    min_value = numeric_array.min()
+    max_value = numeric_array.max()
+    variance = np.var(numeric_array, ddof=1)
+
     # Basic statistics - convert numpy types to Python native types
     stats_dict = {
-        'count': int(len(numeric)),  # Convert to int
+        'count': int(n),
         'mean': float(np.mean(numeric_array)),
         'median': float(np.median(numeric_array)),
         'std': float(np.std(numeric_array, ddof=1)),
-        'variance': float(np.var(numeric_array, ddof=1)),
-        'min': float(np.min(numeric_array)),
-        'max': float(np.max(numeric_array)),
-        'q1': float(np.percentile(numeric_array, 25)),
-        'q3': float(np.percentile(numeric_array, 75)),
-        'iqr': float(np.percentile(numeric_array, 75) - np.percentile(numeric_array, 25)),
-        'range': float(np.max(numeric_array) - np.min(numeric_array))
+        'variance': float(variance),
+        'min': float(min_value),
+        'max': float(max_value),
+        'q1': float(q1),
+        'q3': float(q3),
+        'iqr': float(q3 - q1),
+        'range': float(max_value - min_value)
     }
-    
+
     # Skewness and kurtosis
-    if len(numeric) >= 3 and stats_dict['std'] > 1e-10:
+    if n >= 3 and stats_dict['std'] > 1e-10:
         try:
             stats_dict['skewness'] = float(stats.skew(numeric_array))
             stats_dict['kurtosis'] = float(stats.kurtosis(numeric_array))
         except:
             stats_dict['skewness'] = None
             stats_dict['kurtosis'] = None
-    
+
     # Detect outliers using IQR method
     lower_bound = stats_dict['q1'] - 1.5 * stats_dict['iqr']
     upper_bound = stats_dict['q3'] + 1.5 * stats_dict['iqr']
-    outliers = [float(x) for x in numeric_array if x < lower_bound or x > upper_bound]  # Convert to float
-    
-    stats_dict['outlier_count'] = int(len(outliers))  # Convert to int
-    stats_dict['outlier_percentage'] = float((len(outliers) / len(numeric)) * 100) if numeric else 0.0
+    outlier_count = int(np.count_nonzero((numeric_array < lower_bound) | (numeric_array > upper_bound)))
+
+    stats_dict['outlier_count'] = outlier_count
+    stats_dict['outlier_percentage'] = float((outlier_count / n) * 100)
     stats_dict['lower_bound'] = float(lower_bound)
     stats_dict['upper_bound'] = float(upper_bound)
-    
+
     # Normality test (for larger samples)
-    if len(numeric) >= 20:
+    if n >= 20:
         try:
             _, p_value = stats.shapiro(numeric_array)
             stats_dict['normality_pvalue'] = float(p_value) if not np.isnan(p_value) else None
         except:
             stats_dict['normality_pvalue'] = None
-    
+
+    return stats_dict
+
+def summarize_numeric_sketch(sketch: NumericSketch) -> Optional[Dict[str, Any]]:
+    """
+    Build a calculate_stats-style dictionary from a filled NumericSketch
+
+    Args:
+        sketch: Sketch fed with the column's values
+
+    Returns:
+        Dictionary of statistics with error bounds, or None if insufficient data
+    """
+    moments = sketch.moments
+    n = moments.count
+    if n < 2:
+        return None
+
+    q1, median, q3 = (float(q) for q in sketch.quantiles.quantiles([0.25, 0.5, 0.75]))
+    variance = moments.variance(ddof=1)
+
+    stats_dict = {
+        'count': int(n),
+        'mean': float(moments.mean),
+        'median': median,
+        'std': float(np.sqrt(variance)),
+        'variance': float(variance),
+        'min': float(moments.min),
+        'max': float(moments.max),
+        'q1': q1,
+        'q3': q3,
+        'iqr': q3 - q1,
+        'range': float(moments.max - moments.min)
+    }
+
+    # Skewness and kurtosis
+    if n >= 3 and stats_dict['std'] > 1e-10:
+        stats_dict['skewness'] = moments.skewness()
+        stats_dict['kurtosis'] = moments.kurtosis()
+
+    # Outliers from the sketch's rank of each IQR bound
+    lower_bound = q1 - 1.5 * stats_dict['iqr']
+    upper_bound = q3 + 1.5 * stats_dict['iqr']
+    outlier_fraction = sketch.quantiles.rank(lower_bound) + (1 - sketch.quantiles.rank(upper_bound, inclusive=True))
+    outlier_fraction = min(max(outlier_fraction, 0.0), 1.0)
+
+    stats_dict['outlier_count'] = int(round(outlier_fraction * n))
+    stats_dict['outlier_percentage'] = float(outlier_fraction * 100)
+    stats_dict['lower_bound'] = float(lower_bound)
+    stats_dict['upper_bound'] = float(upper_bound)
+
+    # Normality test on the reservoir sample; while the reservoir still holds the
+    # stream in file order, a prefix would be biased, so subsample at random
+    sample = sketch.sample.values.astype(float)
+    if len(sample) > _SHAPIRO_MAX_SAMPLES:
+        rng = np.random.default_rng(sketch.seed)
+        sample = rng.choice(sample, _SHAPIRO_MAX_SAMPLES, replace=False)
+    if len(sample) >= 20:
+        try:
+            _, p_value = stats.shapiro(sample)
+            stats_dict['normality_pvalue'] = float(p_value) if not np.isnan(p_value) else None
+        except:
+            stats_dict['normality_pvalue'] = None
+
+    rank_error = sketch.quantiles.rank_error
+    stats_dict['approximation'] = {
+        'sample_size': int(len(sketch.sample.values)),
+        'normality_sample_size': int(len(sample)),
+        'quantile_rank_error': rank_error,
+        'outlier_percentage_error': float(2 * rank_error * 100)
+    }
+
     return stats_dict
 
-def infer_column_type(values: List) -> Dict[str, Any]:
+def infer_column_type(values: Union[List, pd.Series]) -> Dict[str, Any]:
     """
     Infer column data type with confidence
-    
+
     Args:
-        values: List of values
-        
+        values: List or Series of values
+
     Returns:
         Dictionary with type information
     """
-    non_null = [v for v in values if v is not None and not pd.isna(v)]
-    if not non_null:
+    non_null = _as_series(values).dropna()
+    if isinstance(non_null.dtype, pd.CategoricalDtype):
+        non_null = non_null.astype(object)
+    n = len(non_null)
+    if not n:
         return {'type': 'empty', 'confidence': 1.0}
-    
+
+    dtype = non_null.dtype
+    is_object = pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)
+    if is_object:
+        str_mask = non_null.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+    else:
+        str_mask = np.zeros(n, dtype=bool)
+
     # Check for datetime
-    date_count = 0
-    for v in non_null:
-        if isinstance(v, (pd.Timestamp, np.datetime64)):
-            date_count += 1
-        elif isinstance(v, str):
-            try:
-                pd.to_datetime(v)
-                date_count += 1
-            except:
-                pass
-    
-    if date_count / len(non_null) > 0.7:
-        return {'type': 'datetime', 'confidence': date_count / len(non_null)}
-    
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        date_count = n
+    elif is_object:
+        date_count = 0
+        if not str_mask.all():
+            date_count += int(non_null[~str_mask].map(
+                lambda v: isinstance(v, (pd.Timestamp, np.datetime64))
+            ).sum())
+        if str_mask.any():
+            strings = non_null[str_mask]
+            parsed = pd.to_datetime(strings, errors='coerce', format='mixed', utc=True)
+            date_count += int((parsed.notna() | strings.isin(_NAT_STRINGS)).sum())
+    else:
+        date_count = 0
+
+    if date_count / n > 0.7:
+        return {'type': 'datetime', 'confidence': date_count / n}
+
     # Check for numeric
-    numeric_count = 0
-    for v in non_null:
-        try:
-            float(v)
-            numeric_count += 1
-        except:
-            pass
-    
-    numeric_ratio = numeric_count / len(non_null)
-    
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+        numeric_count = n
+    elif is_object:
+        numeric_mask = ~np.isnan(coerce_numeric(non_null))
+        if str_mask.any():
+            numeric_mask[str_mask] |= non_null[str_mask].str.strip().str.lower().isin(_NAN_STRINGS).to_numpy()
+        numeric_count = int(numeric_mask.sum())
+    else:
+        numeric_count = 0
+
+    numeric_ratio = numeric_count / n
+
     if numeric_ratio > 0.9:
-        unique_values = set(non_null)
-        unique_ratio = len(unique_values) / len(non_null)
-        
+        unique_count = non_null.nunique(dropna=False)
+        unique_ratio = unique_count / n
+
         # Check if it's continuous
-        if unique_ratio > 0.9 and len(unique_values) > 10:
+        if unique_ratio > 0.9 and unique_count > 10:
             return {'type': 'continuous', 'confidence': numeric_ratio}
         # Check if it's ordinal/categorical numeric
-        elif unique_ratio < 0.1 and len(unique_values) < 10:
+        elif unique_ratio < 0.1 and unique_count < 10:
             return {'type': 'ordinal', 'confidence': numeric_ratio}
         else:
             return {'type': 'numeric', 'confidence': numeric_ratio}
-    
+
     # Check for categorical
-    unique_values = set(str(v).lower().strip() for v in non_null if v is not None)
-    unique_ratio = len(unique_values) / len(non_null)
-    
+    as_text = non_null.astype(str)
+    unique_count = as_text.str.lower().str.strip().nunique()
+    unique_ratio = unique_count / n
+
     # Binary categorical
-    if len(unique_values) == 2:
+    if unique_count == 2:
         return {'type': 'binary', 'confidence': 1.0}
-    
+
     # Regular categorical
-    if unique_ratio < 0.5 and len(unique_values) < 50:
+    if unique_ratio < 0.5 and unique_count < 50:
         return {'type': 'categorical', 'confidence': 1 - unique_ratio}
-    
+
     # ID column
-    if unique_ratio > 0.95 and len(non_null) > 10:
+    if unique_ratio > 0.95 and n > 10:
         return {'type': 'identifier', 'confidence': unique_ratio}
-    
+
     # Text column
-    avg_len = np.mean([len(str(v)) for v in non_null if v is not None])
+    avg_len = as_text.str.len().mean()
     if avg_len > 50:
         return {'type': 'text', 'confidence': 0.8}
-    
+
     return {'type': 'unknown', 'confidence': 0.5}
 
-def calculate_correlation(df: pd.DataFrame, col1: str, col2: str) -> float:
+def _numeric_block(df: pd.DataFrame, columns: List[str], start: int, stop: int) -> np.ndarray:
+    """Coerce a row slice of the given columns into a float matrix (non-finite -> NaN)"""
+    block = np.empty((stop - start, len(columns)))
+    for idx, col in enumerate(columns):
+        block[:, idx] = coerce_numeric(df[col].iloc[start:stop])
+    block[~np.isfinite(block)] = np.nan
+    return block
+
+class CorrelationAccumulator:
+    """
+    Pairwise-complete Pearson correlation accumulated over row blocks
+
+    Pair counts, sums and cross products are kept as k x k matrices and
+    updated with matrix products, so any number of chunks can be fed with
+    bounded memory and the final matrix needs no second pass.
+    """
+
+    def __init__(self, n_columns: int):
+        self.n_columns = n_columns
+        self._pair_count = np.zeros((n_columns, n_columns))
+        self._sum_x = np.zeros((n_columns, n_columns))
+        self._sum_xx = np.zeros((n_columns, n_columns))
+        self._sum_xy = np.zeros((n_columns, n_columns))
+        self._shift = None
+
+    def update(self, block: np.ndarray):
+        """Feed a rows x n_columns float block (NaN marks missing values)"""
+        block = np.array(block, dtype=float)
+        block[~np.isfinite(block)] = np.nan
+
+        # Shift by a rough column mean to limit cancellation in the sums
+        if self._shift is None:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                self._shift = np.nan_to_num(np.nanmean(block, axis=0))
+        block -= self._shift
+
+        present = ~np.isnan(block)
+        mask = present.astype(float)
+        values = np.where(present, block, 0.0)
+
+        self._pair_count += mask.T @ mask
+        self._sum_x += values.T @ mask
+        self._sum_xx += (values * values).T @ mask
+        self._sum_xy += values.T @ values
+
+    def correlation(self, indices: Optional[List[int]] = None) -> np.ndarray:
+        """
+        Correlation matrix for all columns or a subset
+
+        Args:
+            indices: Column positions to keep (all when None)
+
+        Returns:
+            Square array of coefficients, NaN where undefined
+        """
+        select = np.ix_(indices, indices) if indices is not None else (slice(None), slice(None))
+        pair_count = self._pair_count[select]
+        sum_x = self._sum_x[select]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = self._sum_xy[select] - sum_x * sum_x.T / pair_count
+            var = self._sum_xx[select] - sum_x ** 2 / pair_count
+            var[var <= 0] = np.nan
+            corr = cov / np.sqrt(var * var.T)
+
+        corr[pair_count < 2] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+def calculate_correlation_matrix(df: pd.DataFrame, columns: List[str],
+                                 method: str = 'pearson',
+                                 chunk_size: int = _CORRELATION_CHUNK_ROWS) -> np.ndarray:
     """
-    Calculate correlation between two columns
-    
+    Calculate pairwise-complete correlations between columns as one matrix
+
+    Every column is coerced once and fed to a CorrelationAccumulator in row
+    blocks, so memory stays bounded by chunk_size. Spearman ranks each
+    column once before the Pearson pass (exact when there are no missing
+    values).
+
     Args:
         df: DataFrame
-        col1: First column name
-        col2: Second column name
-        
+        columns: Column names to correlate
+        method: 'pearson' or 'spearman'
+        chunk_size: Rows per block
+
     Returns:
-        Correlation coefficient
+        k x k array of coefficients, NaN where undefined
     """
-    try:
-        # Extract numeric values
-        series1 = pd.to_numeric(df[col1], errors='coerce')
-        series2 = pd.to_numeric(df[col2], errors='coerce')
-        
-        # Drop NaN pairs
-        valid_pairs = pd.concat([series1, series2], axis=1).dropna()
-        
-        if len(valid_pairs) < 2:
-            return 0
-        
-        return float(valid_pairs.iloc[:, 0].corr(valid_pairs.iloc[:, 1]))
-    except:
-        return 0
\ No newline at end of file
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"Unsupported correlation method: {method}")
+
+    k = len(columns)
+    source = df
+    if method == 'spearman':
+        source = pd.DataFrame({
+            idx: pd.Series(_numeric_block(df, [col], 0, len(df))[:, 0]).rank()
+            for idx, col in enumerate(columns)
+        })
+        columns = list(range(k))
+
+    accumulator = CorrelationAccumulator(k)
+    for start in range(0, len(source), chunk_size):
+        accumulator.update(_numeric_block(source, columns, start, min(start + chunk_size, len(source))))
+
+    return accumulator.correlation()
+
+def threshold_correlations(corr: np.ndarray, columns: List[str],
+                           threshold: float = 0.8) -> List[Tuple[str, str, float]]:
+    """
+    Pick column pairs from a correlation matrix whose absolute value exceeds a threshold
+
+    Args:
+        corr: Square correlation matrix aligned with columns
+        columns: Column names
+        threshold: Minimum absolute correlation to report
+
+    Returns:
+        List of (col1, col2, correlation) in column order
+    """
+    rows, cols = np.triu_indices(len(columns), k=1)
+    values = corr[rows, cols]
+    hits = np.abs(np.nan_to_num(values)) > threshold
+
+    return [
+        (columns[i], columns[j], float(value))
+        for i, j, value in zip(rows[hits], cols[hits], values[hits])
+    ]
+
+def find_high_correlations(df: pd.DataFrame, columns: List[str], threshold: float = 0.8,
+                           method: str = 'pearson') -> List[Tuple[str, str, float]]:
+    """
+    Find column pairs whose absolute correlation exceeds a threshold
+
+    Args:
+        df: DataFrame
+        columns: Column names to compare
+        threshold: Minimum absolute correlation to report
+        method: 'pearson' or 'spearman'
+
+    Returns:
+        List of (col1, col2, correlation) in column order
+    """
+    if len(columns) < 2:
+        return []
+
+    corr = calculate_correlation_matrix(df, columns, method=method)
+    return threshold_correlations(corr, columns, threshold)
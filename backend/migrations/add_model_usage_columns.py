@@ -0,0 +1,25 @@
+from sqlalchemy import text
+
+from app import create_app
+from app.database.sql_db import db
+
+
+def add_usage_columns():
+    app = create_app()
+
+    with app.app_context():
+        # Columns used to warm the local model cache with the most used models
+        db.session.execute(text(
+            "ALTER TABLE ml_models ADD COLUMN IF NOT EXISTS prediction_count INTEGER NOT NULL DEFAULT 0"
+        ))
+        db.session.execute(text(
+            "ALTER TABLE ml_models ADD COLUMN IF NOT EXISTS last_used_at TIMESTAMP"
+        ))
+        db.session.commit()
+
+        print("✓ ml_models usage columns added")
+        print("  - prediction_count")
+        print("  - last_used_at")
+
+if __name__ == "__main__":
+    add_usage_columns()